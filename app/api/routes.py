@@ -0,0 +1,101 @@
+# app/api/routes.py
+from typing import AsyncIterator, Dict, Tuple
+import json
+import logging
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from app.api.services import APIServices, IngestionInProgress
+from app.models.schema import Answer, Question
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+def get_services(request: Request) -> APIServices:
+    """The services shared by every request, created at startup (see app.main)."""
+    return request.app.state.services
+
+
+def format_event(event: str, data: Dict) -> str:
+    """One server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def event_stream(events: AsyncIterator[Tuple[str, Dict]]) -> StreamingResponse:
+    async def body():
+        try:
+            async for event, data in events:
+                yield format_event(event, data)
+        except Exception as e:
+            # The status line is long gone; end the stream with an error event instead
+            logger.error(f"Error streaming events: {e}")
+            yield format_event("error", {"detail": "The stream failed; see the server log"})
+
+    # Proxies must pass events through as they are sent
+    return StreamingResponse(
+        body(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.post("/ask", response_model=Answer)
+async def ask(question: Question, services: APIServices = Depends(get_services)) -> Answer:
+    """Answer a question about an ingested repository from its most similar chunks."""
+    try:
+        return await services.answer(question)
+    except Exception as e:
+        logger.error(f"Error answering question about {question.repository}: {e}")
+        raise HTTPException(status_code=502, detail="Could not answer the question") from e
+
+
+@router.post("/ask/stream")
+async def ask_stream(question: Question, services: APIServices = Depends(get_services)) -> StreamingResponse:
+    """
+    Server-sent events for a question: ``context`` (references and confidence), then
+    ``answer`` pieces as they are generated, then ``done``.
+    """
+    return event_stream(services.stream_answer(question))
+
+
+@router.post("/repositories/{owner}/{repo}/ingest", status_code=202)
+async def ingest(
+    owner: str,
+    repo: str,
+    incremental: bool = True,
+    fetch_mode: str = "api",
+    services: APIServices = Depends(get_services)
+) -> Dict:
+    """Start ingesting a repository; follow it at ``/repositories/{owner}/{repo}/progress``."""
+    try:
+        services.start_ingestion(owner, repo, incremental=incremental, fetch_mode=fetch_mode)
+    except IngestionInProgress as e:
+        raise HTTPException(status_code=409, detail=str(e)) from e
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e)) from e
+    return {"repository": repo, "status": "started", "progress": f"/repositories/{owner}/{repo}/progress"}
+
+
+@router.get("/repositories/{owner}/{repo}/progress")
+async def progress(owner: str, repo: str, services: APIServices = Depends(get_services)) -> StreamingResponse:
+    """
+    Server-sent events following the repository's ingestion: a ``job`` snapshot of its
+    latest job, a ``progress`` event per stored chunk while a run started here is going,
+    and ``done`` with the outcome. Without a run in this process the snapshot is all.
+    """
+    run = services.runs.get((owner, repo))
+    if run is not None:
+        return event_stream(run.events())
+
+    async def snapshot():
+        yield "job", services.job_store.progress(repo, owner) or {}
+
+    return event_stream(snapshot())
+
+
+@router.get("/repositories/{repo}/stats")
+async def stats(repo: str, services: APIServices = Depends(get_services)) -> Dict:
+    """Chunks and files stored for a repository, with the progress of its latest ingestion job."""
+    statistics = await services.search_service.get_repository_statistics(repo)
+    if statistics is None:
+        raise HTTPException(status_code=404, detail=f"No data for {repo}")
+    return statistics
@@ -0,0 +1,284 @@
+# app/api/services.py
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Callable, Dict, Iterable, List, Optional, Tuple
+import asyncio
+import logging
+import threading
+import time
+from app.core.config import get_settings
+from app.models.schema import Answer, Question
+from app.services.batching import MistralBatcher
+from app.services.dedup import DedupIndex
+from app.services.github import GitHubService
+from app.services.job_store import JobStore
+from app.services.mistral import MistralService
+from app.services.model_cache import CachedMistralService, ModelCache
+from app.services.repository_ingestion import RepositoryProcessor
+from app.services.snowflake import SnowflakeSearchService
+
+logger = logging.getLogger(__name__)
+
+ANSWER_PROMPT = "Answer the question about this code repository using the excerpts below, citing their file paths:"
+NO_CONTEXT_ANSWER = "Nothing indexed for this repository matches the question."
+
+
+def build_messages(query: str, results: List[Dict]) -> List[Dict]:
+    """The conversation asking ``query`` over the retrieved chunks."""
+    excerpts = "\n\n".join(
+        f"File: {row['file_path']}\nSummary: {row.get('summary') or ''}\n{row['content']}" for row in results
+    )
+    return [{"role": "user", "content": f"{excerpts}\n\nQuestion: {query}"}]
+
+
+def references(results: List[Dict]) -> List[str]:
+    """File paths of the retrieved chunks, best match first, each once."""
+    return list(dict.fromkeys(row['file_path'] for row in results))
+
+
+def confidence(results: List[Dict]) -> float:
+    """Similarity of the best match, clipped to [0, 1]; 0 when nothing matched."""
+    return min(max(float(results[0]['similarity']), 0.0), 1.0) if results else 0.0
+
+
+class IngestionInProgress(Exception):
+    """Raised when a repository is already being ingested by this process."""
+
+
+class IngestionRun:
+    """
+    An ingestion started through the API. Every chunk the processor reports through its
+    progress callback is published to the listeners attached at that moment, with the
+    job's progress; the run ends with a ``done`` event carrying its outcome.
+
+    The run itself goes on the ingestion thread's event loop; events are handed to the
+    listeners on ``loop``, the API's.
+    """
+
+    __slots__ = ("owner", "repo", "processor", "task", "chunks_stored", "outcome", "_listeners", "_loop")
+
+    def __init__(self, owner: str, repo: str, processor: RepositoryProcessor, loop: asyncio.AbstractEventLoop):
+        self.owner = owner
+        self.repo = repo
+        self.processor = processor
+        self.task: Optional[asyncio.Future] = None
+        self.chunks_stored = 0
+        self.outcome: Optional[Dict] = None
+        self._listeners: List[asyncio.Queue] = []
+        self._loop = loop
+
+    @property
+    def done(self) -> bool:
+        return self.outcome is not None
+
+    def progress(self) -> Optional[Dict]:
+        return self.processor.job_store.progress(self.repo, self.owner)
+
+    def publish(self, event: str, data: Dict):
+        self._loop.call_soon_threadsafe(self._deliver, event, data)
+
+    def _deliver(self, event: str, data: Dict):
+        for queue in self._listeners:
+            queue.put_nowait((event, data))
+
+    async def on_progress(self, file_path: str):
+        self.chunks_stored += 1
+        if self._listeners:
+            self.publish("progress", {"file_path": file_path, "chunks_stored": self.chunks_stored, "job": self.progress()})
+
+    async def run(self, incremental: bool):
+        started = time.perf_counter()
+        success = False
+        try:
+            success = await self.processor.ingest_repository(self.owner, self.repo, incremental)
+        finally:
+            self.outcome = {
+                "success": success,
+                "chunks_stored": self.chunks_stored,
+                "skipped_files": len(self.processor.skipped_files),
+                "elapsed_seconds": round(time.perf_counter() - started, 3),
+                "job": self.progress()
+            }
+            self.publish("done", self.outcome)
+
+    async def events(self) -> AsyncIterator[Tuple[str, Dict]]:
+        """A ``job`` snapshot, then progress events until the run ends, the last one being ``done``."""
+        if self.done:
+            yield "job", self.progress() or {}
+            yield "done", self.outcome
+            return
+        queue = asyncio.Queue()
+        # Listen before the snapshot is sent, so nothing published meanwhile is missed
+        self._listeners.append(queue)
+        try:
+            yield "job", self.progress() or {}
+            while True:
+                event, data = await queue.get()
+                yield event, data
+                if event == "done":
+                    return
+        finally:
+            self._listeners.remove(queue)
+
+
+class APIServices:
+    """
+    Services shared by every request of the API process: one Snowflake pool with its local
+    indexes and query cache, one model client behind the model cache, question embeddings
+    batched across concurrent requests, and the ingestion runs started here.
+
+    Model calls block, so they run on ``model_threads`` threads of their own.
+    ``processor_factory(owner, repo)`` makes the processor of each ingestion; by default it
+    shares the store, model cache, job store, dedup index and GitHub rate limits.
+    Ingestions run on an event loop of their own, in a background thread, so their
+    chunking, hashing and local database work never holds up requests.
+    """
+
+    def __init__(
+        self,
+        search_service: Optional[SnowflakeSearchService] = None,
+        mistral_service: Optional[MistralService] = None,
+        model_cache: Optional[ModelCache] = None,
+        job_store: Optional[JobStore] = None,
+        dedup_index: Optional[DedupIndex] = None,
+        processor_factory: Optional[Callable[[str, str], RepositoryProcessor]] = None,
+        context_chunks: Optional[int] = None,
+        model_threads: Optional[int] = None
+    ):
+        settings = get_settings()
+        if dedup_index is None and settings.dedup_enabled:
+            dedup_index = DedupIndex.from_settings()
+        self.dedup_index = dedup_index
+        self.job_store = job_store or JobStore.from_settings()
+        self.search_service = search_service or SnowflakeSearchService(
+            job_store=self.job_store, dedup_index=self.dedup_index
+        )
+        self.model_cache = model_cache or ModelCache.from_settings()
+        self.mistral_service = CachedMistralService(mistral_service or MistralService(), self.model_cache)
+        model_threads = model_threads or settings.api_model_threads
+        self.batcher = MistralBatcher(
+            self.mistral_service, max_wait=settings.api_embed_max_wait, max_concurrent_batches=model_threads
+        )
+        self.processor_factory = processor_factory or self._default_processor
+        self.context_chunks = context_chunks or settings.api_context_chunks
+        self._executor = ThreadPoolExecutor(max_workers=model_threads, thread_name_prefix="model")
+        # Latest ingestion run of each (owner, repo)
+        self.runs: Dict[Tuple[str, str], IngestionRun] = {}
+        self._github_scheduler = None
+        self._github_cache = None
+        self._ingestion_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._ingestion_thread: Optional[threading.Thread] = None
+
+    def _default_processor(self, owner: str, repo: str) -> RepositoryProcessor:
+        github_service = GitHubService(scheduler=self._github_scheduler, cache=self._github_cache)
+        # Every ingestion throttles against the same rate limits and reuses cached responses
+        self._github_scheduler = github_service.scheduler
+        self._github_cache = github_service.cache
+        return RepositoryProcessor(
+            github_service=github_service,
+            # A processor closes its model client when the run ends, so it gets its own
+            mistral_service=MistralService(),
+            snowflake_service=self.search_service,
+            model_cache=self.model_cache,
+            job_store=self.job_store,
+            dedup_index=self.dedup_index
+        )
+
+    async def warm(self, repositories: Iterable[str] = ()):
+        """Connect to the store and load the indexes of ``repositories`` before the first request."""
+        started = time.perf_counter()
+        repositories = list(repositories)
+        try:
+            await self.search_service.warm_up(repositories)
+        except Exception as e:
+            # Serve anyway; the pool connects and indexes sync on first use
+            logger.error(f"Error warming up search for {repositories}: {e}")
+            return
+        logger.info(f"Warmed up search for {len(repositories)} repositories in {time.perf_counter() - started:.2f}s")
+
+    async def _call_model(self, func: Callable, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    async def retrieve(self, question: Question) -> List[Dict]:
+        embedding = await self.batcher.embed(question.query)
+        return await self.search_service.search_similar(
+            embedding, question.repository, limit=self.context_chunks, query_text=question.query
+        )
+
+    async def answer(self, question: Question) -> Answer:
+        results = await self.retrieve(question)
+        if not results:
+            return Answer(answer=NO_CONTEXT_ANSWER, references=[], confidence=0.0)
+        text = await self._call_model(
+            self.mistral_service.generate_response, ANSWER_PROMPT, build_messages(question.query, results)
+        )
+        return Answer(answer=text, references=references(results), confidence=confidence(results))
+
+    async def stream_answer(self, question: Question) -> AsyncIterator[Tuple[str, Dict]]:
+        """
+        The answer as events: ``context`` with the references and confidence as soon as the
+        search returns, ``answer`` for each piece of text as the model produces it, then ``done``.
+        """
+        results = await self.retrieve(question)
+        yield "context", {"references": references(results), "confidence": confidence(results)}
+        if not results:
+            yield "answer", {"text": NO_CONTEXT_ANSWER}
+        else:
+            pieces = self.mistral_service.stream_response(ANSWER_PROMPT, build_messages(question.query, results))
+            while True:
+                piece = await self._call_model(next, pieces, None)
+                if piece is None:
+                    break
+                yield "answer", {"text": piece}
+        yield "done", {}
+
+    def _ingestion_event_loop(self) -> asyncio.AbstractEventLoop:
+        """The loop every ingestion runs on, started with the first one."""
+        if self._ingestion_loop is None:
+            self._ingestion_loop = asyncio.new_event_loop()
+            self._ingestion_thread = threading.Thread(
+                target=self._ingestion_loop.run_forever, name="ingestion", daemon=True
+            )
+            self._ingestion_thread.start()
+        return self._ingestion_loop
+
+    def start_ingestion(self, owner: str, repo: str, incremental: bool = True, fetch_mode: str = "api") -> IngestionRun:
+        """Start ingesting a repository in the background; raises IngestionInProgress if it already is."""
+        current = self.runs.get((owner, repo))
+        if current is not None and not current.done:
+            raise IngestionInProgress(f"{owner}/{repo} is already being ingested")
+        processor = self.processor_factory(owner, repo)
+        processor.set_fetch_mode(fetch_mode)
+        run = IngestionRun(owner, repo, processor, asyncio.get_running_loop())
+        processor.set_callback(run.on_progress)
+        run.task = asyncio.wrap_future(
+            asyncio.run_coroutine_threadsafe(run.run(incremental), self._ingestion_event_loop())
+        )
+        self.runs[(owner, repo)] = run
+        return run
+
+    async def aclose(self):
+        """Stop ingestions still running and release every shared service."""
+        for run in self.runs.values():
+            if not run.done:
+                run.task.cancel()
+        if self._ingestion_loop is not None:
+            loop = self._ingestion_loop
+
+            async def drain():
+                # Cancelled runs still flush their writes and close their clients
+                await asyncio.gather(*(asyncio.all_tasks() - {asyncio.current_task()}), return_exceptions=True)
+
+            await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(drain(), loop))
+            loop.call_soon_threadsafe(loop.stop)
+            await asyncio.to_thread(self._ingestion_thread.join)
+            loop.close()
+            self._ingestion_loop = None
+        await self.batcher.drain()
+        self._executor.shutdown(wait=True)
+        self.search_service.close()
+        self.mistral_service.close()
+        self.model_cache.close()
+        if self.dedup_index is not None:
+            self.dedup_index.close()
+        self.job_store.close()
@@ -1,22 +1,139 @@
 # app/core/config.py
+from typing import Dict, List
 from pydantic_settings import BaseSettings
 from functools import lru_cache
 
 class Settings(BaseSettings):
     # GitHub
     github_token: str
-    
+    github_max_connections: int = 20
+    github_max_keepalive_connections: int = 10
+    github_keepalive_expiry: float = 30.0
+    github_http2: bool = False
+    github_timeout: float = 30.0
+    github_max_concurrency: int = 16
+    github_max_retries: int = 5
+    github_backoff_base: float = 0.5
+    github_backoff_max: float = 30.0
+    # Longest Retry-After / rate limit reset we sleep through before giving up on a request
+    github_rate_limit_max_wait: float = 900.0
+    # Below this many remaining requests, calls are paced one at a time until the reset
+    github_rate_limit_reserve: int = 100
+    # Overall request rate across all ingestion worker processes; 0 leaves it to the rate limit headers
+    github_requests_per_second: float = 0.0
+    github_cache_enabled: bool = True
+    github_cache_persistent: bool = True
+    github_cache_max_bytes: int = 256 * 1024 * 1024
+
     # Snowflake
     snowflake_account: str
     snowflake_user: str
     snowflake_password: str
+    snowflake_pool_size: int = 4
+    snowflake_pool_max_idle_time: float = 300.0
+    snowflake_pool_health_check_interval: float = 60.0
+    snowflake_insert_max_rows: int = 1000
+    # Snowflake rejects query text over 1 MB; rows are bound client-side into the text
+    snowflake_insert_max_bytes: int = 900_000
+    snowflake_write_batch_rows: int = 500
+    snowflake_write_max_wait: float = 0.25
+    snowflake_embedding_encoding: str = "float32"  # "float32", "float16", "int8", "vector" or legacy "json"
+    # "vector" stores embeddings in a native VECTOR(FLOAT, n) column instead of packed bytes,
+    # so searches without the local index rank rows inside the warehouse. n is taken from
+    # the first embedding stored; when set, this is checked against it and the column
+    snowflake_vector_dimensions: int = 0
+    # Packed rows are paged to the client and scored there, at most this many per search
+    snowflake_scan_max_rows: int = 100_000
     
     # Mistral
     mistral_api_key: str
+    mistral_batch_max_items: int = 32
+    mistral_batch_max_tokens: int = 16000
+    mistral_batch_max_wait: float = 0.05
+    mistral_max_concurrent_batches: int = 4
+
+    # Chunking: "syntax" splits Python and JS/TS on top-level definitions, "plain" by size only
+    chunking_mode: str = "syntax"
+    chunk_size: int = 3000
+    chunk_overlap: int = 200
+
+    # File selection, decided on the tree listing before any download (see
+    # FileSelectionPolicy). Lists and caps are JSON in the environment, globs gitignore-style;
+    # include patterns replace the extension list. Size caps are in bytes, 0 for none.
+    file_extensions: List[str] = [".py", ".js", ".ts", ".jsx", ".tsx", ".md", ".rst", ".yaml", ".yml", ".json"]
+    file_max_bytes: int = 1_000_000
+    file_size_caps: Dict[str, int] = {".json": 256 * 1024, ".yaml": 256 * 1024, ".yml": 256 * 1024}
+    file_include: List[str] = []
+    file_exclude: List[str] = []
+    file_skip_vendored: bool = True
+    file_skip_generated: bool = True
+    # Fetched files whose first bytes look binary or minified are skipped too
+    file_sniff_bytes: int = 8192
+    file_max_average_line_length: int = 300
+
+    # Ingestion pipeline (fetch workers come from the processor's batch_size). Model and
+    # store workers only wait on batches, so they should cover a full batch each.
+    pipeline_chunk_workers: int = 2
+    pipeline_embed_workers: int = 128
+    pipeline_summarize_workers: int = 128
+    pipeline_store_workers: int = 512
+    pipeline_dedup_workers: int = 2
+    pipeline_queue_size: int = 256
+
+    # Ingestion metrics: memory is sampled every interval seconds (0 samples only at the
+    # end of a run); profile is "", "cprofile" or "tracemalloc"
+    metrics_memory_interval: float = 1.0
+    ingestion_profile: str = ""
+    # Worker processes for multi-repository ingestion; 0 uses every core
+    ingestion_processes: int = 0
+    # Checkpoint ingestion jobs to data_dir so an interrupted run resumes where it stopped
+    ingestion_jobs_persistent: bool = True
+    # A chunk whose estimated Jaccard similarity (MinHash over token shingles) to a chunk
+    # already stored, in any repository, reaches the threshold is stored as a reference to
+    # it, without an embedding or summary of its own
+    dedup_enabled: bool = True
+    dedup_threshold: float = 0.9
+    dedup_num_perm: int = 128
+    dedup_persistent: bool = True
     
+    # Local vector index
+    vector_index_enabled: bool = True
+    vector_index_mmap: bool = True
+    vector_index_sync_interval: float = 60.0
+    vector_index_mode: str = "exact"  # "exact" or "ivf" (approximate)
+    vector_index_nlist: int = 0  # IVF lists; 0 picks sqrt(rows) at training time
+    vector_index_nprobe: int = 16
+    vector_index_min_train_rows: int = 10000
+    # BM25 index over code identifiers next to each vector index; "hybrid" search mode
+    # ranks only its best candidates by embedding
+    lexical_index_enabled: bool = True
+    search_mode: str = "vector"  # "vector" or "hybrid"
+    hybrid_candidates: int = 200
+    hybrid_weight: float = 0.5  # share of the embedding similarity in the hybrid score
+    # Recent search results per repository, dropped when this process writes to it
+    search_cache_enabled: bool = True
+    search_cache_max_entries: int = 1024
+    search_cache_ttl: float = 300.0
+
+    # Question answering API: repositories whose indexes are loaded at startup (comma
+    # separated), code excerpts given to the model per answer, threads for model calls and
+    # how long a question's embedding waits for others to share its batch
+    api_warm_repositories: str = ""
+    api_context_chunks: int = 5
+    api_model_threads: int = 32
+    api_embed_max_wait: float = 0.005
+
+    # Model output cache
+    model_cache_persistent: bool = True
+    # In-memory tier budget; a 1024-dimension embedding takes about 4 KB packed
+    model_cache_memory_bytes: int = 64 * 1024 * 1024
+    model_cache_max_bytes: int = 512 * 1024 * 1024
+
     # App Settings
     app_name: str = "Code Expert"
     debug: bool = False
+    # Local state (caches, indexes) lives here
+    data_dir: str = ".code_expert"
 
     class Config:
         env_file = ".env"
@@ -16,4 +16,13 @@ def setup_logger():
     file_handler.setFormatter(formatter)
     
     logger.addHandler(file_handler)
-    return logger
\ No newline at end of file
+    return logger
+
+
+def configure_logging(level: int = logging.INFO):
+    """
+    Send log records at ``level`` and above to stderr, unless the process already set up
+    logging. Entry points (the API, ingestion worker processes) call this once; modules
+    only create their loggers, so importing them leaves logging alone.
+    """
+    logging.basicConfig(level=level, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
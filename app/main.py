@@ -0,0 +1,41 @@
+# app/main.py
+from contextlib import asynccontextmanager
+from typing import Optional
+import logging
+from fastapi import FastAPI
+from app.api.routes import router
+from app.api.services import APIServices
+from app.core.config import get_settings
+from app.core.logging import configure_logging
+
+logger = logging.getLogger(__name__)
+
+
+def create_app(services: Optional[APIServices] = None) -> FastAPI:
+    """
+    The API application. Its services are made at startup (from the settings unless given),
+    warmed up with the indexes of ``api_warm_repositories`` and closed at shutdown.
+
+        uvicorn app.main:app
+    """
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        configure_logging()
+        settings = get_settings()
+        app.title = settings.app_name
+        app.state.services = services or APIServices()
+        await app.state.services.warm(
+            name.strip() for name in settings.api_warm_repositories.split(",") if name.strip()
+        )
+        try:
+            yield
+        finally:
+            await app.state.services.aclose()
+
+    # Settings are read at startup, so importing the app needs no configuration
+    app = FastAPI(lifespan=lifespan)
+    app.include_router(router)
+    return app
+
+
+app = create_app()
@@ -0,0 +1,122 @@
+# app/services/archive.py
+from typing import AsyncIterator, Callable, Dict, Optional, Tuple
+import tarfile
+import zlib
+
+BLOCK_SIZE = tarfile.BLOCKSIZE
+
+
+class _AsyncByteReader:
+    """Read exact byte counts from an async iterator of (optionally gzip-compressed) chunks."""
+
+    def __init__(self, chunks: AsyncIterator[bytes], compressed: bool = True):
+        self._chunks = chunks.__aiter__()
+        # wbits=47 accepts both gzip and zlib framing
+        self._decompressor = zlib.decompressobj(wbits=47) if compressed else None
+        self._buffer = bytearray()
+        self._exhausted = False
+
+    async def _fill(self, size: int):
+        while len(self._buffer) < size and not self._exhausted:
+            try:
+                chunk = await self._chunks.__anext__()
+            except StopAsyncIteration:
+                self._exhausted = True
+                if self._decompressor:
+                    self._buffer += self._decompressor.flush()
+                break
+            if self._decompressor:
+                chunk = self._decompressor.decompress(chunk)
+            self._buffer += chunk
+
+    async def read(self, size: int) -> bytes:
+        """Read up to ``size`` bytes; fewer are returned only at end of stream."""
+        await self._fill(size)
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
+
+    async def read_exactly(self, size: int) -> bytes:
+        data = await self.read(size)
+        if len(data) != size:
+            raise EOFError(f"Unexpected end of archive: wanted {size} bytes, got {len(data)}")
+        return data
+
+    async def skip(self, size: int):
+        """Discard ``size`` bytes without holding them all in memory."""
+        while size > 0:
+            step = min(size, 1 << 16)
+            await self.read_exactly(step)
+            size -= step
+
+
+def _padded(size: int) -> int:
+    return -(-size // BLOCK_SIZE) * BLOCK_SIZE
+
+
+def _parse_pax_headers(data: bytes) -> Dict[str, str]:
+    """Parse pax extended header records of the form ``"<len> <key>=<value>\\n"``."""
+    headers = {}
+    pos = 0
+    while pos < len(data):
+        space = data.find(b" ", pos)
+        if space == -1:
+            break
+        length = int(data[pos:space])
+        if length <= 0:
+            break
+        key, _, value = data[space + 1:pos + length - 1].partition(b"=")
+        headers[key.decode("utf-8")] = value.decode("utf-8", "surrogateescape")
+        pos += length
+    return headers
+
+
+async def iter_tar_files(
+    chunks: AsyncIterator[bytes],
+    include: Optional[Callable[[str, int], bool]] = None,
+    strip_components: int = 0,
+    compressed: bool = True
+) -> AsyncIterator[Tuple[str, bytes]]:
+    """
+    Stream regular files out of a tar archive as ``(path, data)`` pairs.
+
+    Only members accepted by ``include(path, size)`` are read into memory; everything
+    else is skipped as it streams past. ``strip_components`` drops leading path
+    segments, like ``tar --strip-components``.
+    """
+    reader = _AsyncByteReader(chunks, compressed=compressed)
+    global_headers: Dict[str, str] = {}
+    pax_headers: Dict[str, str] = {}
+    long_name: Optional[str] = None
+
+    while True:
+        header = await reader.read(BLOCK_SIZE)
+        if len(header) < BLOCK_SIZE or header.count(0) == BLOCK_SIZE:
+            break
+        info = tarfile.TarInfo.frombuf(header, "utf-8", "surrogateescape")
+
+        if info.type in (tarfile.XHDTYPE, tarfile.XGLTYPE, tarfile.SOLARIS_XHDTYPE):
+            data = (await reader.read_exactly(_padded(info.size)))[:info.size]
+            if info.type == tarfile.XGLTYPE:
+                global_headers.update(_parse_pax_headers(data))
+            else:
+                pax_headers = _parse_pax_headers(data)
+            continue
+        if info.type == tarfile.GNUTYPE_LONGNAME:
+            data = (await reader.read_exactly(_padded(info.size)))[:info.size]
+            long_name = data.rstrip(b"\0").decode("utf-8", "surrogateescape")
+            continue
+
+        headers = {**global_headers, **pax_headers}
+        name = headers.get("path") or long_name or info.name
+        size = int(headers.get("size", info.size))
+        pax_headers, long_name = {}, None
+
+        path = "/".join(name.split("/")[strip_components:])
+        if info.isreg() and path and (include is None or include(path, size)):
+            data = await reader.read_exactly(size)
+            await reader.skip(_padded(size) - size)
+            yield path, data
+        elif info.isreg() or info.type not in tarfile.SUPPORTED_TYPES:
+            # Same rule tarfile uses to decide whether a data section follows the header
+            await reader.skip(_padded(size))
@@ -0,0 +1,195 @@
+# app/services/batching.py
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+import asyncio
+import logging
+from app.core.config import get_settings
+from app.services.mistral import MistralService
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_PROMPT = "Analyze and summarize this code chunk:"
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token) used for batch budgeting."""
+    return max(1, len(text) // 4)
+
+
+class BatchQueue:
+    """
+    Collects submitted items and hands them to ``handler`` in batches.
+
+    A batch is flushed when it reaches ``max_items``, when the next item would push it
+    over ``max_tokens``, or ``max_wait`` seconds after its first item arrived.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[List[Any]], Awaitable[List[Any]]],
+        max_items: int,
+        max_tokens: int,
+        max_wait: float,
+        max_concurrent_batches: int
+    ):
+        self.handler = handler
+        self.max_items = max_items
+        self.max_tokens = max_tokens
+        self.max_wait = max_wait
+        self._slots = asyncio.Semaphore(max_concurrent_batches)
+        self._items: List[Any] = []
+        self._futures: List[asyncio.Future] = []
+        self._tokens = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._in_flight: set = set()
+        self.batches_sent = 0
+
+    def submit(self, item: Any, tokens: int) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        if self._items and self._tokens + tokens > self.max_tokens:
+            self._flush()
+
+        future = loop.create_future()
+        self._items.append(item)
+        self._futures.append(future)
+        self._tokens += tokens
+
+        if len(self._items) >= self.max_items or self._tokens >= self.max_tokens:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._items:
+            return
+        items, futures = self._items, self._futures
+        self._items, self._futures, self._tokens = [], [], 0
+        task = asyncio.get_running_loop().create_task(self._send(items, futures))
+        self._in_flight.add(task)
+        task.add_done_callback(self._in_flight.discard)
+
+    async def _send(self, items: List[Any], futures: List[asyncio.Future]):
+        async with self._slots:
+            self.batches_sent += 1
+            try:
+                results = await self.handler(items)
+                if len(results) != len(items):
+                    raise ValueError(f"Batch returned {len(results)} results for {len(items)} inputs")
+            except Exception as e:
+                logger.error(f"Batch of {len(items)} items failed: {e}")
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+            for future, result in zip(futures, results):
+                if not future.done():
+                    future.set_result(result)
+
+    async def drain(self):
+        """Flush the pending batch and wait for every in-flight batch to finish."""
+        self._flush()
+        while self._in_flight:
+            await asyncio.gather(*self._in_flight, return_exceptions=True)
+
+
+class MistralBatcher:
+    """
+    Groups embedding and summarization requests from many chunks (and files) into
+    batched ``MistralService`` calls. The blocking service calls run in worker threads
+    so the event loop keeps fetching and storing while a batch is in flight.
+    """
+
+    def __init__(
+        self,
+        mistral_service: MistralService,
+        max_items: Optional[int] = None,
+        max_tokens: Optional[int] = None,
+        max_wait: Optional[float] = None,
+        max_concurrent_batches: Optional[int] = None,
+        summary_prompt: str = SUMMARY_PROMPT
+    ):
+        settings = get_settings()
+        self.mistral_service = mistral_service
+        self.summary_prompt = summary_prompt
+        options = dict(
+            max_items=max_items or settings.mistral_batch_max_items,
+            max_tokens=max_tokens or settings.mistral_batch_max_tokens,
+            max_wait=settings.mistral_batch_max_wait if max_wait is None else max_wait,
+            max_concurrent_batches=max_concurrent_batches or settings.mistral_max_concurrent_batches
+        )
+        self._embeddings = BatchQueue(self._embed_batch, **options)
+        self._summaries = BatchQueue(self._summarize_batch, **options)
+
+    async def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        return await asyncio.to_thread(self.mistral_service.generate_embeddings, texts)
+
+    async def _summarize_batch(self, texts: List[str]) -> List[str]:
+        conversations = [[{"role": "user", "content": text}] for text in texts]
+        return await asyncio.to_thread(
+            self.mistral_service.generate_responses, self.summary_prompt, conversations
+        )
+
+    async def embed(self, text: str) -> List[float]:
+        return await self._embeddings.submit(text, estimate_tokens(text))
+
+    async def summarize(self, text: str) -> str:
+        return await self._summaries.submit(text, estimate_tokens(text))
+
+    async def drain(self):
+        """Send whatever is still queued and wait for all outstanding batches."""
+        await asyncio.gather(self._embeddings.drain(), self._summaries.drain())
+
+    @property
+    def batches_sent(self) -> int:
+        return self._embeddings.batches_sent + self._summaries.batches_sent
+
+
+def estimate_row_bytes(row: Dict) -> int:
+    """Approximate size of a stored row, dominated by its text and serialized embedding."""
+    return len(row.get("content") or "") + len(row.get("summary") or "") + 10 * len(row.get("embedding") or ())
+
+
+class EmbeddingWriter:
+    """
+    Buffers rows for ``store.store_embeddings`` and writes them in batches, flushing on
+    row count, buffered size or ``max_wait`` seconds after the first buffered row.
+    ``write`` returns once the row's batch has been committed.
+    """
+
+    def __init__(
+        self,
+        store,
+        max_rows: Optional[int] = None,
+        max_bytes: int = 16 * 1024 * 1024,
+        max_wait: Optional[float] = None,
+        max_concurrent_batches: int = 1
+    ):
+        settings = get_settings()
+        self.store = store
+        self.rows_written = 0
+        self._queue = BatchQueue(
+            self._write_batch,
+            max_items=max_rows or settings.snowflake_write_batch_rows,
+            max_tokens=max_bytes,
+            max_wait=settings.snowflake_write_max_wait if max_wait is None else max_wait,
+            max_concurrent_batches=max_concurrent_batches
+        )
+
+    async def _write_batch(self, rows: List[Dict]) -> List[None]:
+        await self.store.store_embeddings(rows)
+        self.rows_written += len(rows)
+        return [None] * len(rows)
+
+    async def write(self, row: Dict):
+        await self._queue.submit(row, estimate_row_bytes(row))
+
+    async def drain(self):
+        """Write whatever is buffered and wait for all outstanding batches."""
+        await self._queue.drain()
+
+    @property
+    def batches_written(self) -> int:
+        return self._queue.batches_sent
@@ -0,0 +1,119 @@
+# app/services/chunking.py
+"""
+Chunking of decoded source text.
+
+``iter_chunks`` is a generator version of the original fixed-size splitter: windows of
+``chunk_size`` characters pulled back to the last whitespace, starting every
+``chunk_size - overlap`` characters. ``iter_code_chunks`` splits Python and JS/TS files
+on top-level function and class boundaries first and packs whole definitions into
+chunks, falling back to ``iter_chunks`` for other files and oversized definitions.
+"""
+from typing import Iterator, List, Optional
+import os
+import re
+
+_PYTHON_EXTENSIONS = {".py", ".pyi"}
+_JS_EXTENSIONS = {".js", ".jsx", ".mjs", ".cjs", ".ts", ".tsx"}
+
+# Top-level definitions; nested ones stay with their parent
+_PYTHON_BOUNDARY = re.compile(r"^(?:async\s+def|def|class)\s", re.M)
+_JS_BOUNDARY = re.compile(
+    r"^(?:export\s+(?:default\s+)?)?(?:"
+    r"(?:async\s+)?function\b|(?:abstract\s+)?class\b|interface\b|"
+    r"(?:const|let|var)\s+[\w$]+\s*(?::[^=]+)?=\s*(?:async\s*)?(?:function\b|\([^)]*\)\s*(?::[^=]+)?=>|[\w$]+\s*=>)"
+    r")",
+    re.M
+)
+# Lines that belong to the definition below them
+_PYTHON_PREFIX = re.compile(r"@|#")
+_JS_PREFIX = re.compile(r"@|//|/\*|\*|\s+\*")
+
+CHUNKING_MODES = ("plain", "syntax")
+
+
+def iter_chunks(text: str, chunk_size: int = 3000, overlap: int = 200) -> Iterator[str]:
+    """
+    Yield overlapping chunks of ``text``, each cut at whitespace where possible.
+
+    A window without any whitespace (minified code, long data lines) is cut hard at
+    ``chunk_size`` rather than dropped.
+    """
+    step = max(chunk_size - overlap, 1)
+    text_length = len(text)
+    start = 0
+    while start < text_length:
+        end = min(start + chunk_size, text_length)
+        if end < text_length:
+            cut = end
+            while cut > start and not text[cut - 1].isspace():
+                cut -= 1
+            if cut > start:
+                end = cut
+        chunk = text[start:end].strip()
+        if chunk:
+            yield chunk
+        start += step
+
+
+def language_of(file_path: str) -> Optional[str]:
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension in _PYTHON_EXTENSIONS:
+        return "python"
+    if extension in _JS_EXTENSIONS:
+        return "javascript"
+    return None
+
+
+def _definition_starts(text: str, language: str) -> List[int]:
+    """Offsets where top-level definitions begin, including decorators and comments just above them."""
+    boundary, prefix = (_PYTHON_BOUNDARY, _PYTHON_PREFIX) if language == "python" else (_JS_BOUNDARY, _JS_PREFIX)
+    starts = []
+    for match in boundary.finditer(text):
+        start = match.start()
+        # Walk up over decorator and comment lines directly above the definition
+        while start > 0:
+            line_start = text.rfind("\n", 0, start - 1) + 1
+            if not prefix.match(text, line_start, start):
+                break
+            start = line_start
+        if not starts or start > starts[-1]:
+            starts.append(start)
+    return starts
+
+
+def iter_code_chunks(
+    text: str, file_path: str, chunk_size: int = 3000, overlap: int = 200, mode: str = "syntax"
+) -> Iterator[str]:
+    """
+    Yield chunks of a decoded source file. In ``syntax`` mode Python and JS/TS files are
+    split between top-level definitions and consecutive definitions are packed together
+    up to ``chunk_size``; a definition longer than that is split by ``iter_chunks``.
+    """
+    if mode not in CHUNKING_MODES:
+        raise ValueError(f"Chunking mode must be one of {CHUNKING_MODES}, got {mode!r}")
+    language = language_of(file_path) if mode == "syntax" else None
+    if language is None or len(text) <= chunk_size:
+        yield from iter_chunks(text, chunk_size, overlap)
+        return
+
+    bounds = [0] + _definition_starts(text, language) + [len(text)]
+    pending_start = pending_end = 0
+    for start, end in zip(bounds, bounds[1:]):
+        if start == end:
+            continue
+        if end - pending_start <= chunk_size:
+            pending_end = end
+            continue
+        if pending_end > pending_start:
+            chunk = text[pending_start:pending_end].strip()
+            if chunk:
+                yield chunk
+        if end - start > chunk_size:
+            yield from iter_chunks(text[start:end], chunk_size, overlap)
+            pending_start = pending_end = end
+        else:
+            pending_start, pending_end = start, end
+    if pending_end > pending_start:
+        chunk = text[pending_start:pending_end].strip()
+        if chunk:
+            yield chunk
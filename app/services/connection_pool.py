@@ -0,0 +1,151 @@
+# app/services/connection_pool.py
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection became available in time."""
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of DB-API connections.
+
+    Connections are opened lazily, up to ``max_size``. Idle connections older than
+    ``max_idle_time`` are closed instead of reused, and a connection that sat idle for
+    more than ``health_check_interval`` is checked before being handed out; dead ones
+    are replaced transparently.
+    """
+
+    def __init__(
+        self,
+        connect: Callable[[], Any],
+        max_size: int = 4,
+        max_idle_time: float = 300.0,
+        health_check_interval: float = 60.0,
+        on_connect: Optional[Callable[[Any], None]] = None
+    ):
+        self._connect = connect
+        self.max_size = max_size
+        self.max_idle_time = max_idle_time
+        self.health_check_interval = health_check_interval
+        self.on_connect = on_connect
+        self._idle: List[Tuple[Any, float]] = []
+        self._open = 0
+        self._closed = False
+        self._condition = threading.Condition()
+        self.stats = {"opened": 0, "reused": 0, "recycled": 0, "dead": 0}
+
+    @staticmethod
+    def is_alive(conn) -> bool:
+        """Cheap liveness probe: the connector's own flag, then a trivial round trip."""
+        is_closed = getattr(conn, "is_closed", None)
+        if callable(is_closed) and is_closed():
+            return False
+        try:
+            cursor = conn.cursor()
+            try:
+                cursor.execute("SELECT 1")
+            finally:
+                cursor.close()
+            return True
+        except Exception:
+            return False
+
+    def _close_quietly(self, conn):
+        try:
+            conn.close()
+        except Exception as e:
+            logger.debug(f"Error closing pooled connection: {e}")
+
+    def _open_connection(self):
+        try:
+            conn = self._connect()
+            if self.on_connect:
+                self.on_connect(conn)
+        except Exception:
+            with self._condition:
+                self._open -= 1
+                self._condition.notify()
+            raise
+        self.stats["opened"] += 1
+        return conn
+
+    def acquire(self, timeout: Optional[float] = None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._condition:
+                if self._closed:
+                    raise RuntimeError("Connection pool is closed")
+                candidate = None
+                while self._idle:
+                    conn, released_at = self._idle.pop()
+                    if time.monotonic() - released_at > self.max_idle_time:
+                        self._open -= 1
+                        self.stats["recycled"] += 1
+                        self._close_quietly(conn)
+                        continue
+                    candidate = (conn, released_at)
+                    break
+                if candidate is None:
+                    if self._open < self.max_size:
+                        self._open += 1
+                        break
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        raise PoolTimeout(f"No connection available within {timeout}s")
+                    self._condition.wait(remaining)
+                    continue
+
+            conn, released_at = candidate
+            if time.monotonic() - released_at > self.health_check_interval and not self.is_alive(conn):
+                self.stats["dead"] += 1
+                logger.warning("Replacing dead pooled connection")
+                self._close_quietly(conn)
+                with self._condition:
+                    self._open -= 1
+                continue
+            self.stats["reused"] += 1
+            return conn
+
+        return self._open_connection()
+
+    def release(self, conn, discard: bool = False):
+        with self._condition:
+            if discard or self._closed:
+                self._open -= 1
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._condition.notify()
+        if discard or self._closed:
+            self._close_quietly(conn)
+
+    @contextmanager
+    def connection(self, timeout: Optional[float] = None):
+        """Borrow a connection; it is discarded instead of returned if it died while in use."""
+        conn = self.acquire(timeout)
+        try:
+            yield conn
+        except Exception:
+            self.release(conn, discard=not self.is_alive(conn))
+            raise
+        else:
+            self.release(conn)
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._open -= len(idle)
+            self._condition.notify_all()
+        for conn, _ in idle:
+            self._close_quietly(conn)
+
+    def summary(self) -> Dict:
+        with self._condition:
+            return {**self.stats, "open": self._open, "idle": len(self._idle), "max_size": self.max_size}
@@ -0,0 +1,275 @@
+# app/services/dedup.py
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, List, Optional, Tuple
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import zlib
+from app.core.config import get_settings
+
+# numpy loads with the first signature, not when ingestion imports this module
+if TYPE_CHECKING:
+    import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Words and single punctuation marks; whitespace and layout do not count
+_TOKEN = re.compile(r"\w+|[^\w\s]")
+
+
+def _token_hashes(text: str) -> "np.ndarray":
+    import numpy as np
+
+    tokens = _TOKEN.findall(text)
+    return np.fromiter((zlib.crc32(token.encode("utf-8")) for token in tokens), dtype=np.uint64, count=len(tokens))
+
+
+def lsh_parameters(num_perm: int, threshold: float) -> Tuple[int, int]:
+    """
+    (bands, rows) for banding a ``num_perm`` signature: the most rows per band whose
+    candidate threshold ``(1 / bands) ** (1 / rows)`` stays a little under ``threshold``,
+    so pairs near the threshold are still likely to share a band.
+    """
+    best = (num_perm, 1)
+    for rows in range(1, num_perm + 1):
+        bands = num_perm // rows
+        if (1 / bands) ** (1 / rows) <= threshold - 0.05:
+            best = (bands, rows)
+    return best
+
+
+class MinHasher:
+    """
+    MinHash signatures over shingles of ``shingle_size`` consecutive code tokens. Each
+    permutation is a multiply-shift hash (the high half of ``a * x + b`` modulo 2**64),
+    which needs no modulus and lets the arithmetic wrap.
+    """
+
+    def __init__(self, num_perm: int = 128, shingle_size: int = 5, seed: int = 1):
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        import numpy as np
+
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, 1 << 63, num_perm, dtype=np.uint64) | np.uint64(1)
+        self._b = rng.integers(0, 1 << 63, num_perm, dtype=np.uint64)
+        self._weights = rng.integers(1, 1 << 63, shingle_size, dtype=np.uint64) | np.uint64(1)
+
+    def signature(self, text: str) -> Optional["np.ndarray"]:
+        """The text's signature as uint32, or None when it has no tokens."""
+        import numpy as np
+
+        hashes = _token_hashes(text)
+        if not len(hashes):
+            return None
+        width = min(self.shingle_size, len(hashes))
+        windows = np.lib.stride_tricks.sliding_window_view(hashes, width)
+        shingles = np.unique((windows * self._weights[:width]).sum(axis=1))
+        return ((shingles[:, None] * self._a + self._b) >> np.uint64(32)).min(axis=0).astype(np.uint32)
+
+
+class DedupIndex:
+    """
+    MinHash signatures of stored chunks, banded for locality-sensitive lookups, in SQLite.
+
+    A chunk whose estimated Jaccard similarity to an indexed one reaches ``threshold`` is
+    a near-duplicate of it. Entries are added only once their chunk is committed and
+    should be removed whenever its rows are deleted; they are written in small
+    transactions of ``write_batch`` entries so several processes can share one file.
+    """
+
+    def __init__(self, path: Optional[str] = None, threshold: float = 0.9, num_perm: int = 128, write_batch: int = 256):
+        if not 0 < threshold <= 1:
+            raise ValueError(f"Dedup threshold must be in (0, 1], got {threshold}")
+        self.path = path
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self._hasher: Optional[MinHasher] = None
+        self.bands, self.rows = lsh_parameters(num_perm, threshold)
+        self.write_batch = write_batch
+        self._pending: List[tuple] = []
+        self._lock = threading.Lock()
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path or ":memory:", check_same_thread=False, isolation_level=None)
+        if path:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            # A lost entry only means one missed duplicate
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+        CREATE TABLE IF NOT EXISTS dedup_chunks (
+            chunk_id INTEGER PRIMARY KEY,
+            repo_name TEXT NOT NULL,
+            file_path TEXT NOT NULL,
+            chunk_index INTEGER NOT NULL,
+            signature BLOB NOT NULL,
+            payload_bytes INTEGER NOT NULL,
+            UNIQUE (repo_name, file_path, chunk_index)
+        )
+        """)
+        self._conn.execute("""
+        CREATE TABLE IF NOT EXISTS dedup_buckets (
+            bucket INTEGER NOT NULL,
+            chunk_id INTEGER NOT NULL,
+            PRIMARY KEY (bucket, chunk_id)
+        ) WITHOUT ROWID
+        """)
+
+    @classmethod
+    def from_settings(cls) -> "DedupIndex":
+        settings = get_settings()
+        path = os.path.join(settings.data_dir, "dedup.sqlite3") if settings.dedup_persistent else None
+        return cls(path, threshold=settings.dedup_threshold, num_perm=settings.dedup_num_perm)
+
+    @property
+    def hasher(self) -> MinHasher:
+        if self._hasher is None:
+            self._hasher = MinHasher(self.num_perm)
+        return self._hasher
+
+    def signature(self, text: str) -> Optional["np.ndarray"]:
+        return self.hasher.signature(text)
+
+    def _buckets(self, signature: "np.ndarray") -> List[int]:
+        return [
+            int.from_bytes(
+                hashlib.blake2b(bytes([band]) + signature[band * self.rows:(band + 1) * self.rows].tobytes(), digest_size=8).digest(),
+                "little", signed=True
+            )
+            for band in range(self.bands)
+        ]
+
+    def find(
+        self,
+        signature: Optional["np.ndarray"],
+        exists: Optional[Callable[[str, str, int], bool]] = None
+    ) -> Optional[Dict]:
+        """
+        The most similar indexed chunk at or above the threshold, as a dict with its
+        ``repo_name``, ``file_path``, ``chunk_index``, ``similarity`` and ``payload_bytes``.
+
+        ``exists(repo_name, file_path, chunk_index)`` confirms a match is still stored;
+        matches deleted behind the index's back are forgotten and the next best is tried.
+        """
+        if signature is None:
+            return None
+        import numpy as np
+
+        buckets = self._buckets(signature)
+        with self._lock:
+            rows = self._conn.execute(f"""
+            SELECT repo_name, file_path, chunk_index, signature, payload_bytes FROM dedup_chunks
+            WHERE chunk_id IN (SELECT chunk_id FROM dedup_buckets WHERE bucket IN ({', '.join('?' * len(buckets))}))
+            """, buckets).fetchall()
+            # Entries still waiting for their batch count as indexed already
+            wanted = set(buckets)
+            rows.extend(
+                (repo_name, file_path, chunk_index, other.tobytes(), payload_bytes)
+                for repo_name, file_path, chunk_index, other, payload_bytes, other_buckets in self._pending
+                if wanted.intersection(other_buckets)
+            )
+        matches = []
+        for repo_name, file_path, chunk_index, other, payload_bytes in rows:
+            similarity = float(np.mean(np.frombuffer(other, dtype=np.uint32) == signature))
+            if similarity >= self.threshold:
+                matches.append({
+                    "repo_name": repo_name, "file_path": file_path, "chunk_index": chunk_index,
+                    "similarity": similarity, "payload_bytes": payload_bytes
+                })
+        matches.sort(key=lambda match: match["similarity"], reverse=True)
+        for match in matches:
+            if exists is None or exists(match["repo_name"], match["file_path"], match["chunk_index"]):
+                return match
+            logger.info(f"Forgetting deleted dedup entry {match['repo_name']}/{match['file_path']}#{match['chunk_index']}")
+            self.remove_chunk(match["repo_name"], match["file_path"], match["chunk_index"])
+        return None
+
+    def add(self, repo_name: str, file_path: str, chunk_index: int, signature: Optional["np.ndarray"], payload_bytes: int = 0):
+        """Index a stored chunk; ``payload_bytes`` is what a reference to it saves storing."""
+        if signature is None:
+            return
+        buckets = self._buckets(signature)
+        with self._lock:
+            self._pending.append((repo_name, file_path, chunk_index, signature, payload_bytes, buckets))
+            if len(self._pending) >= self.write_batch:
+                self._write_pending()
+
+    def _write_pending(self):
+        entries, self._pending = self._pending, []
+        if not entries:
+            return
+        self._conn.execute("BEGIN")
+        try:
+            for repo_name, file_path, chunk_index, signature, payload_bytes, buckets in entries:
+                self._delete_where("repo_name = ? AND file_path = ? AND chunk_index = ?", (repo_name, file_path, chunk_index))
+                chunk_id = self._conn.execute(
+                    "INSERT INTO dedup_chunks (repo_name, file_path, chunk_index, signature, payload_bytes) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (repo_name, file_path, chunk_index, signature.tobytes(), payload_bytes)
+                ).lastrowid
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO dedup_buckets (bucket, chunk_id) VALUES (?, ?)",
+                    [(bucket, chunk_id) for bucket in buckets]
+                )
+            self._conn.execute("COMMIT")
+        except Exception as e:
+            self._conn.execute("ROLLBACK")
+            logger.error(f"Error writing {len(entries)} dedup entries: {e}")
+            raise
+
+    def _delete_where(self, where: str, params: tuple):
+        import numpy as np
+
+        rows = self._conn.execute(f"SELECT chunk_id, signature FROM dedup_chunks WHERE {where}", params).fetchall()
+        for chunk_id, signature in rows:
+            self._conn.executemany(
+                "DELETE FROM dedup_buckets WHERE bucket = ? AND chunk_id = ?",
+                [(bucket, chunk_id) for bucket in self._buckets(np.frombuffer(signature, dtype=np.uint32))]
+            )
+        if rows:
+            self._conn.execute(f"DELETE FROM dedup_chunks WHERE {where}", params)
+
+    def remove_files(self, repo_name: str, file_paths: Iterable[str]):
+        """Forget the chunks of files whose rows are being deleted."""
+        file_paths = set(file_paths)
+        if not file_paths:
+            return
+        with self._lock:
+            self._pending = [entry for entry in self._pending if not (entry[0] == repo_name and entry[1] in file_paths)]
+            self._conn.execute("BEGIN")
+            for file_path in file_paths:
+                self._delete_where("repo_name = ? AND file_path = ?", (repo_name, file_path))
+            self._conn.execute("COMMIT")
+
+    def remove_chunk(self, repo_name: str, file_path: str, chunk_index: int):
+        with self._lock:
+            self._pending = [entry for entry in self._pending if entry[:3] != (repo_name, file_path, chunk_index)]
+            self._conn.execute("BEGIN")
+            self._delete_where("repo_name = ? AND file_path = ? AND chunk_index = ?", (repo_name, file_path, chunk_index))
+            self._conn.execute("COMMIT")
+
+    def remove_repository(self, repo_name: str):
+        with self._lock:
+            self._pending = [entry for entry in self._pending if entry[0] != repo_name]
+            self._conn.execute("BEGIN")
+            self._conn.execute(
+                "DELETE FROM dedup_buckets WHERE chunk_id IN (SELECT chunk_id FROM dedup_chunks WHERE repo_name = ?)",
+                (repo_name,)
+            )
+            self._conn.execute("DELETE FROM dedup_chunks WHERE repo_name = ?", (repo_name,))
+            self._conn.execute("COMMIT")
+
+    def flush(self):
+        """Write entries still waiting for a full batch."""
+        with self._lock:
+            self._write_pending()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM dedup_chunks").fetchone()[0] + len(self._pending)
+
+    def close(self):
+        self.flush()
+        self._conn.close()
@@ -0,0 +1,68 @@
+# app/services/embedding_codec.py
+"""
+Compact binary encodings for embeddings stored in Snowflake.
+
+Each packed value starts with a one-byte tag naming its encoding, so a column can hold
+rows written under different settings (e.g. while a migration is in flight):
+
+* ``float32``: 4 bytes per dimension, lossless for the model's output.
+* ``float16``: 2 bytes per dimension.
+* ``int8``: symmetric scalar quantization, 1 byte per dimension plus a float32 scale.
+
+``json`` is the legacy ``{"vector": [...]}`` VARIANT form, kept for reading old rows.
+Rows stored with the ``vector`` encoding hold a native VECTOR column instead, which the
+connector returns as a list of floats.
+"""
+from typing import Optional, Sequence
+import json
+import struct
+import numpy as np
+
+ENCODINGS = ("float32", "float16", "int8")
+_TAGS = {"float32": 1, "float16": 2, "int8": 3}
+_DTYPES = {1: "<f4", 2: "<f2"}
+_SCALE = struct.Struct("<f")
+
+
+def encode_embedding(vector: Sequence[float], encoding: str = "float32") -> bytes:
+    """Pack an embedding into ``encoding``'s tagged binary form."""
+    if encoding not in _TAGS:
+        raise ValueError(f"Unknown embedding encoding: {encoding}")
+    values = np.asarray(vector, dtype=np.float32)
+    tag = _TAGS[encoding]
+    if encoding == "int8":
+        peak = float(np.abs(values).max()) if len(values) else 0.0
+        scale = peak / 127 if peak else 1.0
+        quantized = np.clip(np.rint(values / scale), -127, 127).astype(np.int8)
+        return bytes([tag]) + _SCALE.pack(scale) + quantized.tobytes()
+    return bytes([tag]) + values.astype(_DTYPES[tag]).tobytes()
+
+
+def decode_embedding(packed: bytes) -> np.ndarray:
+    """Unpack a value written by :func:`encode_embedding` into float32."""
+    packed = bytes(packed)
+    tag = packed[0]
+    if tag == _TAGS["int8"]:
+        (scale,) = _SCALE.unpack_from(packed, 1)
+        return np.frombuffer(packed, dtype=np.int8, offset=1 + _SCALE.size).astype(np.float32) * np.float32(scale)
+    if tag not in _DTYPES:
+        raise ValueError(f"Unknown embedding encoding tag: {tag}")
+    return np.frombuffer(packed, dtype=_DTYPES[tag], offset=1).astype(np.float32)
+
+
+def parse_json_embedding(value) -> np.ndarray:
+    """Legacy VARIANT embeddings come back as JSON text, possibly wrapping a JSON string."""
+    while isinstance(value, str):
+        value = json.loads(value)
+    return np.asarray(value["vector"] if isinstance(value, dict) else value, dtype=np.float32)
+
+
+def read_embedding(packed: Optional[bytes], legacy=None, vector=None) -> Optional[np.ndarray]:
+    """Decode a row's embedding from whichever column holds it; None when none does."""
+    if packed is not None:
+        return decode_embedding(packed)
+    if legacy is not None:
+        return parse_json_embedding(legacy)
+    if vector is not None:
+        return np.asarray(vector, dtype=np.float32)
+    return None
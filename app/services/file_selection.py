@@ -0,0 +1,213 @@
+# app/services/file_selection.py
+from functools import lru_cache
+from typing import Dict, Iterable, Optional
+import os
+import re
+from app.core.config import get_settings
+
+DEFAULT_EXTENSIONS = ('.py', '.js', '.ts', '.jsx', '.tsx', '.md', '.rst', '.yaml', '.yml', '.json')
+
+# Dependency trees checked into a repository; their code is not the repository's own
+VENDORED_PATTERNS = (
+    "node_modules/", "bower_components/", "jspm_packages/", "vendor/", "vendored/", "third_party/",
+    "third-party/", "site-packages/", ".venv/", "venv/", "Pods/",
+)
+
+# Build output, lockfiles and code written by tools
+GENERATED_PATTERNS = (
+    "/dist/", "/build/", "__generated__/", "*.min.js", "*-min.js", "*.min.css", "*.bundle.js", "*.chunk.js",
+    "*.map", "*.generated.*", "*_pb2.py", "*_pb2_grpc.py", "*.pb.go", "package-lock.json", "npm-shrinkwrap.json",
+    "yarn.lock", "pnpm-lock.yaml", "poetry.lock", "Pipfile.lock", "composer.lock", "Cargo.lock", "Gemfile.lock",
+    "go.sum",
+)
+
+# Bytes that occur in text: printable ASCII and above, plus the usual control characters
+_TEXT_BYTES = bytes({7, 8, 9, 10, 12, 13, 27} | set(range(0x20, 0x100)) - {0x7f})
+
+
+def glob_to_regex(pattern: str) -> str:
+    """
+    Regex source for a gitignore-style pattern over repository-relative paths. A pattern
+    without a slash (other than a trailing one) matches a name at any depth, otherwise it
+    is anchored at the root; ``*`` and ``?`` stay within one path component, ``**`` spans
+    any number of them, and a trailing slash matches only directories (so everything
+    under them). A pattern matching a directory matches the files under it.
+    """
+    directory = pattern.endswith("/")
+    pattern = pattern.rstrip("/")
+    anchored = "/" in pattern
+    pattern = pattern.lstrip("/")
+    parts = []
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if pattern.startswith("**/", i):
+            parts.append("(?:.*/)?")
+            i += 3
+            continue
+        if pattern.startswith("**", i):
+            parts.append(".*")
+            i += 2
+            continue
+        if char == "*":
+            parts.append("[^/]*")
+        elif char == "?":
+            parts.append("[^/]")
+        elif char == "[" and "]" in pattern[i + 2:]:
+            end = pattern.index("]", i + 2)
+            body = pattern[i + 1:end]
+            parts.append("[" + ("^" + body[1:] if body.startswith("!") else body).replace("\\", "\\\\") + "]")
+            i = end + 1
+            continue
+        else:
+            parts.append(re.escape(char))
+        i += 1
+    prefix = "" if anchored else "(?:.*/)?"
+    return prefix + "".join(parts) + ("/.*$" if directory else "(?:/.*)?$")
+
+
+class PathPatterns:
+    """
+    A list of gitignore-style patterns, matched in one pass. Blank lines and ``#``
+    comments are ignored; negation (``!``) is not supported, use the include list.
+    """
+    __slots__ = ("patterns", "_regex")
+
+    def __init__(self, patterns: Iterable[str] = ()):
+        self.patterns = [
+            pattern.strip() for pattern in patterns if pattern.strip() and not pattern.strip().startswith("#")
+        ]
+        self._regex = re.compile("|".join(
+            f"(?P<p{index}>{glob_to_regex(pattern)})" for index, pattern in enumerate(self.patterns)
+        )) if self.patterns else None
+
+    def __bool__(self) -> bool:
+        return bool(self.patterns)
+
+    def match(self, path: str) -> Optional[str]:
+        """The pattern that matches ``path``, if any."""
+        if self._regex is None:
+            return None
+        match = self._regex.match(path)
+        return self.patterns[int(match.lastgroup[1:])] if match else None
+
+
+_VENDORED = PathPatterns(VENDORED_PATTERNS)
+_GENERATED = PathPatterns(GENERATED_PATTERNS)
+
+
+def format_size(size: int) -> str:
+    for unit in ("B", "KB", "MB"):
+        if size < 1024 or unit == "MB":
+            return f"{size} {unit}" if unit == "B" else f"{size:.1f} {unit}".replace(".0 ", " ")
+        size /= 1024
+
+
+class FileSelectionPolicy:
+    """
+    Which files of a repository are ingested. ``skip_reason`` is asked on the tree listing,
+    before anything is downloaded: exclude patterns, then include patterns (or, without
+    any, the extension list), vendored and generated paths and the size caps.
+    ``content_skip_reason`` looks at the first bytes of a fetched file for binary or
+    minified content. Both return None for a file to keep, otherwise ``"<kind>: <detail>"``.
+
+    Files matching an include pattern are taken even under vendored or generated paths;
+    exclude patterns and the size caps always apply.
+    """
+    __slots__ = (
+        "extensions", "max_bytes", "size_caps", "include", "exclude", "skip_vendored", "skip_generated",
+        "sniff_bytes", "max_average_line_length",
+    )
+
+    def __init__(
+        self,
+        extensions: Iterable[str] = DEFAULT_EXTENSIONS,
+        max_bytes: int = 1_000_000,
+        size_caps: Optional[Dict[str, int]] = None,
+        include: Iterable[str] = (),
+        exclude: Iterable[str] = (),
+        skip_vendored: bool = True,
+        skip_generated: bool = True,
+        sniff_bytes: int = 8192,
+        max_average_line_length: int = 300
+    ):
+        self.extensions = frozenset(extension.lower() for extension in extensions)
+        self.max_bytes = max_bytes
+        # Per-extension caps in bytes; other files are capped at max_bytes (0 for no cap)
+        self.size_caps = {extension.lower(): cap for extension, cap in (size_caps or {}).items()}
+        self.include = PathPatterns(include)
+        self.exclude = PathPatterns(exclude)
+        self.skip_vendored = skip_vendored
+        self.skip_generated = skip_generated
+        self.sniff_bytes = sniff_bytes
+        self.max_average_line_length = max_average_line_length
+
+    @classmethod
+    def from_settings(cls) -> "FileSelectionPolicy":
+        settings = get_settings()
+        return cls(
+            extensions=settings.file_extensions,
+            max_bytes=settings.file_max_bytes,
+            size_caps=settings.file_size_caps,
+            include=settings.file_include,
+            exclude=settings.file_exclude,
+            skip_vendored=settings.file_skip_vendored,
+            skip_generated=settings.file_skip_generated,
+            sniff_bytes=settings.file_sniff_bytes,
+            max_average_line_length=settings.file_max_average_line_length
+        )
+
+    def skip_reason(self, path: str, size: Optional[int] = None) -> Optional[str]:
+        """Why the file at ``path`` (of ``size`` bytes, if known) is not ingested; None to ingest it."""
+        pattern = self.exclude.match(path)
+        if pattern is not None:
+            return f"excluded: matches {pattern!r}"
+        extension = os.path.splitext(path)[1].lower()
+        included = self.include.match(path) if self.include else None
+        if self.include:
+            if included is None:
+                return "not_included: matches no include pattern"
+        elif extension not in self.extensions:
+            return f"extension: {extension or 'none'} is not selected"
+        if included is None:
+            if self.skip_vendored and (pattern := _VENDORED.match(path)) is not None:
+                return f"vendored: matches {pattern!r}"
+            if self.skip_generated and (pattern := _GENERATED.match(path)) is not None:
+                return f"generated: matches {pattern!r}"
+        return self._size_reason(extension, size)
+
+    def content_skip_reason(self, path: str, data: Optional[bytes]) -> Optional[str]:
+        """Why the fetched ``data`` of ``path`` is not ingested; None to ingest it."""
+        if not data:
+            return None
+        # The tree listing may not have had the size
+        reason = self._size_reason(os.path.splitext(path)[1].lower(), len(data))
+        if reason is not None:
+            return reason
+        sample = data[:self.sniff_bytes]
+        if b"\0" in sample:
+            return f"binary: NUL bytes in the first {format_size(len(sample))}"
+        if len(sample.translate(None, _TEXT_BYTES)) > len(sample) * 0.3:
+            return f"binary: mostly control bytes in the first {format_size(len(sample))}"
+        average = len(sample) / (sample.count(b"\n") + 1)
+        if len(sample) >= 1024 and average > self.max_average_line_length:
+            return f"minified: lines average {average:.0f} characters"
+        return None
+
+    def is_selected(self, path: str, size: Optional[int] = None) -> bool:
+        return self.skip_reason(path, size) is None
+
+    def _size_reason(self, extension: str, size: Optional[int]) -> Optional[str]:
+        if size is None:
+            return None
+        cap = self.size_caps.get(extension, self.max_bytes)
+        if cap and size > cap:
+            scope = f"for {extension} files" if extension in self.size_caps else "per file"
+            return f"too_large: {format_size(size)} over the {format_size(cap)} cap {scope}"
+        return None
+
+
+@lru_cache
+def default_policy() -> FileSelectionPolicy:
+    """The policy of the settings, shared by everything that does not get its own."""
+    return FileSelectionPolicy.from_settings()
@@ -1,63 +1,191 @@
 # app/services/github.py
-from typing import List, Dict, Optional
+from typing import AsyncIterator, Callable, List, Dict, Optional, Tuple
+import asyncio
+import base64
+import importlib.util
+import logging
 import httpx
 from app.core.config import get_settings
+from app.services.archive import iter_tar_files
+from app.services.file_selection import default_policy
+from app.services.http_cache import HTTPCache
+from app.services.rate_limit import RateLimitScheduler
 
-settings = get_settings()
+logger = logging.getLogger(__name__)
 
 class GitHubService:
-    def __init__(self):
+    def __init__(
+        self,
+        max_connections: Optional[int] = None,
+        max_keepalive_connections: Optional[int] = None,
+        keepalive_expiry: Optional[float] = None,
+        http2: Optional[bool] = None,
+        timeout: Optional[float] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        scheduler: Optional[RateLimitScheduler] = None,
+        cache: Optional[HTTPCache] = None
+    ):
+        settings = get_settings()
         self.base_url = "https://api.github.com"
         self.headers = {
             "Authorization": f"token {settings.github_token}",
             "Accept": "application/vnd.github.v3+json"
         }
-    
-    async def get_repository_content(self, owner: str, repo: str, path: str = "") -> List[Dict]:
-        async with httpx.AsyncClient(follow_redirects=True) as client:
-            response = await client.get(
-            f"{self.base_url}/repos/{owner}/{repo}/contents/{path}",
-            headers=self.headers
-         )
+        # An explicit 0 is a setting too (e.g. no keep-alive), so only None falls back
+        self.limits = httpx.Limits(
+            max_connections=settings.github_max_connections if max_connections is None else max_connections,
+            max_keepalive_connections=(
+                settings.github_max_keepalive_connections
+                if max_keepalive_connections is None else max_keepalive_connections
+            ),
+            keepalive_expiry=settings.github_keepalive_expiry if keepalive_expiry is None else keepalive_expiry
+        )
+        self.timeout = settings.github_timeout if timeout is None else timeout
+        self.http2 = settings.github_http2 if http2 is None else http2
+        if self.http2 and importlib.util.find_spec("h2") is None:
+            logger.warning("HTTP/2 requested but the 'h2' package is not installed; using HTTP/1.1")
+            self.http2 = False
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        # Every request goes through one scheduler so retries and throttling see the whole run
+        self.scheduler = scheduler or RateLimitScheduler(
+            max_concurrency=settings.github_max_concurrency,
+            max_retries=settings.github_max_retries,
+            backoff_base=settings.github_backoff_base,
+            backoff_max=settings.github_backoff_max,
+            max_wait=settings.github_rate_limit_max_wait,
+            reserve=settings.github_rate_limit_reserve
+        )
+        self.cache = cache if cache is not None else (
+            HTTPCache.from_settings() if settings.github_cache_enabled else None
+        )
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Shared client, created on first use and reused for every request."""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                headers=self.headers,
+                limits=self.limits,
+                timeout=self.timeout,
+                http2=self.http2,
+                transport=self._transport,
+                follow_redirects=True
+            )
+        return self._client
+
+    async def __aenter__(self) -> "GitHubService":
+        self.client
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
+
+    async def aclose(self):
+        """Close the shared client and release its pooled connections."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _get(self, url: str) -> httpx.Response:
+        """
+        GET through the response cache and the rate limit scheduler; raises once retries
+        are exhausted. Cached immutable objects skip the request altogether, other cached
+        responses are revalidated, and a 304 answer is served from the cache. The cache is
+        SQLite, so its calls run on a worker thread rather than the event loop.
+        """
+        cached = await asyncio.to_thread(self.cache.get, url) if self.cache else None
+        if cached is not None and cached.immutable:
+            await asyncio.to_thread(self.cache.hit, url)
+            return httpx.Response(200, content=cached.body, request=httpx.Request("GET", url))
+
+        headers = {}
+        if cached is not None:
+            if cached.etag:
+                headers["If-None-Match"] = cached.etag
+            if cached.last_modified:
+                headers["If-Modified-Since"] = cached.last_modified
+        response = await self.scheduler.request(lambda: self.client.get(url, headers=headers))
+        if response.status_code == 304:
+            if cached is not None:
+                if not await asyncio.to_thread(self.cache.hit, url, True):
+                    # Evicted since it was read, e.g. by another process sharing the file
+                    await asyncio.to_thread(
+                        self.cache.store, url, cached.body, response.headers.get("etag") or cached.etag,
+                        response.headers.get("last-modified") or cached.last_modified
+                    )
+                return httpx.Response(200, content=cached.body, request=response.request)
+            # Nothing to serve it from: ask again without validators
+            logger.warning(f"Got 304 for {url} with no cached body; requesting it unconditionally")
+            response = await self.scheduler.request(
+                lambda: self.client.get(url, headers={"Cache-Control": "no-cache"})
+            )
         response.raise_for_status()
-        return response.json()
+        if self.cache:
+            await asyncio.to_thread(self.cache.miss)
+            await asyncio.to_thread(
+                self.cache.store, url, response.content, response.headers.get("etag"), response.headers.get("last-modified")
+            )
+        return response
 
-        
+    async def get_repository_content(self, owner: str, repo: str, path: str = "") -> List[Dict]:
+        response = await self._get(f"{self.base_url}/repos/{owner}/{repo}/contents/{path}")
+        return response.json()
 
-        
-    
     async def get_file_content(self, file_url: str) -> Optional[str]:
-       async with httpx.AsyncClient(follow_redirects=True) as client:
-            response = await client.get(file_url, headers=self.headers)
-            response.raise_for_status()
-            return response.json().get("content")
+        response = await self._get(file_url)
+        return response.json().get("content")
+
+    async def get_file_data(self, file_url: str) -> Optional[bytes]:
+        """Raw bytes of a blob, decoded from the API's base64 payload."""
+        content = await self.get_file_content(file_url)
+        return base64.b64decode(content) if content is not None else None
 
-    
     async def get_repository_tree(self, owner: str, repo: str) -> List[Dict]:
         """Get complete repository tree recursively"""
-        async with httpx.AsyncClient(follow_redirects=True) as client:
+        return (await self.get_tree(owner, repo))[1]
+
+    async def get_tree(self, owner: str, repo: str) -> Tuple[Optional[str], List[Dict]]:
+        """The SHA of the default branch's root tree and its entries, recursively."""
         # Get default branch
-            repo_response = await client.get(
-             f"{self.base_url}/repos/{owner}/{repo}",
-              headers=self.headers
-              )
-            repo_response.raise_for_status()
-            default_branch = repo_response.json()["default_branch"]
-
-    # Get tree
-            tree_response = await client.get(
-            f"{self.base_url}/repos/{owner}/{repo}/git/trees/{default_branch}?recursive=1",
-             headers=self.headers
-              )
-            tree_response.raise_for_status()
-        return tree_response.json()["tree"]
+        repo_response = await self._get(f"{self.base_url}/repos/{owner}/{repo}")
+        default_branch = repo_response.json()["default_branch"]
+
+        # Get tree
+        tree_response = await self._get(
+            f"{self.base_url}/repos/{owner}/{repo}/git/trees/{default_branch}?recursive=1"
+        )
+        tree = tree_response.json()
+        return tree.get("sha"), tree["tree"]
 
+    async def iter_archive_files(
+        self,
+        owner: str,
+        repo: str,
+        ref: str = "",
+        include: Optional[Callable[[str, int], bool]] = None
+    ) -> AsyncIterator[Tuple[str, bytes]]:
+        """
+        Download the repository tarball once and stream out the files accepted by
+        ``include(path, size)``. Paths are relative to the repository root; the
+        archive is never written to disk or held in memory as a whole.
+        """
+        url = f"{self.base_url}/repos/{owner}/{repo}/tarball/{ref}".rstrip("/")
+        # Only opening the download is retried; a stream that breaks halfway fails the run
+        response = await self.scheduler.request(
+            lambda: self.client.send(self.client.build_request("GET", url), stream=True)
+        )
+        try:
+            response.raise_for_status()
+            # GitHub prefixes every member with "<owner>-<repo>-<sha>/"
+            async for path, data in iter_tar_files(
+                response.aiter_bytes(), include=include, strip_components=1
+            ):
+                yield path, data
+        finally:
+            await response.aclose()
 
     @staticmethod
-    def is_processable_file(path: str) -> bool:
-        """Check if file should be processed based on extension"""
-        processable_extensions = {
-            '.py', '.js', '.ts', '.jsx', '.tsx', '.md', 
-            '.rst', '.yaml', '.yml', '.json'
-        }
-        return any(path.endswith(ext) for ext in processable_extensions)
\ No newline at end of file
+    def is_processable_file(path: str, size: Optional[int] = None) -> bool:
+        """Check if file should be processed, by the file policy of the settings"""
+        return default_policy().is_selected(path, size)
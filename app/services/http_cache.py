@@ -0,0 +1,160 @@
+# app/services/http_cache.py
+from typing import Dict, Optional
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from app.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+# Git objects addressed by SHA never change, whichever repository or URL they come from
+_IMMUTABLE_URL = re.compile(r"/git/(blobs|trees)/([0-9a-f]{40})(\?.*)?$")
+
+
+class CachedResponse:
+    __slots__ = ("body", "etag", "last_modified", "immutable")
+
+    def __init__(self, body: bytes, etag: Optional[str], last_modified: Optional[str], immutable: bool):
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+        self.immutable = immutable
+
+
+class HTTPCache:
+    """
+    Response bodies of GET requests with their validators (ETag, Last-Modified), kept in
+    SQLite so they survive restarts. Blobs and trees fetched by SHA are immutable: they
+    are keyed by SHA, shared across URLs, and served without asking GitHub again.
+    Everything else is revalidated with a conditional request. Least recently used
+    entries are evicted once the bodies exceed ``max_bytes``.
+
+    Several processes may share the file, so the size is read from the database (the sum
+    of the stored bodies) each time this process has written another 1% of the budget,
+    rather than tracked in memory. Every method blocks on SQLite; async callers should
+    run them off the event loop.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_bytes: int = 256 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path or ":memory:", check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        if path:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+        CREATE TABLE IF NOT EXISTS http_cache (
+            key TEXT PRIMARY KEY,
+            body BLOB NOT NULL,
+            etag TEXT,
+            last_modified TEXT,
+            immutable INTEGER NOT NULL,
+            size INTEGER NOT NULL,
+            last_access REAL NOT NULL
+        )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS http_cache_lru ON http_cache (last_access)")
+        # Bytes stored by this process since the total was last read from the database
+        self._unchecked = 0
+        self._check_every = max(max_bytes // 100, 1)
+        self.stats = {"fresh_hits": 0, "revalidated": 0, "misses": 0, "stored": 0, "evictions": 0}
+
+    @classmethod
+    def from_settings(cls) -> "HTTPCache":
+        settings = get_settings()
+        path = os.path.join(settings.data_dir, "github_http_cache.sqlite3") if settings.github_cache_persistent else None
+        return cls(path, max_bytes=settings.github_cache_max_bytes)
+
+    @staticmethod
+    def key(url: str) -> str:
+        match = _IMMUTABLE_URL.search(url)
+        return f"{match.group(1)}:{match.group(2)}{match.group(3) or ''}" if match else url
+
+    @staticmethod
+    def is_immutable(url: str) -> bool:
+        return _IMMUTABLE_URL.search(url) is not None
+
+    def get(self, url: str) -> Optional[CachedResponse]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT body, etag, last_modified, immutable FROM http_cache WHERE key = ?", (self.key(url),)
+            ).fetchone()
+        if row is None:
+            return None
+        return CachedResponse(row[0], row[1], row[2], bool(row[3]))
+
+    def miss(self):
+        with self._lock:
+            self.stats["misses"] += 1
+
+    def hit(self, url: str, revalidated: bool = False) -> bool:
+        """
+        Record that a cached body was used, refreshing its place in the LRU order. False
+        when the entry is gone meanwhile, e.g. evicted by another process.
+        """
+        with self._lock:
+            self.stats["revalidated" if revalidated else "fresh_hits"] += 1
+            cursor = self._conn.execute("UPDATE http_cache SET last_access = ? WHERE key = ?", (time.time(), self.key(url)))
+            return cursor.rowcount > 0
+
+    def store(self, url: str, body: bytes, etag: Optional[str] = None, last_modified: Optional[str] = None):
+        key = self.key(url)
+        immutable = self.is_immutable(url)
+        if not (immutable or etag or last_modified) or len(body) > self.max_bytes:
+            return
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO http_cache (key, body, etag, last_modified, immutable, size, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, body, etag, last_modified, int(immutable), len(body), time.time())
+            )
+            self.stats["stored"] += 1
+            self._unchecked += len(body)
+            if self._unchecked >= self._check_every:
+                self._unchecked = 0
+                if self._stored_bytes() > self.max_bytes:
+                    self._evict()
+
+    def _stored_bytes(self) -> int:
+        return self._conn.execute("SELECT COALESCE(SUM(LENGTH(body)), 0) FROM http_cache").fetchone()[0]
+
+    def _evict(self):
+        """Drop least recently used entries until the cache is back under 90% of its budget."""
+        target = int(self.max_bytes * 0.9)
+        evicted = 0
+        # Holds the write lock from the start, so processes evicting at once see each other's deletes
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            size = self._stored_bytes()
+            rows = self._conn.execute("SELECT key, LENGTH(body) FROM http_cache ORDER BY last_access")
+            for key, body_size in rows.fetchall():
+                if size <= target:
+                    break
+                self._conn.execute("DELETE FROM http_cache WHERE key = ?", (key,))
+                size -= body_size
+                evicted += 1
+            self._conn.execute("COMMIT")
+        except Exception as e:
+            self._conn.execute("ROLLBACK")
+            logger.error(f"Error evicting HTTP cache entries: {e}")
+            raise
+        self.stats["evictions"] += evicted
+        logger.info(f"Evicted {evicted} HTTP cache entries ({size} bytes kept)")
+
+    @property
+    def size_bytes(self) -> int:
+        with self._lock:
+            return self._stored_bytes()
+
+    def summary(self) -> Dict:
+        hits = self.stats["fresh_hits"] + self.stats["revalidated"]
+        lookups = hits + self.stats["misses"]
+        return {**self.stats, "hits": hits, "hit_rate": hits / lookups if lookups else 0.0, "size_bytes": self.size_bytes}
+
+    def close(self):
+        self._conn.close()
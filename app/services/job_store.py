@@ -0,0 +1,251 @@
+# app/services/job_store.py
+from typing import Dict, Iterable, List, Optional, Tuple
+import logging
+import os
+import sqlite3
+import threading
+import time
+from app.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+# A job in one of these states was interrupted and can be picked up again
+RESUMABLE_STATUSES = ("running", "failed")
+FILE_STATUSES = ("pending", "done", "skipped")
+
+
+class JobStore:
+    """
+    Durable records of ingestion jobs in SQLite: the tree SHA a job was planned against,
+    the status of every file it has to process and the last committed write batch.
+    Jobs are kept per owner, repository and shard, so forks and the shards of one
+    repository never pick up each other's checkpoints.
+
+    A file is marked done only after all of its chunks are committed, so after a crash
+    every file not marked done may be partially stored: the resuming run deletes its
+    rows and processes it again, and files already done are skipped.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path or ":memory:", check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        if path:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            # Losing the last marks to a power failure only means redoing those files
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+        CREATE TABLE IF NOT EXISTS ingestion_jobs (
+            job_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            repo_name TEXT NOT NULL,
+            owner TEXT,
+            shard_index INTEGER,
+            shard_count INTEGER,
+            tree_sha TEXT,
+            incremental INTEGER NOT NULL,
+            status TEXT NOT NULL,
+            total_files INTEGER NOT NULL,
+            done_files INTEGER NOT NULL DEFAULT 0,
+            skipped_files INTEGER NOT NULL DEFAULT 0,
+            stored_chunks INTEGER NOT NULL DEFAULT 0,
+            last_batch INTEGER NOT NULL DEFAULT 0,
+            resumes INTEGER NOT NULL DEFAULT 0,
+            error TEXT,
+            started_at REAL NOT NULL,
+            updated_at REAL NOT NULL,
+            finished_at REAL
+        )
+        """)
+        # Stores written before jobs were kept per owner and shard
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(ingestion_jobs)")}
+        for column in ("shard_index", "shard_count"):
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE ingestion_jobs ADD COLUMN {column} INTEGER")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ingestion_jobs_repo ON ingestion_jobs (repo_name, job_id)")
+        self._conn.execute("""
+        CREATE TABLE IF NOT EXISTS ingestion_job_files (
+            job_id INTEGER NOT NULL,
+            file_path TEXT NOT NULL,
+            file_sha TEXT,
+            status TEXT NOT NULL,
+            chunks INTEGER NOT NULL DEFAULT 0,
+            reason TEXT,
+            PRIMARY KEY (job_id, file_path)
+        )
+        """)
+
+    @classmethod
+    def from_settings(cls) -> "JobStore":
+        settings = get_settings()
+        path = os.path.join(settings.data_dir, "ingestion_jobs.sqlite3") if settings.ingestion_jobs_persistent else None
+        return cls(path)
+
+    def _fetch_job(self, where: str, params: tuple) -> Optional[Dict]:
+        with self._lock:
+            cursor = self._conn.execute(f"SELECT * FROM ingestion_jobs WHERE {where} ORDER BY job_id DESC LIMIT 1", params)
+            row = cursor.fetchone()
+            if row is None:
+                return None
+            return dict(zip([column[0] for column in cursor.description], row))
+
+    def _fetch_shard_job(
+        self, repo_name: str, owner: Optional[str], shard: Optional[Tuple[int, int]]
+    ) -> Optional[Dict]:
+        index, count = shard if shard is not None else (None, None)
+        return self._fetch_job(
+            "repo_name = ? AND owner IS ? AND shard_index IS ? AND shard_count IS ?", (repo_name, owner, index, count)
+        )
+
+    def create_job(
+        self, repo_name: str, owner: Optional[str], tree_sha: Optional[str], files: Dict[str, Optional[str]],
+        incremental: bool = True, shard: Optional[Tuple[int, int]] = None
+    ) -> int:
+        """Record a new running job over ``files`` (path -> blob SHA), all pending."""
+        index, count = shard if shard is not None else (None, None)
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                job_id = self._conn.execute(
+                    "INSERT INTO ingestion_jobs (repo_name, owner, shard_index, shard_count, tree_sha, incremental, "
+                    "status, total_files, started_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, 'running', ?, ?, ?)",
+                    (repo_name, owner, index, count, tree_sha, int(incremental), len(files), now, now)
+                ).lastrowid
+                self._conn.executemany(
+                    "INSERT INTO ingestion_job_files (job_id, file_path, file_sha, status) VALUES (?, ?, ?, 'pending')",
+                    [(job_id, path, sha) for path, sha in files.items()]
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return job_id
+
+    def resumable_job(
+        self, repo_name: str, owner: Optional[str] = None, shard: Optional[Tuple[int, int]] = None
+    ) -> Optional[Dict]:
+        """The latest job of a repository (shard) if it never completed."""
+        job = self._fetch_shard_job(repo_name, owner, shard)
+        return job if job and job["status"] in RESUMABLE_STATUSES else None
+
+    def latest_job(self, repo_name: str, owner: Optional[str] = None) -> Optional[Dict]:
+        """The latest job of a repository, of any shard; of any owner when ``owner`` is None."""
+        if owner is None:
+            return self._fetch_job("repo_name = ?", (repo_name,))
+        return self._fetch_job("repo_name = ? AND owner = ?", (repo_name, owner))
+
+    def unfinished_files(self, job_id: int) -> List[str]:
+        """Files of a job not yet marked done, skipped ones included: they may be partially stored."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT file_path FROM ingestion_job_files WHERE job_id = ? AND status != 'done'", (job_id,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def resume_job(self, job_id: int, paths: Iterable[str]):
+        """Reset ``paths`` to pending and mark the job running again."""
+        paths = list(paths)
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "UPDATE ingestion_job_files SET status = 'pending', chunks = 0, reason = NULL "
+                "WHERE job_id = ? AND file_path = ?",
+                [(job_id, path) for path in paths]
+            )
+            self._conn.execute(
+                "UPDATE ingestion_jobs SET status = 'running', resumes = resumes + 1, error = NULL, "
+                "finished_at = NULL, updated_at = ?, "
+                "skipped_files = (SELECT COUNT(*) FROM ingestion_job_files WHERE job_id = ? AND status = 'skipped') "
+                "WHERE job_id = ?",
+                (time.time(), job_id, job_id)
+            )
+            self._conn.execute("COMMIT")
+
+    def mark_file(
+        self, job_id: int, file_path: str, status: str, chunks: int = 0, reason: Optional[str] = None,
+        last_batch: Optional[int] = None
+    ):
+        """Record a file's outcome; ``done`` must only be set once its chunks are committed."""
+        if status not in FILE_STATUSES:
+            raise ValueError(f"File status must be one of {FILE_STATUSES}, got {status!r}")
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.execute(
+                "UPDATE ingestion_job_files SET status = ?, chunks = ?, reason = ? WHERE job_id = ? AND file_path = ?",
+                (status, chunks, reason, job_id, file_path)
+            )
+            self._conn.execute(
+                "UPDATE ingestion_jobs SET done_files = done_files + ?, skipped_files = skipped_files + ?, "
+                "stored_chunks = stored_chunks + ?, last_batch = COALESCE(?, last_batch), updated_at = ? "
+                "WHERE job_id = ?",
+                (int(status == "done"), int(status == "skipped"), chunks if status == "done" else 0,
+                 last_batch, time.time(), job_id)
+            )
+            self._conn.execute("COMMIT")
+
+    def finish_job(self, job_id: int, status: str, error: Optional[str] = None):
+        """Close a job as ``completed``, ``failed`` (resumable) or ``abandoned``."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE ingestion_jobs SET status = ?, error = ?, updated_at = ?, finished_at = ? WHERE job_id = ?",
+                (status, error, now, now, job_id)
+            )
+
+    def progress(self, repo_name: str, owner: Optional[str] = None) -> Optional[Dict]:
+        """
+        The latest ingestion of a repository with its completion, throughput and time left;
+        without ``owner``, of whichever owner ran last. A sharded ingestion is reported as
+        one job over the latest job of every shard, listed under ``shards``; shards that
+        have not started yet are listed under ``missing_shards``.
+        """
+        latest = self.latest_job(repo_name, owner)
+        if latest is None:
+            return None
+        count = latest["shard_count"]
+        if count is None:
+            return self._with_rates(latest)
+
+        shards = [self._fetch_shard_job(repo_name, latest["owner"], (index, count)) for index in range(count)]
+        present = [job for job in shards if job is not None]
+        statuses = {job["status"] for job in present}
+        status = next(
+            (status for status in ("running", "failed", "abandoned") if status in statuses), "completed"
+        )
+        finished = [job["finished_at"] for job in present]
+        job = {
+            "repo_name": repo_name,
+            "owner": latest["owner"],
+            "shard_count": count,
+            "status": "partial" if status == "completed" and len(present) < count else status,
+            "resumes": sum(job["resumes"] for job in present),
+            "started_at": min(job["started_at"] for job in present),
+            "updated_at": max(job["updated_at"] for job in present),
+            "finished_at": max(finished) if None not in finished else None,
+            **{
+                column: sum(job[column] for job in present)
+                for column in ("total_files", "done_files", "skipped_files", "stored_chunks")
+            },
+            "shards": [self._with_rates(job) for job in present],
+            "missing_shards": [index for index, job in enumerate(shards) if job is None]
+        }
+        return self._with_rates(job)
+
+    @staticmethod
+    def _with_rates(job: Dict) -> Dict:
+        finished = job["done_files"] + job["skipped_files"]
+        elapsed = (job["finished_at"] or time.time()) - job["started_at"]
+        rate = finished / elapsed if elapsed > 0 else 0.0
+        remaining = job["total_files"] - finished
+        return {
+            **job,
+            "pending_files": remaining,
+            "percent_complete": round(100.0 * finished / job["total_files"], 1) if job["total_files"] else 100.0,
+            "files_per_second": round(rate, 2),
+            "eta_seconds": round(remaining / rate, 1) if job["status"] == "running" and rate and remaining else None
+        }
+
+    def close(self):
+        self._conn.close()
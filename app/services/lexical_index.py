@@ -0,0 +1,176 @@
+# app/services/lexical_index.py
+from array import array
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import math
+import os
+import re
+import sqlite3
+import threading
+import numpy as np
+
+_IDENTIFIER = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+# Words inside an identifier: snake_case parts, camelCase humps, acronyms, digit runs
+_SUBWORD = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|[0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercased identifiers and the words inside them: ``getFileShas`` yields
+    ``getfileshas``, ``get``, ``file`` and ``shas``, so both the exact symbol and
+    its parts match. Single characters are dropped.
+    """
+    tokens = []
+    for identifier in _IDENTIFIER.findall(text):
+        lower = identifier.lower()
+        if len(lower) > 1:
+            tokens.append(lower)
+        parts = _SUBWORD.findall(identifier)
+        if len(parts) > 1 or (parts and parts[0].lower() != lower):
+            tokens.extend(part.lower() for part in parts if len(part) > 1)
+    return tokens
+
+
+class LexicalIndex:
+    """
+    BM25 inverted index over code tokens, keyed by the same row ids as the vector index.
+
+    Posting lists live in SQLite as a ``WITHOUT ROWID`` table clustered by term, so one
+    term's postings are a single range read; each posting carries its document length so
+    scoring needs no second lookup. Document frequencies and corpus totals are kept in
+    memory and rebuilt from the postings on open.
+    """
+
+    K1 = 1.2
+    B = 0.75
+    # Terms in more than this share of documents (and at least COMMON_TERM_MIN_DF of them)
+    # barely move BM25 and cost the most to read; they are skipped when rarer ones match
+    COMMON_TERM_RATIO = 0.5
+    COMMON_TERM_MIN_DF = 1000
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path or ":memory:", check_same_thread=False)
+        self._lock = threading.RLock()
+        self._db.execute("CREATE TABLE IF NOT EXISTS terms (term_id INTEGER PRIMARY KEY, term TEXT UNIQUE NOT NULL)")
+        self._db.execute("""
+        CREATE TABLE IF NOT EXISTS postings (
+            term_id INTEGER NOT NULL,
+            doc_id INTEGER NOT NULL,
+            tf INTEGER NOT NULL,
+            doc_len INTEGER NOT NULL,
+            PRIMARY KEY (term_id, doc_id)
+        ) WITHOUT ROWID
+        """)
+        # Term ids of each document, packed, so removing it touches only its own postings
+        self._db.execute("CREATE TABLE IF NOT EXISTS docs (doc_id INTEGER PRIMARY KEY, length INTEGER NOT NULL, terms BLOB NOT NULL)")
+        self._db.commit()
+        self._vocab: Dict[str, int] = dict(self._db.execute("SELECT term, term_id FROM terms"))
+        self._df: Dict[int, int] = dict(self._db.execute("SELECT term_id, COUNT(*) FROM postings GROUP BY term_id"))
+        self.doc_count, self.total_length = self._db.execute("SELECT COUNT(*), COALESCE(SUM(length), 0) FROM docs").fetchone()
+
+    def __len__(self) -> int:
+        return self.doc_count
+
+    def _term_ids(self, terms: Iterable[str]) -> Dict[str, int]:
+        new = [term for term in set(terms) if term not in self._vocab]
+        if new:
+            self._db.executemany("INSERT OR IGNORE INTO terms (term) VALUES (?)", [(term,) for term in new])
+            for start in range(0, len(new), 500):
+                batch = new[start:start + 500]
+                self._vocab.update(self._db.execute(
+                    f"SELECT term, term_id FROM terms WHERE term IN ({', '.join('?' * len(batch))})", batch
+                ))
+        return self._vocab
+
+    def add(self, ids: Sequence[int], texts: Sequence[str]):
+        """Index documents; an id already present is replaced."""
+        if not len(ids):
+            return
+        with self._lock:
+            self.remove(ids)
+            counted = [Counter(tokenize(text)) for text in texts]
+            vocab = self._term_ids(term for counts in counted for term in counts)
+            postings, docs = [], []
+            for doc_id, counts in zip(ids, counted):
+                length = sum(counts.values())
+                term_ids = array("I", (vocab[term] for term in counts))
+                postings.extend((vocab[term], int(doc_id), tf, length) for term, tf in counts.items())
+                docs.append((int(doc_id), length, term_ids.tobytes()))
+                for term_id in term_ids:
+                    self._df[term_id] = self._df.get(term_id, 0) + 1
+                self.doc_count += 1
+                self.total_length += length
+            self._db.executemany("INSERT INTO postings (term_id, doc_id, tf, doc_len) VALUES (?, ?, ?, ?)", postings)
+            self._db.executemany("INSERT INTO docs (doc_id, length, terms) VALUES (?, ?, ?)", docs)
+            self._db.commit()
+
+    def remove(self, ids: Iterable[int]):
+        ids = [int(doc_id) for doc_id in ids]
+        with self._lock:
+            removed = []
+            for start in range(0, len(ids), 500):
+                batch = ids[start:start + 500]
+                removed.extend(self._db.execute(
+                    f"SELECT doc_id, length, terms FROM docs WHERE doc_id IN ({', '.join('?' * len(batch))})", batch
+                ))
+            if not removed:
+                return
+            postings = []
+            for doc_id, length, terms in removed:
+                term_ids = array("I")
+                term_ids.frombytes(terms)
+                postings.extend((term_id, doc_id) for term_id in term_ids)
+                for term_id in term_ids:
+                    self._df[term_id] -= 1
+                self.doc_count -= 1
+                self.total_length -= length
+            self._db.executemany("DELETE FROM postings WHERE term_id = ? AND doc_id = ?", postings)
+            self._db.executemany("DELETE FROM docs WHERE doc_id = ?", [(row[0],) for row in removed])
+            self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM postings")
+            self._db.execute("DELETE FROM docs")
+            self._db.commit()
+            self._df.clear()
+            self.doc_count = self.total_length = 0
+
+    def search(self, text: str, limit: int = 100) -> List[Tuple[int, float]]:
+        """The ``limit`` best (doc_id, BM25 score) pairs for the tokens of ``text``."""
+        with self._lock:
+            if not self.doc_count:
+                return []
+            terms = {self._vocab[token] for token in tokenize(text) if token in self._vocab}
+            terms = [term_id for term_id in terms if self._df.get(term_id)]
+            if not terms:
+                return []
+            common = max(self.COMMON_TERM_RATIO * self.doc_count, self.COMMON_TERM_MIN_DF)
+            rare = [term_id for term_id in terms if self._df[term_id] <= common]
+            terms = rare or terms
+            average = self.total_length / self.doc_count
+            doc_ids, contributions = [], []
+            for term_id in terms:
+                rows = np.array(
+                    self._db.execute("SELECT doc_id, tf, doc_len FROM postings WHERE term_id = ?", (term_id,)).fetchall(),
+                    dtype=np.float64
+                ).reshape(-1, 3)
+                df = self._df[term_id]
+                idf = math.log(1 + (self.doc_count - df + 0.5) / (df + 0.5))
+                tf, length = rows[:, 1], rows[:, 2]
+                doc_ids.append(rows[:, 0].astype(np.int64))
+                contributions.append(idf * tf * (self.K1 + 1) / (tf + self.K1 * (1 - self.B + self.B * length / average)))
+
+        doc_ids = np.concatenate(doc_ids)
+        unique, inverse = np.unique(doc_ids, return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(contributions))
+        limit = min(limit, len(unique))
+        top = np.argpartition(-scores, limit - 1)[:limit]
+        top = top[np.argsort(-scores[top])]
+        return [(int(unique[i]), float(scores[i])) for i in top]
+
+    def close(self):
+        self._db.close()
@@ -0,0 +1,254 @@
+# app/services/metrics.py
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Sequence, Tuple
+import asyncio
+import cProfile
+import io
+import logging
+import os
+import pstats
+import time
+import tracemalloc
+
+logger = logging.getLogger(__name__)
+
+# Seconds; covers a cached lookup up to a slow model call
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+PROFILE_MODES = ("cprofile", "tracemalloc")
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in pairs) + "}"
+
+
+class Counter:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+
+class Gauge:
+    """A sampled value, remembering the highest one seen."""
+
+    __slots__ = ("value", "max")
+
+    def __init__(self):
+        self.value = 0.0
+        self.max = 0.0
+
+    def set(self, value: float):
+        self.value = value
+        self.max = max(self.max, value)
+
+
+class Histogram:
+    """Observations counted into fixed buckets; quantiles are interpolated within a bucket."""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    @contextmanager
+    def time(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for idx, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = self.buckets[idx - 1] if idx > 0 else 0.0
+                if idx == len(self.buckets):
+                    return lower  # beyond the last bucket; its bound is all we know
+                return lower + (self.buckets[idx] - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+
+class MetricsRegistry:
+    """
+    Counters, gauges and histograms keyed by name and labels. Recording is a dict lookup
+    and an add, cheap enough for per-chunk use. Read them back as Prometheus text
+    exposition (``render_prometheus``) or as a nested dict (``summary``).
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, Dict[LabelKey, object]] = {}
+        self._types: Dict[str, str] = {}
+        self._help: Dict[str, str] = {}
+
+    def _get(self, kind: str, name: str, labels: Dict[str, str], factory):
+        if self._types.setdefault(name, kind) != kind:
+            raise ValueError(f"Metric {name} is a {self._types[name]}, not a {kind}")
+        series = self._metrics.setdefault(name, {})
+        key = _label_key(labels)
+        metric = series.get(key)
+        if metric is None:
+            metric = series[key] = factory()
+        return metric
+
+    def describe(self, name: str, help_text: str):
+        self._help[name] = help_text
+
+    def counter(self, name: str, **labels) -> Counter:
+        return self._get("counter", name, labels, Counter)
+
+    def gauge(self, name: str, **labels) -> Gauge:
+        return self._get("gauge", name, labels, Gauge)
+
+    def histogram(self, name: str, buckets: Sequence[float] = DEFAULT_BUCKETS, **labels) -> Histogram:
+        return self._get("histogram", name, labels, lambda: Histogram(buckets))
+
+    def render_prometheus(self) -> str:
+        lines = []
+        for name, series in self._metrics.items():
+            kind = self._types[name]
+            if name in self._help:
+                lines.append(f"# HELP {name} {self._help[name]}")
+            lines.append(f"# TYPE {name} {kind}")
+            for key, metric in series.items():
+                if kind == "histogram":
+                    cumulative = 0
+                    for bound, count in zip(metric.buckets + (float("inf"),), metric.counts):
+                        cumulative += count
+                        le = "+Inf" if bound == float("inf") else repr(bound)
+                        lines.append(f"{name}_bucket{_format_labels(key, ('le', le))} {cumulative}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {metric.sum}")
+                    lines.append(f"{name}_count{_format_labels(key)} {metric.count}")
+                else:
+                    lines.append(f"{name}{_format_labels(key)} {metric.value}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> Dict[str, Dict]:
+        """Per metric and label set: counter values, gauge value and max, histogram count/mean/p50/p99."""
+        result = {}
+        for name, series in self._metrics.items():
+            kind = self._types[name]
+            entries = {}
+            for key, metric in series.items():
+                label = ",".join(f"{k}={v}" for k, v in key) or "total"
+                if kind == "counter":
+                    entries[label] = metric.value
+                elif kind == "gauge":
+                    entries[label] = {"value": metric.value, "max": metric.max}
+                else:
+                    entries[label] = {
+                        "count": metric.count,
+                        "mean": round(metric.sum / metric.count, 6) if metric.count else 0.0,
+                        "p50": round(metric.quantile(0.5), 6),
+                        "p99": round(metric.quantile(0.99), 6)
+                    }
+            result[name] = entries
+        return result
+
+
+class MemorySampler:
+    """
+    Samples the process's resident memory into a gauge every ``interval`` seconds from a
+    background task, so memory is watched without a syscall per unit of work.
+    """
+
+    def __init__(self, metrics: MetricsRegistry, interval: float = 1.0):
+        self.gauge = metrics.gauge("process_resident_memory_bytes")
+        metrics.describe("process_resident_memory_bytes", "Resident set size, sampled")
+        self.interval = interval
+        # Only ingestion runs sample memory, so psutil loads here rather than at import
+        import psutil
+        self._process = psutil.Process()
+        self._task: Optional[asyncio.Task] = None
+
+    def sample(self):
+        self.gauge.set(self._process.memory_info().rss)
+
+    async def _run(self):
+        while True:
+            self.sample()
+            await asyncio.sleep(self.interval)
+
+    async def __aenter__(self):
+        if self.interval > 0:
+            self._task = asyncio.create_task(self._run())
+        return self
+
+    async def __aexit__(self, *exc):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.sample()
+
+
+@contextmanager
+def profile_run(mode: Optional[str], name: str, directory: str, top: int = 20) -> Iterator[None]:
+    """
+    Profile the enclosed block. ``cprofile`` writes ``<name>.prof`` (readable with pstats)
+    to ``directory``; ``tracemalloc`` logs the top allocation sites and the peak. Both log
+    a short top-``top`` report. A falsy ``mode`` does nothing.
+    """
+    if not mode:
+        yield
+        return
+    if mode not in PROFILE_MODES:
+        raise ValueError(f"Profile mode must be one of {PROFILE_MODES}, got {mode!r}")
+
+    if mode == "cprofile":
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, f"{name}.prof")
+            profiler.dump_stats(path)
+            report = io.StringIO()
+            pstats.Stats(profiler, stream=report).sort_stats("cumulative").print_stats(top)
+            logger.info(f"Profile written to {path}\n{report.getvalue()}")
+        return
+
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    try:
+        yield
+    finally:
+        snapshot = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        if started:
+            tracemalloc.stop()
+        stats = snapshot.statistics("lineno")[:top]
+        lines = "\n".join(str(stat) for stat in stats)
+        logger.info(f"Peak traced memory {peak / (1024 * 1024):.2f} MB; top allocations:\n{lines}")
@@ -1,10 +1,24 @@
 from app.core.config import get_settings
+from typing import Iterator
+import re
+import time
 
 class MistralService:
-    def __init__(self):
+    embedding_model = "mistral-embed"
+    chat_model = "mistral-large-latest"
+    # Bump when the backend changes so cached model outputs are not reused
+    model_version = "mock-1"
+
+    def __init__(self, latency: float = 0.0):
         # Load API key from environment variables or config
         settings = get_settings()
         self.api_key = settings.mistral_api_key
+        # Simulated round-trip time per API call for the mock backend
+        self.latency = latency
+
+    def _simulate_call(self):
+        if self.latency:
+            time.sleep(self.latency)
 
     def generate_embedding(self, text: str) -> list[float]:
         """
@@ -12,18 +26,44 @@ class MistralService:
         Mock implementation here. Replace with actual API integration if needed.
         """
         # Replace with actual embedding logic
+        self._simulate_call()
         return [0.1, 0.2, 0.3]
 
+    def generate_embeddings(self, texts: list[str]) -> list[list[float]]:
+        """
+        Generate embeddings for several texts with a single API call.
+        The embeddings endpoint accepts a list of inputs and returns vectors in the same order.
+        """
+        self._simulate_call()
+        return [[0.1, 0.2, 0.3] for _ in texts]
+
     def generate_response(self, prompt: str, messages: list[dict]) -> str:
         """
         Generate a response using the Mistral API.
         Mock implementation returning a clean summary.
         """
         # Mock meaningful summary for code analysis
+        self._simulate_call()
         return "This is a code repository for an expert system."
 
+    def generate_responses(self, prompt: str, conversations: list[list[dict]]) -> list[str]:
+        """
+        Generate one response per conversation, all sharing the same prompt.
+        Mock implementation costing a single simulated round trip for the whole batch.
+        """
+        self._simulate_call()
+        return ["This is a code repository for an expert system." for _ in conversations]
+
+    def stream_response(self, prompt: str, messages: list[dict]) -> Iterator[str]:
+        """
+        Generate a response as it is produced, yielding pieces of text that join into it.
+        Mock implementation yielding the response word by word after one round trip.
+        """
+        self._simulate_call()
+        yield from re.findall(r"\S+\s*", "This is a code repository for an expert system.")
+
     def close(self):
         """
         Placeholder for cleanup logic if needed.
         """
-        pass
\ No newline at end of file
+        pass
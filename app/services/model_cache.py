@@ -0,0 +1,279 @@
+# app/services/model_cache.py
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from app.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+# Rough bookkeeping cost of a memory tier entry (dict slot, link, object headers) in bytes
+_ENTRY_OVERHEAD = 200
+
+
+def cache_key(kind: str, model: str, version: str, content: str) -> str:
+    """Content address of a model result: the same input to the same model version hashes alike."""
+    digest = hashlib.sha256()
+    for part in (kind, model, version):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    digest.update(content.encode("utf-8", "surrogatepass"))
+    return digest.hexdigest()
+
+
+def pack_value(value: Any) -> Any:
+    """
+    The compact form a value is cached in: embeddings as float32 codec bytes, which
+    the model's output fits without loss, anything else as is.
+    """
+    if isinstance(value, (list, tuple)) and value and isinstance(value[0], float):
+        from app.services.embedding_codec import encode_embedding
+
+        return encode_embedding(value, "float32")
+    return value
+
+
+def unpack_value(value: Any) -> Any:
+    if isinstance(value, bytes):
+        from app.services.embedding_codec import decode_embedding
+
+        return decode_embedding(value).tolist()
+    return value
+
+
+class ModelCache:
+    """
+    Two-tier cache for model outputs: an in-memory LRU in front of an optional SQLite
+    file. Both tiers hold embeddings packed as float32 bytes (see ``pack_value``) and
+    are bounded in bytes: the memory tier drops least-recently-used entries past
+    ``memory_bytes``, the file tier once it grows past ``max_bytes``. Safe to share
+    between the worker threads that run model calls.
+    """
+
+    def __init__(
+        self, path: Optional[str] = None, memory_bytes: int = 64 * 1024 * 1024, max_bytes: int = 512 * 1024 * 1024
+    ):
+        self.path = path
+        self.memory_bytes = memory_bytes
+        self.max_bytes = max_bytes
+        self._memory: "OrderedDict[str, Any]" = OrderedDict()
+        self._memory_size = 0
+        self._lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+        self._conn = None
+        self._size = 0
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS model_cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS model_cache_lru ON model_cache (last_access)")
+            self._size = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM model_cache").fetchone()[0]
+
+    @classmethod
+    def from_settings(cls) -> "ModelCache":
+        settings = get_settings()
+        path = os.path.join(settings.data_dir, "model_cache.sqlite3") if settings.model_cache_persistent else None
+        return cls(path, memory_bytes=settings.model_cache_memory_bytes, max_bytes=settings.model_cache_max_bytes)
+
+    @staticmethod
+    def _footprint(key: str, packed: Any) -> int:
+        return len(key) + (len(packed) if isinstance(packed, (bytes, str)) else len(json.dumps(packed))) + _ENTRY_OVERHEAD
+
+    def _remember(self, key: str, packed: Any):
+        """Keep a packed value in the memory tier, dropping the least recently used past its budget."""
+        previous = self._memory.pop(key, None)
+        if previous is not None:
+            self._memory_size -= self._footprint(key, previous)
+        self._memory[key] = packed
+        self._memory_size += self._footprint(key, packed)
+        while self._memory_size > self.memory_bytes and self._memory:
+            old_key, old_value = self._memory.popitem(last=False)
+            self._memory_size -= self._footprint(old_key, old_value)
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """Look keys up in memory, then on disk; returns only the keys that were found."""
+        found = {}
+        with self._lock:
+            missing = []
+            for key in keys:
+                if key in self._memory:
+                    self._memory.move_to_end(key)
+                    found[key] = unpack_value(self._memory[key])
+                    self.stats["memory_hits"] += 1
+                else:
+                    missing.append(key)
+
+            if missing and self._conn is not None:
+                now = time.time()
+                for start in range(0, len(missing), 500):
+                    batch = missing[start:start + 500]
+                    rows = self._conn.execute(
+                        f"SELECT key, value FROM model_cache WHERE key IN ({', '.join('?' * len(batch))})",
+                        batch
+                    ).fetchall()
+                    for key, value in rows:
+                        # Entries written before embeddings were packed hold JSON text
+                        packed = value if isinstance(value, bytes) else pack_value(json.loads(value))
+                        found[key] = unpack_value(packed)
+                        self._remember(key, packed)
+                    self._conn.executemany(
+                        "UPDATE model_cache SET last_access = ? WHERE key = ?",
+                        [(now, key) for key, _ in rows]
+                    )
+                    self.stats["disk_hits"] += len(rows)
+
+            self.stats["misses"] += sum(1 for key in missing if key not in found)
+        return found
+
+    def set_many(self, items: Iterable[Tuple[str, Any]]):
+        items = [(key, pack_value(value)) for key, value in items]
+        with self._lock:
+            for key, packed in items:
+                self._remember(key, packed)
+            if self._conn is None:
+                return
+            now = time.time()
+            # Packed embeddings go in as BLOBs, which the TEXT column keeps as they are
+            rows = [(key, packed if isinstance(packed, bytes) else json.dumps(packed)) for key, packed in items]
+            self._conn.execute("BEGIN")
+            for key, value in rows:
+                previous = self._conn.execute("SELECT size FROM model_cache WHERE key = ?", (key,)).fetchone()
+                self._size += len(value) - (previous[0] if previous else 0)
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO model_cache (key, value, size, last_access) VALUES (?, ?, ?, ?)",
+                    (key, value, len(value), now)
+                )
+            self._conn.execute("COMMIT")
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """Drop least recently used entries until the file tier is back under 90% of its budget."""
+        target = int(self.max_bytes * 0.9)
+        evicted = 0
+        self._conn.execute("BEGIN")
+        for key, size in self._conn.execute(
+            "SELECT key, size FROM model_cache ORDER BY last_access"
+        ).fetchall():
+            if self._size <= target:
+                break
+            self._conn.execute("DELETE FROM model_cache WHERE key = ?", (key,))
+            self._size -= size
+            evicted += 1
+        self._conn.execute("COMMIT")
+        self.stats["evictions"] += evicted
+        logger.info(f"Evicted {evicted} model cache entries ({self._size} bytes kept)")
+
+    def get(self, key: str) -> Optional[Any]:
+        return self.get_many([key]).get(key)
+
+    def set(self, key: str, value: Any):
+        self.set_many([(key, value)])
+
+    @property
+    def size_bytes(self) -> int:
+        return self._size
+
+    @property
+    def memory_size_bytes(self) -> int:
+        return self._memory_size
+
+    def summary(self) -> Dict:
+        hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+        lookups = hits + self.stats["misses"]
+        return {
+            **self.stats, "hits": hits, "hit_rate": hits / lookups if lookups else 0.0, "size_bytes": self._size,
+            "memory_bytes": self._memory_size
+        }
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+class CachedMistralService:
+    """
+    Drop-in front for MistralService that answers repeated inputs from a ModelCache.
+    Only cache misses reach the wrapped service, still batched.
+    """
+
+    def __init__(self, mistral_service, cache: ModelCache):
+        self.mistral_service = mistral_service
+        self.cache = cache
+
+    @property
+    def embedding_model(self) -> str:
+        return self.mistral_service.embedding_model
+
+    @property
+    def chat_model(self) -> str:
+        return self.mistral_service.chat_model
+
+    @property
+    def model_version(self) -> str:
+        return self.mistral_service.model_version
+
+    def _cached_batch(self, keys: List[str], compute) -> List[Any]:
+        found = self.cache.get_many(keys)
+        # First position of every missing key, so duplicates within a batch are computed once
+        missing: Dict[str, int] = {}
+        for idx, key in enumerate(keys):
+            if key not in found and key not in missing:
+                missing[key] = idx
+        if missing:
+            new_items = dict(zip(missing, compute(list(missing.values()))))
+            self.cache.set_many(new_items.items())
+            found.update(new_items)
+        return [found[key] for key in keys]
+
+    def generate_embeddings(self, texts: List[str]) -> List[List[float]]:
+        keys = [cache_key("embedding", self.embedding_model, self.model_version, text) for text in texts]
+        return self._cached_batch(
+            keys, lambda missing: self.mistral_service.generate_embeddings([texts[idx] for idx in missing])
+        )
+
+    def generate_embedding(self, text: str) -> List[float]:
+        return self.generate_embeddings([text])[0]
+
+    def generate_responses(self, prompt: str, conversations: List[List[Dict]]) -> List[str]:
+        keys = [
+            cache_key("summary", self.chat_model, self.model_version, json.dumps([prompt, messages], sort_keys=True))
+            for messages in conversations
+        ]
+        return self._cached_batch(
+            keys,
+            lambda missing: self.mistral_service.generate_responses(prompt, [conversations[idx] for idx in missing])
+        )
+
+    def generate_response(self, prompt: str, messages: List[Dict]) -> str:
+        return self.generate_responses(prompt, [messages])[0]
+
+    def stream_response(self, prompt: str, messages: List[Dict]) -> Iterator[str]:
+        """A cached response in one piece, else the wrapped service's stream, cached once complete."""
+        key = cache_key("summary", self.chat_model, self.model_version, json.dumps([prompt, messages], sort_keys=True))
+        cached = self.cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+        pieces = []
+        for piece in self.mistral_service.stream_response(prompt, messages):
+            pieces.append(piece)
+            yield piece
+        self.cache.set(key, "".join(pieces))
+
+    def close(self):
+        self.mistral_service.close()
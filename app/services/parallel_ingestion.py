@@ -0,0 +1,169 @@
+# app/services/parallel_ingestion.py
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+from app.core.config import get_settings
+from app.core.logging import configure_logging
+from app.services.github import GitHubService
+from app.services.rate_limit import RateLimitScheduler, SharedRateBudget
+from app.services.repository_ingestion import RepositoryProcessor
+
+logger = logging.getLogger(__name__)
+
+
+class IngestionTask:
+    """One unit of work for a worker process: a repository, or one shard of it."""
+
+    __slots__ = ("owner", "repo", "shard")
+
+    def __init__(self, owner: str, repo: str, shard: Optional[Tuple[int, int]] = None):
+        self.owner = owner
+        self.repo = repo
+        self.shard = shard
+
+    @property
+    def name(self) -> str:
+        name = f"{self.owner}/{self.repo}"
+        return name if self.shard is None else f"{name}[{self.shard[0]}/{self.shard[1]}]"
+
+    def __repr__(self) -> str:
+        return f"IngestionTask({self.name})"
+
+
+def shard_tasks(owner: str, repo: str, shards: int) -> List[IngestionTask]:
+    """Split one large repository into ``shards`` tasks over disjoint sets of files."""
+    if shards <= 1:
+        return [IngestionTask(owner, repo)]
+    return [IngestionTask(owner, repo, (index, shards)) for index in range(shards)]
+
+
+def default_processor(task: IngestionTask, scheduler: RateLimitScheduler) -> RepositoryProcessor:
+    """A processor with its own GitHub client, model and Snowflake connections, throttled by ``scheduler``."""
+    return RepositoryProcessor(github_service=GitHubService(scheduler=scheduler), shard=task.shard)
+
+
+# Set in each worker process by _init_worker
+_worker_budget: Optional[SharedRateBudget] = None
+_worker_factory: Callable[[IngestionTask, RateLimitScheduler], RepositoryProcessor] = default_processor
+
+
+def _init_worker(budget: SharedRateBudget, factory: Optional[Callable]):
+    global _worker_budget, _worker_factory
+    _worker_budget = budget
+    _worker_factory = factory or default_processor
+    configure_logging()
+
+
+def _run_task(task: IngestionTask, incremental: bool) -> Dict:
+    """Ingest one task in this worker's own event loop and report how it went."""
+    settings = get_settings()
+    scheduler = RateLimitScheduler(
+        max_concurrency=settings.github_max_concurrency,
+        max_retries=settings.github_max_retries,
+        backoff_base=settings.github_backoff_base,
+        backoff_max=settings.github_backoff_max,
+        max_wait=settings.github_rate_limit_max_wait,
+        reserve=settings.github_rate_limit_reserve,
+        budget=_worker_budget
+    )
+    processor = _worker_factory(task, scheduler)
+    started = time.perf_counter()
+    ok = asyncio.run(processor.ingest_repository(task.owner, task.repo, incremental=incremental))
+    metrics = processor.metrics.summary()
+    files = metrics.get("ingest_files_total", {})
+    chunks = metrics.get("ingest_chunks_total", {})
+    dedup = processor.dedup_report()
+    return {
+        "task": task.name,
+        "ok": ok,
+        "pid": os.getpid(),
+        "seconds": round(time.perf_counter() - started, 3),
+        "files": int(files.get("outcome=ok", 0)),
+        "skipped_files": int(files.get("outcome=skipped", 0)),
+        "excluded_files": len(processor.excluded_files),
+        "chunks": int(chunks.get("outcome=stored", 0)),
+        "failed_chunks": int(chunks.get("outcome=failed", 0)),
+        "bytes": int(metrics.get("ingest_bytes_total", {}).get("total", 0)),
+        "duplicate_chunks": dedup["duplicate_chunks"],
+        "model_calls_saved": dedup["model_calls_saved"],
+        "bytes_saved": dedup["bytes_saved"],
+        "github_requests": scheduler.stats["requests"],
+        "github_throttled": scheduler.stats["throttled"],
+        "skipped": dict(processor.skipped_files)
+    }
+
+
+def ingest_repositories(
+    tasks: Iterable[IngestionTask],
+    processes: Optional[int] = None,
+    incremental: bool = True,
+    max_concurrency: Optional[int] = None,
+    requests_per_second: Optional[float] = None,
+    processor_factory: Optional[Callable[[IngestionTask, RateLimitScheduler], RepositoryProcessor]] = None
+) -> Dict:
+    """
+    Ingest several repositories (or shards of one, see :func:`shard_tasks`) in a pool of
+    worker processes. Each worker runs its own event loop, pipeline and connections, so
+    decoding, chunking and hashing use every core. All workers draw GitHub requests from
+    one :class:`SharedRateBudget`: at most ``max_concurrency`` in flight in total, at most
+    ``requests_per_second`` overall, and a rate limit hit by one pauses all of them.
+
+    ``processor_factory(task, scheduler)`` builds each task's processor in the worker; it
+    must be importable by name (a module-level function or a ``functools.partial`` of one).
+    Returns one report with per-task results and totals.
+    """
+    settings = get_settings()
+    tasks = list(tasks)
+    processes = processes or settings.ingestion_processes or os.cpu_count() or 1
+    processes = max(1, min(processes, len(tasks)))
+    context = multiprocessing.get_context("spawn")
+    budget = SharedRateBudget(
+        max_concurrency or settings.github_max_concurrency,
+        requests_per_second if requests_per_second is not None else (settings.github_requests_per_second or None),
+        context=context
+    )
+
+    logger.info(f"Ingesting {len(tasks)} tasks in {processes} worker processes")
+    started = time.perf_counter()
+    results = []
+    with ProcessPoolExecutor(
+        max_workers=processes, mp_context=context, initializer=_init_worker, initargs=(budget, processor_factory)
+    ) as pool:
+        futures = {pool.submit(_run_task, task, incremental): task for task in tasks}
+        for future in as_completed(futures):
+            task = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                logger.error(f"Ingestion of {task.name} failed in its worker: {e}")
+                result = {"task": task.name, "ok": False, "error": str(e)}
+            logger.info(f"Finished {task.name}: {result}")
+            results.append(result)
+
+    elapsed = time.perf_counter() - started
+    totals = {
+        key: sum(result.get(key, 0) for result in results)
+        for key in (
+            "files", "skipped_files", "excluded_files", "chunks", "failed_chunks", "bytes", "duplicate_chunks",
+            "model_calls_saved", "bytes_saved", "github_requests", "github_throttled"
+        )
+    }
+    report = {
+        "tasks": len(tasks),
+        "succeeded": sum(1 for result in results if result.get("ok")),
+        "processes": processes,
+        "seconds": round(elapsed, 3),
+        **totals,
+        "files_per_second": round(totals["files"] / elapsed, 2) if elapsed else 0.0,
+        "chunks_per_second": round(totals["chunks"] / elapsed, 2) if elapsed else 0.0,
+        "results": sorted(results, key=lambda result: result["task"])
+    }
+    logger.info(
+        f"Ingested {report['succeeded']}/{report['tasks']} tasks in {report['seconds']}s: "
+        f"{report['files']} files, {report['chunks']} chunks, {report['github_requests']} GitHub requests"
+    )
+    return report
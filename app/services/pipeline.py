@@ -0,0 +1,183 @@
+# app/services/pipeline.py
+from typing import Any, AsyncIterable, Awaitable, Callable, Dict, Iterable, List, Optional, Union
+import asyncio
+import inspect
+import logging
+import time
+from app.services.metrics import MetricsRegistry
+
+logger = logging.getLogger(__name__)
+
+Emit = Callable[[Any], Awaitable[None]]
+
+_DONE = object()
+
+
+class Stage:
+    """
+    One step of a :class:`Pipeline`.
+
+    ``handler(item, emit)`` processes an item and passes zero or more results on with
+    ``await emit(result)``; emitting blocks while the next stage's queue is full.
+    ``workers`` handlers run concurrently, reading from a queue of at most ``queue_size`` items.
+    """
+
+    def __init__(self, name: str, handler: Callable[[Any, Emit], Awaitable[None]], workers: int = 1, queue_size: int = 100):
+        if workers < 1:
+            raise ValueError(f"Stage {name} needs at least one worker")
+        self.name = name
+        self.handler = handler
+        self.workers = workers
+        self.queue_size = queue_size
+        self.processed = 0
+        self.failed = 0
+        self.emitted = 0
+        self.busy_seconds = 0.0
+        self.max_queue_depth = 0
+
+
+class Pipeline:
+    """
+    Runs items through a chain of stages connected by bounded queues.
+
+    Every stage keeps its own workers busy independently, so I/O-bound and model-bound
+    steps overlap, while the queue bounds keep the number of items in flight (and the
+    memory they hold) constant however large the input is. A handler that raises
+    counts as a failure of that item only; ``on_error(stage_name, item, exc)`` is told
+    about it and the pipeline carries on. With ``metrics``, every item's handling time is
+    recorded in a ``pipeline_stage_seconds`` histogram and its outcome counted in
+    ``pipeline_items_total``, both labelled by stage.
+    """
+
+    def __init__(
+        self,
+        stages: List[Stage],
+        on_error: Optional[Callable[[str, Any, BaseException], Any]] = None,
+        metrics: Optional[MetricsRegistry] = None
+    ):
+        if not stages:
+            raise ValueError("A pipeline needs at least one stage")
+        self.stages = stages
+        self.on_error = on_error
+        self.metrics = metrics
+        self._queues: List[asyncio.Queue] = []
+        self._started: Optional[float] = None
+        self._finished: Optional[float] = None
+
+    async def run(self, source: Union[Iterable, AsyncIterable]):
+        """Feed ``source`` into the first stage and return once every stage has drained."""
+        self._queues = [asyncio.Queue(stage.queue_size) for stage in self.stages]
+        self._started, self._finished = time.perf_counter(), None
+        remaining = [stage.workers for stage in self.stages]
+
+        async def put(idx: int, item):
+            queue = self._queues[idx]
+            await queue.put(item)
+            stage = self.stages[idx]
+            stage.max_queue_depth = max(stage.max_queue_depth, queue.qsize())
+
+        async def finish(idx: int):
+            for _ in range(self.stages[idx].workers):
+                await self._queues[idx].put(_DONE)
+
+        async def feed():
+            if hasattr(source, "__aiter__"):
+                async for item in source:
+                    await put(0, item)
+            else:
+                for item in source:
+                    await put(0, item)
+            await finish(0)
+
+        async def worker(idx: int):
+            stage = self.stages[idx]
+            queue = self._queues[idx]
+            last = idx == len(self.stages) - 1
+            blocked = 0.0
+            if self.metrics is not None:
+                latency = self.metrics.histogram("pipeline_stage_seconds", stage=stage.name)
+                succeeded = self.metrics.counter("pipeline_items_total", stage=stage.name, outcome="ok")
+                errored = self.metrics.counter("pipeline_items_total", stage=stage.name, outcome="error")
+            else:
+                latency = succeeded = errored = None
+
+            async def emit(item):
+                nonlocal blocked
+                stage.emitted += 1
+                if last:
+                    return
+                waited = time.perf_counter()
+                await put(idx + 1, item)
+                blocked += time.perf_counter() - waited
+
+            while True:
+                item = await queue.get()
+                if item is _DONE:
+                    break
+                started, blocked = time.perf_counter(), 0.0
+                try:
+                    await stage.handler(item, emit)
+                    stage.processed += 1
+                    if succeeded is not None:
+                        succeeded.inc()
+                except Exception as e:
+                    stage.failed += 1
+                    if errored is not None:
+                        errored.inc()
+                    await self._report(stage.name, item, e)
+                finally:
+                    # Time spent waiting on a full downstream queue is backpressure, not work
+                    busy = time.perf_counter() - started - blocked
+                    stage.busy_seconds += busy
+                    if latency is not None:
+                        latency.observe(busy)
+
+            remaining[idx] -= 1
+            if remaining[idx] == 0 and not last:
+                await finish(idx + 1)
+
+        tasks = [asyncio.create_task(feed())] + [
+            asyncio.create_task(worker(idx))
+            for idx, stage in enumerate(self.stages)
+            for _ in range(stage.workers)
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        finally:
+            self._finished = time.perf_counter()
+
+    async def _report(self, stage_name: str, item, error: BaseException):
+        if self.on_error is None:
+            logger.error(f"Pipeline stage {stage_name} failed: {error}")
+            return
+        try:
+            result = self.on_error(stage_name, item, error)
+            if inspect.isawaitable(result):
+                await result
+        except Exception as e:
+            logger.error(f"Error handler for pipeline stage {stage_name} failed: {e}")
+
+    def summary(self) -> Dict[str, Dict]:
+        """Per-stage counts, throughput, current and peak queue depth, and worker utilization."""
+        if self._started is None:
+            elapsed = 0.0
+        else:
+            elapsed = (self._finished or time.perf_counter()) - self._started
+        return {
+            stage.name: {
+                "workers": stage.workers,
+                "processed": stage.processed,
+                "failed": stage.failed,
+                "emitted": stage.emitted,
+                "per_second": round(stage.processed / elapsed, 2) if elapsed else 0.0,
+                "queue_depth": self._queues[idx].qsize() if self._queues else 0,
+                "max_queue_depth": stage.max_queue_depth,
+                "utilization": round(stage.busy_seconds / (stage.workers * elapsed), 3) if elapsed else 0.0
+            }
+            for idx, stage in enumerate(self.stages)
+        }
@@ -0,0 +1,156 @@
+# app/services/query_cache.py
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+import asyncio
+import hashlib
+import logging
+import threading
+import time
+from app.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+CacheKey = Tuple[Hashable, ...]
+
+
+def embedding_digest(embedding: Sequence[float]) -> str:
+    """
+    Hash of a query embedding. Values are rounded to float16 first, so the last-bit noise
+    of embedding the same question twice does not split it into separate entries.
+    """
+    import numpy as np
+
+    values = np.asarray(embedding, dtype=np.float32).astype(np.float16)
+    return hashlib.blake2b(values.tobytes(), digest_size=16).hexdigest()
+
+
+class QueryCache:
+    """
+    In-memory cache of search results per repository, with a time to live and
+    least-recently-used eviction past ``max_entries``. Lookups of a key that is already
+    being computed wait for that computation instead of starting another one.
+
+    ``invalidate(repo_name)`` drops a repository's entries and makes any computation
+    already in flight for it uncacheable, so results read before a write are never
+    served after it. Invalidations may come from another thread (the API's ingestions
+    run on their own event loop), so the bookkeeping is done under a lock.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 300.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[CacheKey, Tuple[float, List[Dict]]]" = OrderedDict()
+        self._in_flight: Dict[CacheKey, asyncio.Future] = {}
+        # Bumped on every invalidation of a repository
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.RLock()
+        self.stats = {"hits": 0, "misses": 0, "coalesced": 0, "expired": 0, "evictions": 0, "invalidations": 0}
+
+    @classmethod
+    def from_settings(cls) -> "QueryCache":
+        settings = get_settings()
+        return cls(max_entries=settings.search_cache_max_entries, ttl=settings.search_cache_ttl)
+
+    @staticmethod
+    def key(repo_name: str, query_embedding: Sequence[float], limit: int, *options: Hashable) -> CacheKey:
+        """Key of a search; ``options`` are whatever else changes its results (mode, query text...)."""
+        return (repo_name, embedding_digest(query_embedding), limit, *options)
+
+    @staticmethod
+    def _copy(results: List[Dict]) -> List[Dict]:
+        # Callers get their own rows to modify
+        return [dict(row) for row in results]
+
+    def get(self, key: CacheKey) -> Optional[List[Dict]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, results = entry
+            if time.monotonic() - stored_at > self.ttl:
+                del self._entries[key]
+                self.stats["expired"] += 1
+                return None
+            self._entries.move_to_end(key)
+        return self._copy(results)
+
+    def put(self, key: CacheKey, results: List[Dict]):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), self._copy(results))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    async def get_or_compute(self, key: CacheKey, compute: Callable[[], Awaitable[List[Dict]]]) -> List[Dict]:
+        """Cached results for ``key``, else the in-flight computation's, else ``compute()``'s."""
+        cached = self.get(key)
+        if cached is not None:
+            self.stats["hits"] += 1
+            return cached
+        with self._lock:
+            in_flight = self._in_flight.get(key)
+        if in_flight is not None:
+            self.stats["coalesced"] += 1
+            try:
+                return self._copy(await asyncio.shield(in_flight))
+            except asyncio.CancelledError:
+                if not in_flight.cancelled():
+                    raise
+                # The search we joined was cancelled along with its caller; run our own
+                return await self.get_or_compute(key, compute)
+
+        self.stats["misses"] += 1
+        repo_name = key[0]
+        future = asyncio.get_running_loop().create_future()
+        with self._lock:
+            generation = self._generations.get(repo_name, 0)
+            self._in_flight[key] = future
+        try:
+            results = await compute()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Waiters see the error; nobody else needs to retrieve it
+            future.exception()
+            raise
+        else:
+            future.set_result(results)
+            with self._lock:
+                if self._generations.get(repo_name, 0) == generation:
+                    self.put(key, results)
+            return self._copy(results)
+        finally:
+            with self._lock:
+                if self._in_flight.get(key) is future:
+                    del self._in_flight[key]
+
+    def invalidate(self, repo_name: str):
+        """Forget a repository's results, including those still being computed."""
+        with self._lock:
+            self._generations[repo_name] = self._generations.get(repo_name, 0) + 1
+            stale = [key for key in self._entries if key[0] == repo_name]
+            for key in stale:
+                del self._entries[key]
+            for key in [key for key in self._in_flight if key[0] == repo_name]:
+                # Later lookups start a fresh search instead of joining one that may miss the write
+                del self._in_flight[key]
+            self.stats["invalidations"] += 1
+        if stale:
+            logger.debug(f"Invalidated {len(stale)} cached searches of {repo_name}")
+
+    def clear(self):
+        with self._lock:
+            repo_names = {key[0] for key in (*self._entries, *self._in_flight)}
+        for repo_name in repo_names:
+            self.invalidate(repo_name)
+
+    def summary(self) -> Dict[str, Any]:
+        lookups = self.stats["hits"] + self.stats["misses"] + self.stats["coalesced"]
+        return {
+            **self.stats,
+            "entries": len(self._entries),
+            "hit_rate": (self.stats["hits"] + self.stats["coalesced"]) / lookups if lookups else 0.0
+        }
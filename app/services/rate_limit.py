@@ -0,0 +1,278 @@
+# app/services/rate_limit.py
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Dict, Optional
+import asyncio
+import logging
+import multiprocessing
+import random
+import time
+import httpx
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class RateLimitExceeded(Exception):
+    """Raised when GitHub asks us to wait longer than we are willing to."""
+
+
+class SharedRateBudget:
+    """
+    Limits shared by the schedulers of several worker processes talking to the same API:
+    a global cap on requests in flight, an optional global request rate, and the
+    pause and remaining budget that any one worker learned from the server. Create it in
+    the parent and hand it to the workers when they start (e.g. as pool ``initargs``).
+    """
+
+    def __init__(self, max_concurrency: int, requests_per_second: Optional[float] = None, context=None):
+        context = context or multiprocessing.get_context("spawn")
+        self.max_concurrency = max_concurrency
+        self._slots = context.BoundedSemaphore(max_concurrency)
+        self._lock = context.Lock()
+        self._interval = 1.0 / requests_per_second if requests_per_second else 0.0
+        # Wall-clock times, comparable across processes
+        self._next_start = context.Value("d", 0.0, lock=False)
+        self._resume_at = context.Value("d", 0.0, lock=False)
+        self._pace = context.Value("d", 0.0, lock=False)
+        self._remaining = context.Value("q", -1, lock=False)
+        self._reset_at = context.Value("d", 0.0, lock=False)
+
+    async def acquire(self, poll: float = 0.005):
+        """Take a global in-flight slot without blocking the event loop."""
+        while not self._slots.acquire(False):
+            await asyncio.sleep(poll)
+
+    def release(self):
+        self._slots.release()
+
+    def reserve_start(self) -> float:
+        """Book the next start time under the global rate and pause; returns seconds to wait for it."""
+        with self._lock:
+            now = time.time()
+            start = max(now, self._next_start.value, self._resume_at.value)
+            self._next_start.value = start + max(self._interval, self._pace.value)
+            return start - now
+
+    def pause(self, seconds: float):
+        with self._lock:
+            self._resume_at.value = max(self._resume_at.value, time.time() + seconds)
+
+    def pace(self, interval: float):
+        """Space all workers' requests at least ``interval`` apart (0 to stop pacing)."""
+        with self._lock:
+            self._pace.value = interval
+
+    def observe(self, remaining: Optional[int], reset_at: Optional[float]):
+        with self._lock:
+            if remaining is not None:
+                self._remaining.value = remaining
+            if reset_at is not None:
+                self._reset_at.value = reset_at
+
+    @property
+    def remaining(self) -> Optional[int]:
+        value = self._remaining.value
+        return None if value < 0 else value
+
+    @property
+    def reset_at(self) -> Optional[float]:
+        return self._reset_at.value or None
+
+
+class RateLimitScheduler:
+    """
+    Admission control and retries for requests against a rate-limited API.
+
+    Requests run under an adaptive concurrency limit: it grows by one after a limit's
+    worth of healthy responses, is halved whenever the server throttles us, and drops to a single paced
+    request at a time once the ``X-RateLimit-Remaining`` budget falls below
+    ``reserve`` (the remaining budget is then spread evenly until ``X-RateLimit-Reset``).
+    ``Retry-After``, or an exhausted budget, pauses every request until the given time.
+    Transient failures (429, 5xx, secondary-rate-limit 403s, network errors) are retried
+    with full-jitter exponential backoff. With a :class:`SharedRateBudget`, the in-flight
+    cap, pauses, pacing and remaining budget also hold across processes.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 16,
+        max_retries: int = 5,
+        backoff_base: float = 0.5,
+        backoff_max: float = 30.0,
+        max_wait: float = 900.0,
+        reserve: int = 100,
+        sleep: Callable[[float], Awaitable] = asyncio.sleep,
+        budget: Optional[SharedRateBudget] = None
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_wait = max_wait
+        self.reserve = reserve
+        self._sleep = sleep
+        self.budget = budget
+        self.limit = max_concurrency
+        self.in_flight = 0
+        self._healthy = 0
+        self.remaining: Optional[int] = None
+        self.reset_at: Optional[float] = None  # wall-clock epoch seconds, as GitHub sends it
+        self._resume_at = 0.0  # monotonic time before which no request may start
+        self._next_slot = 0.0  # monotonic time of the next paced request
+        self._condition: Optional[asyncio.Condition] = None
+        self._condition_loop = None
+        self.stats = {"requests": 0, "retries": 0, "throttled": 0, "failed": 0}
+
+    @property
+    def budget_low(self) -> bool:
+        return self.remaining is not None and self.remaining <= self.reserve
+
+    def _sync_budget(self):
+        """Adopt the freshest remaining budget any worker has seen."""
+        if self.budget is not None and self.budget.remaining is not None:
+            self.remaining = self.budget.remaining
+            self.reset_at = self.budget.reset_at
+
+    def _get_condition(self) -> asyncio.Condition:
+        # asyncio primitives belong to one event loop; the service may outlive a loop
+        loop = asyncio.get_running_loop()
+        if self._condition is None or self._condition_loop is not loop:
+            self._condition = asyncio.Condition()
+            self._condition_loop = loop
+            self.in_flight = 0
+        return self._condition
+
+    @asynccontextmanager
+    async def slot(self):
+        """Wait for admission under the current limit, pause and pacing, then hold a slot."""
+        condition = self._get_condition()
+        async with condition:
+            await condition.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+        shared = False
+        try:
+            if self.budget is not None:
+                await self.budget.acquire()
+                shared = True
+            while True:
+                now = time.monotonic()
+                wait = max(self._resume_at, self._next_slot) - now
+                if wait <= 0:
+                    break
+                await self._sleep(min(wait, self.max_wait))
+            self._sync_budget()
+            if self.budget_low:
+                budget = max(self.remaining - self.in_flight, 1)
+                window = max((self.reset_at or time.time()) - time.time(), 0.0)
+                if self.budget is not None:
+                    # Pacing has to be global, or every worker would spend the budget at this rate
+                    self.budget.pace(window / budget)
+                else:
+                    self._next_slot = time.monotonic() + window / budget
+            elif self.budget is not None:
+                self.budget.pace(0.0)
+            if self.budget is not None:
+                wait = self.budget.reserve_start()
+                if wait > 0:
+                    await self._sleep(min(wait, self.max_wait))
+            yield
+        finally:
+            if shared:
+                self.budget.release()
+            async with condition:
+                self.in_flight -= 1
+                condition.notify_all()
+
+    def _update_budget(self, response: httpx.Response):
+        headers = response.headers
+        if "x-ratelimit-remaining" in headers:
+            self.remaining = int(headers["x-ratelimit-remaining"])
+        if "x-ratelimit-reset" in headers:
+            self.reset_at = float(headers["x-ratelimit-reset"])
+        if self.budget is not None:
+            self.budget.observe(self.remaining, self.reset_at)
+
+    def _throttle_delay(self, response: httpx.Response) -> Optional[float]:
+        """Seconds the server told us to wait, if this response is a rate limit rejection."""
+        if response.status_code not in (403, 429):
+            return None
+        retry_after = response.headers.get("retry-after")
+        if retry_after is not None:
+            try:
+                return max(float(retry_after), 0.0)
+            except ValueError:
+                return None
+        if response.headers.get("x-ratelimit-remaining") == "0":
+            return max((self.reset_at or time.time()) - time.time(), 0.0)
+        if response.status_code == 429 or b"rate limit" in response.content.lower():
+            return 0.0
+        return None
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    async def _set_limit(self, limit: int):
+        condition = self._get_condition()
+        async with condition:
+            self.limit = max(1, min(self.max_concurrency, limit))
+            condition.notify_all()
+
+    async def request(self, send: Callable[[], Awaitable[httpx.Response]]) -> httpx.Response:
+        """
+        Run ``send`` under admission control, retrying transient failures. Returns the
+        first non-retryable response; the caller decides what its status means.
+        """
+        attempt = 0
+        while True:
+            async with self.slot():
+                self.stats["requests"] += 1
+                try:
+                    response = await send()
+                except httpx.TransportError as e:
+                    response, error = None, e
+                else:
+                    error = None
+                    self._update_budget(response)
+
+            if response is not None:
+                if response.status_code in (403, 429):
+                    await response.aread()  # streamed responses: the body says whether it is a rate limit
+                delay = self._throttle_delay(response)
+                if delay is not None:
+                    self.stats["throttled"] += 1
+                    if delay > self.max_wait:
+                        self.stats["failed"] += 1
+                        raise RateLimitExceeded(f"Rate limited for {delay:.0f}s, more than the {self.max_wait:.0f}s allowed")
+                    self._resume_at = max(self._resume_at, time.monotonic() + delay)
+                    if self.budget is not None:
+                        self.budget.pause(delay)
+                    self._healthy = 0
+                    await self._set_limit(self.limit // 2)
+                    logger.warning(f"Rate limited by {response.request.url.host}; pausing {delay:.1f}s, "
+                                   f"concurrency now {self.limit}")
+                elif response.status_code not in RETRYABLE_STATUS:
+                    self._healthy += 1
+                    if self.budget_low:
+                        await self._set_limit(1)
+                    elif self._healthy >= self.limit:
+                        self._healthy = 0
+                        await self._set_limit(self.limit + 1)
+                    return response
+
+            if attempt >= self.max_retries:
+                self.stats["failed"] += 1
+                if error is not None:
+                    raise error
+                return response
+            attempt += 1
+            self.stats["retries"] += 1
+            wait = self._backoff(attempt)
+            reason = error or f"HTTP {response.status_code}"
+            logger.info(f"Retrying request ({reason}); attempt {attempt + 1} in {wait:.2f}s")
+            if response is not None:
+                await response.aclose()
+            await self._sleep(wait)
+
+    def summary(self) -> Dict:
+        return {**self.stats, "limit": self.limit, "remaining": self.remaining}
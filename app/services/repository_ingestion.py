@@ -1,47 +1,137 @@
 import asyncio
-from typing import List, Dict, Optional
+import os
+import time
+import zlib
+from typing import List, Dict, Optional, Tuple
 from app.services.github import GitHubService
 from app.services.mistral import MistralService
+from app.services.batching import EmbeddingWriter, MistralBatcher
+from app.services.model_cache import CachedMistralService, ModelCache
+from app.services.chunking import iter_chunks, iter_code_chunks
+from app.services.dedup import DedupIndex
+from app.services.file_selection import FileSelectionPolicy, default_policy
+from app.services.job_store import JobStore
+from app.services.metrics import MemorySampler, MetricsRegistry, profile_run
+from app.services.pipeline import Pipeline, Stage
 from app.services.snowflake import SnowflakeSearchService
-import psutil
+from app.core.config import get_settings
 import logging
 
-# Configure Logger
 logger = logging.getLogger(__name__)
-logging.basicConfig(level=logging.INFO)
 
 def chunk_text(text: str, chunk_size: int = 3000, overlap: int = 200) -> List[str]:
     """
     Splits a given text into smaller chunks with optional overlap.
     """
-    chunks = []
-    start = 0
-    text_length = len(text)
+    return list(iter_chunks(text, chunk_size, overlap))
 
-    while start < text_length:
-        end = min(start + chunk_size, text_length)
-        while end > start and not text[end - 1].isspace() and end < text_length:
-            end -= 1
-        chunks.append(text[start:end].strip())
-        start += chunk_size - overlap
+FETCH_MODES = ("api", "archive")
 
-    return [chunk for chunk in chunks if chunk]  # Remove empty chunks
 
-def log_system_status():
-    """
-    Log current memory usage for debugging resource issues.
-    """
-    process = psutil.Process()
-    memory = process.memory_info().rss / (1024 * 1024)  # Memory in MB
-    logger.info(f"Memory usage: {memory:.2f} MB")
+def in_shard(file_path: str, shard: Optional[Tuple[int, int]]) -> bool:
+    """Whether a file belongs to shard ``(index, count)``; paths hash to shards stably across processes."""
+    if shard is None:
+        return True
+    index, count = shard
+    return zlib.crc32(file_path.encode("utf-8")) % count == index
+
+
+class _FileJob:
+    """A file moving through the ingestion pipeline, and how many of its chunks are still in flight."""
+
+    __slots__ = ("path", "sha", "url", "data", "chunks", "pending", "chunked", "failed_chunks", "done", "canonical")
+
+    def __init__(self, path: str, sha: Optional[str], url: Optional[str] = None, data: Optional[bytes] = None):
+        self.path = path
+        self.sha = sha
+        self.url = url
+        self.data = data
+        self.chunks = 0
+        self.pending = 0
+        self.chunked = False  # every chunk has been emitted
+        self.failed_chunks = 0
+        self.done = False
+        # (chunk_index, signature, payload_bytes) of stored unique chunks, indexed once the whole file is
+        self.canonical: List[Tuple] = []
+
+
+class _ChunkItem:
+    __slots__ = ("job", "index", "text", "embedding", "summary", "signature", "duplicate_of")
+
+    def __init__(self, job: _FileJob, index: int, text: str):
+        self.job = job
+        self.index = index
+        self.text = text
+        self.embedding = None
+        self.summary = None
+        self.signature = None
+        # (repo_name, file_path, chunk_index) of the stored chunk this one nearly duplicates
+        self.duplicate_of: Optional[Tuple[str, str, int]] = None
+
 
 class RepositoryProcessor:
-    def __init__(self, batch_size: int = 2):
-        self.github_service = GitHubService()
-        self.mistral_service = MistralService()
-        self.snowflake_service = SnowflakeSearchService()
+    def __init__(
+        self,
+        batch_size: int = 2,
+        fetch_mode: str = "api",
+        github_service: Optional[GitHubService] = None,
+        mistral_service: Optional[MistralService] = None,
+        snowflake_service: Optional[SnowflakeSearchService] = None,
+        batch_options: Optional[Dict] = None,
+        write_options: Optional[Dict] = None,
+        model_cache: Optional[ModelCache] = None,
+        job_store: Optional[JobStore] = None,
+        stage_workers: Optional[Dict[str, int]] = None,
+        profile: Optional[str] = None,
+        shard: Optional[Tuple[int, int]] = None,
+        dedup_index: Optional[DedupIndex] = None,
+        file_policy: Optional[FileSelectionPolicy] = None
+    ):
+        settings = get_settings()
+        if fetch_mode not in FETCH_MODES:
+            raise ValueError(f"fetch_mode must be one of {FETCH_MODES}, got {fetch_mode!r}")
+        if shard is not None and not 0 <= shard[0] < shard[1]:
+            raise ValueError(f"shard must be (index, count) with 0 <= index < count, got {shard!r}")
+        self.github_service = github_service or GitHubService()
+        self.model_cache = model_cache or ModelCache.from_settings()
+        self.mistral_service = CachedMistralService(mistral_service or MistralService(), self.model_cache)
+        # Signatures of stored chunks; near-duplicates of them are stored as references
+        if dedup_index is None and settings.dedup_enabled:
+            dedup_index = getattr(snowflake_service, "dedup_index", None)
+            if dedup_index is None:
+                dedup_index = DedupIndex.from_settings()
+        self.dedup_index = dedup_index
+        self.snowflake_service = snowflake_service or SnowflakeSearchService(dedup_index=dedup_index)
+        if dedup_index is not None and getattr(self.snowflake_service, "dedup_index", dedup_index) is None:
+            # Deletes through the store, whoever makes them, must drop the chunks from the index
+            self.snowflake_service.dedup_index = dedup_index
+        self.job_store = job_store or JobStore.from_settings()
+        # Which files of the tree are fetched at all, and which fetched ones are chunked
+        self.file_policy = file_policy or default_policy()
+        # Job record of the current or last run
+        self.job_id: Optional[int] = None
         self.progress_callback = None
         self.batch_size = batch_size
+        self.fetch_mode = fetch_mode
+        # Overrides for MistralBatcher (max_items, max_tokens, max_wait, ...)
+        self.batch_options = batch_options or {}
+        # Overrides for EmbeddingWriter (max_rows, max_bytes, max_wait)
+        self.write_options = write_options or {}
+        # Overrides for the pipeline's per-stage worker counts; fetch defaults to batch_size
+        self.stage_workers = stage_workers or {}
+        self.pipeline: Optional[Pipeline] = None
+        # "cprofile" or "tracemalloc" to profile each ingest_repository run
+        self.profile = settings.ingestion_profile if profile is None else profile
+        # Metrics of the current or last run
+        self.metrics = MetricsRegistry()
+        # Only the files of this (index, count) shard of the repository are handled
+        self.shard = shard
+        # Files of the last run that were given up on, with the reason
+        self.skipped_files: Dict[str, str] = {}
+        # Files of the last run's tree left out by the file policy, with the reason
+        self.excluded_files: Dict[str, str] = {}
+        self._run_helpers: Optional[Tuple[MistralBatcher, EmbeddingWriter]] = None
+        self._run_loop = None
 
     def set_callback(self, callback):
         self.progress_callback = callback
@@ -49,83 +139,549 @@ class RepositoryProcessor:
     def set_batch_size(self, batch_size: int):
         self.batch_size = batch_size
 
-    async def process_file(self, file_url: str, file_path: str, repo: str) -> Optional[List[Dict]]:
+    def set_fetch_mode(self, fetch_mode: str):
+        if fetch_mode not in FETCH_MODES:
+            raise ValueError(f"fetch_mode must be one of {FETCH_MODES}, got {fetch_mode!r}")
+        self.fetch_mode = fetch_mode
+
+    async def process_file(
+        self, file_url: str, file_path: str, repo: str, file_sha: Optional[str] = None
+    ) -> Optional[List[Dict]]:
         """
         Process a single file, chunk its content, and send for embedding and response generation.
         """
         try:
-            logger.info(f"Fetching content for file: {file_path}")
-            content = await self.github_service.get_file_content(file_url)
-            if not content:
+            logger.debug(f"Fetching content for file: {file_path}")
+            data = await self.github_service.get_file_data(file_url)
+            if not data:
                 logger.warning(f"Empty content for file: {file_path}")
                 return None
 
-            chunks = chunk_text(content)
-            logger.info(f"Chunked file {file_path} into {len(chunks)} chunks")
-
-            for chunk_idx, chunk in enumerate(chunks):
-                try:
-                    log_system_status()  # Monitor memory usage
-                    embedding = self.mistral_service.generate_embedding(chunk)
-                    response = self.mistral_service.generate_response(
-                        prompt="Analyze and summarize this code chunk:",
-                        messages=[{"role": "user", "content": chunk}]
-                    )
-                    await self.snowflake_service.store_embedding(
-                        repo_name=repo,
-                        file_path=file_path,
-                        content=chunk,
-                        embedding=embedding,
-                        summary=response
-                    )
-                    if self.progress_callback:
-                        await self.progress_callback(file_path)
-
-                except Exception as e:
-                    logger.error(f"Error processing chunk {chunk_idx + 1} in {file_path}: {e}")
-                    continue
-
-            return {"file_path": file_path, "chunks_processed": len(chunks)}
+            return await self.process_content(data.decode("utf-8"), file_path, repo, file_sha=file_sha)
 
         except Exception as e:
             logger.error(f"Error processing file {file_path}: {e}")
             return None
 
-    async def ingest_repository(self, owner: str, repo: str) -> bool:
+    async def process_content(
+        self, content: str, file_path: str, repo: str, file_sha: Optional[str] = None
+    ) -> Optional[Dict]:
         """
-        Process all files in a repository.
+        Chunk already-fetched file content and send each chunk for embedding, summarization and storage.
         """
-        semaphore = asyncio.Semaphore(self.batch_size)
-        tasks = []
+        chunks = list(self._chunks(content, file_path))
+        logger.debug(f"Chunked file {file_path} into {len(chunks)} chunks")
+        batcher, writer = self._get_run_helpers()
 
-        async def process_with_limit(file):
-            async with semaphore:
-                return await self.process_file(file['url'], file['path'], repo)
+        async def process_chunk(chunk_idx: int, chunk: str) -> bool:
+            try:
+                # Both requests join batches shared with every other chunk in flight
+                embedding, response = await asyncio.gather(
+                    batcher.embed(chunk), batcher.summarize(chunk)
+                )
+                # Returns once the buffered batch holding this row is committed
+                await writer.write({
+                    "repo_name": repo,
+                    "file_path": file_path,
+                    "content": chunk,
+                    "embedding": embedding,
+                    "summary": response,
+                    "file_sha": file_sha,
+                    "chunk_index": chunk_idx
+                })
+                if self.progress_callback:
+                    await self.progress_callback(file_path)
+                return True
 
-        try:
-            logger.info(f"Fetching repository tree for {owner}/{repo}...")
-            repo_content = await self.github_service.get_repository_tree(owner, repo)
+            except Exception as e:
+                logger.error(f"Error processing chunk {chunk_idx + 1} in {file_path}: {e}")
+                return False
 
-            for file in repo_content:
-                if self._should_process_file(file['path']):
-                    tasks.append(process_with_limit(file))
+        outcomes = await asyncio.gather(
+            *(process_chunk(chunk_idx, chunk) for chunk_idx, chunk in enumerate(chunks))
+        )
+        failed_chunks = outcomes.count(False)
 
-            logger.info(f"Processing {len(tasks)} files...")
-            results = await asyncio.gather(*tasks, return_exceptions=True)
+        if failed_chunks and file_sha:
+            # A partially stored file must not look up to date on the next incremental run
+            logger.warning(f"Dropping partial index of {file_path} ({failed_chunks} chunks failed)")
+            await self._delete_files(repo, [file_path])
+            return None
+
+        return {"file_path": file_path, "chunks_processed": len(chunks)}
+
+    async def ingest_repository(self, owner: str, repo: str, incremental: bool = True) -> bool:
+        """
+        Process all files in a repository.
 
-            success_count = sum(1 for r in results if r)
-            logger.info(f"Successfully processed {success_count}/{len(tasks)} files.")
+        With ``incremental`` (the default) only files whose blob SHA differs from the
+        indexed one are processed, and rows of files removed from the repository are
+        deleted. Otherwise the repository's rows are dropped and everything is rebuilt.
+
+        Every run is checkpointed in ``self.job_store``. If the previous run of the
+        repository was interrupted and the tree has not changed since, an incremental run
+        resumes it: files already stored are skipped and the rest are cleared and processed
+        again. A full rebuild abandons the interrupted job instead.
+
+        Chunks that nearly duplicate a chunk already stored, in this or another repository,
+        skip the model calls and are stored as references to it (see ``self.dedup_index``).
+
+        The run's counters, stage latencies and memory samples are left in ``self.metrics``
+        and logged as a summary at the end.
+        """
+        settings = get_settings()
+        self._run_helpers = None
+        self.skipped_files = {}
+        self.excluded_files = {}
+        self.pipeline = None
+        self.job_id = None
+        self.metrics = MetricsRegistry()
+        started = time.perf_counter()
+        profile_dir = os.path.join(settings.data_dir, "profiles")
+        try:
+            with profile_run(self.profile, f"{owner}_{repo}_{int(time.time())}", profile_dir):
+                async with MemorySampler(self.metrics, settings.metrics_memory_interval):
+                    results = await self._ingest(owner, repo, incremental)
+            if results is None:
+                return True
+
+            success_count = sum(1 for r in results if r and not isinstance(r, BaseException))
+            logger.info(f"Successfully processed {success_count}/{len(results)} files.")
+            if self.skipped_files:
+                logger.warning(f"Skipped {len(self.skipped_files)} files: {self.skipped_files}")
+            self._record_run(time.perf_counter() - started)
+            logger.info(f"Ingestion metrics for {owner}/{repo}: {self.metrics.summary()}")
+            if self.dedup_index is not None:
+                logger.info(f"Deduplication for {owner}/{repo}: {self.dedup_report()}")
+            self.job_store.finish_job(self.job_id, "completed")
             return success_count > 0
 
         except Exception as e:
             logger.error(f"Repository ingestion failed: {e}")
+            if self.job_id is not None:
+                # Left resumable: the next run picks up from the files already stored
+                self.job_store.finish_job(self.job_id, "failed", error=str(e))
             return False
         finally:
+            await self.flush()
+            if self.dedup_index is not None:
+                self.dedup_index.flush()
+            self._run_helpers = None
             self.mistral_service.close()
 
-    def _should_process_file(self, file_path: str) -> bool:
+    async def _ingest(self, owner: str, repo: str, incremental: bool) -> Optional[List]:
+        """Plan and run one ingestion; None when there is nothing to do."""
+        async with self.github_service:
+            logger.info(f"Fetching repository tree for {owner}/{repo}...")
+            tree_sha, tree = await self.github_service.get_tree(owner, repo)
+            files = self._select_files(tree)
+
+            if incremental:
+                resumed = await self._resume_job(owner, repo, tree_sha, files)
+            else:
+                # A full rebuild clears the repository (shard) anyway; nothing is carried over
+                resumed = None
+                self._abandon_job(owner, repo)
+            if resumed is not None:
+                files = resumed
+            else:
+                if incremental:
+                    files = await self._plan_incremental(repo, files)
+                elif self.shard is not None:
+                    # Other shards' rows belong to other workers
+                    indexed = await self.snowflake_service.get_file_shas(repo)
+                    await self._delete_files(repo, [path for path in indexed if in_shard(path, self.shard)])
+                else:
+                    await self.snowflake_service.delete_repository_data(repo)
+                    if self.dedup_index is not None:
+                        self.dedup_index.remove_repository(repo)
+                self.job_id = self.job_store.create_job(
+                    repo, owner, tree_sha, {path: entry.get('sha') for path, entry in files.items()}, incremental,
+                    shard=self.shard
+                )
+
+            if not files:
+                logger.info(f"{owner}/{repo} is already up to date.")
+                self.job_store.finish_job(self.job_id, "completed")
+                return None
+
+            if self.fetch_mode == "archive":
+                return await self._ingest_from_archive(owner, repo, files)
+            return await self._ingest_from_api(repo, files)
+
+    def _select_files(self, tree: List[Dict]) -> Dict[str, Dict]:
+        """
+        The blobs of this shard that the file policy keeps, judged on the tree listing alone
+        (path and size) so nothing left out is ever downloaded. The rest go to
+        ``self.excluded_files`` and are counted by kind of reason.
+        """
+        files = {}
+        excluded = {}
+        for entry in tree:
+            path = entry['path']
+            if entry.get('type', 'blob') != 'blob' or not in_shard(path, self.shard):
+                continue
+            reason = self.file_policy.skip_reason(path, entry.get('size'))
+            if reason is None:
+                files[path] = entry
+            else:
+                excluded[path] = reason
+                self.metrics.counter("ingest_files_excluded_total", reason=reason.split(":", 1)[0]).inc()
+        if excluded:
+            kinds = {}
+            for reason in excluded.values():
+                kind = reason.split(":", 1)[0]
+                kinds[kind] = kinds.get(kind, 0) + 1
+            logger.info(f"Selected {len(files)} files, excluded {len(excluded)}: {kinds}")
+            logger.debug(f"Excluded files: {excluded}")
+        self.excluded_files = excluded
+        return files
+
+    def _record_run(self, elapsed: float):
+        """Fold the run's totals and the GitHub, cache and pipeline figures into the metrics."""
+        metrics = self.metrics
+        metrics.gauge("ingest_duration_seconds").set(elapsed)
+        for name, value in self.github_service.scheduler.summary().items():
+            if value is not None:
+                metrics.gauge("github_requests", stat=name).set(value)
+        if self.github_service.cache:
+            for name, value in self.github_service.cache.summary().items():
+                metrics.gauge("github_cache", stat=name).set(value)
+        for name, value in self.model_cache.summary().items():
+            if isinstance(value, (int, float)):
+                metrics.gauge("model_cache", stat=name).set(value)
+        if self.pipeline is not None:
+            for stage, stats in self.pipeline.summary().items():
+                metrics.gauge("pipeline_max_queue_depth", stage=stage).set(stats["max_queue_depth"])
+                metrics.gauge("pipeline_utilization", stage=stage).set(stats["utilization"])
+
+    def dedup_report(self) -> Dict:
+        """Chunks of the current or last run stored as near-duplicate references, and what that saved."""
+        chunks = self.metrics.summary().get("dedup_chunks_total", {})
+        duplicates = int(chunks.get("outcome=duplicate", 0))
+        total = duplicates + int(chunks.get("outcome=unique", 0))
+        return {
+            "chunks": total,
+            "duplicate_chunks": duplicates,
+            "duplicate_ratio": round(duplicates / total, 4) if total else 0.0,
+            "model_calls_saved": int(self.metrics.counter("dedup_model_calls_saved_total").value),
+            "bytes_saved": int(self.metrics.counter("dedup_bytes_saved_total").value)
+        }
+
+    async def _delete_files(self, repo: str, file_paths: List[str]):
+        """Delete files' rows; their chunks can no longer be referenced by near-duplicates."""
+        await self.snowflake_service.delete_file_data(repo, file_paths)
+        if self.dedup_index is not None:
+            self.dedup_index.remove_files(repo, file_paths)
+
+    def _get_run_helpers(self) -> Tuple[MistralBatcher, EmbeddingWriter]:
+        """Model batcher and row writer for the current run; both are bound to the running event loop."""
+        loop = asyncio.get_running_loop()
+        if self._run_helpers is None or self._run_loop is not loop:
+            self._run_helpers = (
+                MistralBatcher(self.mistral_service, **self.batch_options),
+                EmbeddingWriter(self.snowflake_service, **self.write_options)
+            )
+            self._run_loop = loop
+        return self._run_helpers
+
+    async def flush(self):
+        """Wait for queued model calls and buffered writes of the current run to finish."""
+        if self._run_helpers is not None and self._run_loop is asyncio.get_running_loop():
+            batcher, writer = self._run_helpers
+            await batcher.drain()
+            await writer.drain()
+
+    async def _resume_job(
+        self, owner: str, repo: str, tree_sha: Optional[str], files: Dict[str, Dict]
+    ) -> Optional[Dict[str, Dict]]:
+        """
+        Pick up the interrupted job of this owner, repository and shard, if any. Its
+        unfinished files may be partially stored, so their rows are deleted first. When the
+        job was planned against this same tree, it is resumed and the files left to process are returned;
+        otherwise it is abandoned and None tells the caller to plan a new job.
+        """
+        job = self.job_store.resumable_job(repo, owner, self.shard)
+        if job is None:
+            return None
+        unfinished = self.job_store.unfinished_files(job["job_id"])
+        await self._delete_files(repo, unfinished)
+        if tree_sha is None or job["tree_sha"] != tree_sha:
+            logger.info(f"Abandoning interrupted job {job['job_id']} of {repo}: the tree has changed")
+            self.job_store.finish_job(job["job_id"], "abandoned")
+            return None
+
+        self.job_id = job["job_id"]
+        self.job_store.resume_job(self.job_id, unfinished)
+        logger.info(
+            f"Resuming job {self.job_id} of {repo}: {len(unfinished)} of {job['total_files']} files left"
+        )
+        return {path: files[path] for path in unfinished if path in files}
+
+    def _abandon_job(self, owner: str, repo: str):
+        """Close the interrupted job of this owner, repository and shard, if any, without resuming it."""
+        job = self.job_store.resumable_job(repo, owner, self.shard)
+        if job is not None:
+            logger.info(f"Abandoning interrupted job {job['job_id']} of {repo}: full rebuild requested")
+            self.job_store.finish_job(job["job_id"], "abandoned")
+
+    async def _plan_incremental(self, repo: str, files: Dict[str, Dict]) -> Dict[str, Dict]:
+        """
+        Diff the current tree against the indexed blob SHAs. Deletes rows of removed and
+        changed files and returns only the entries that need processing.
+        """
+        indexed = await self.snowflake_service.get_file_shas(repo)
+        if self.shard is not None:
+            indexed = {path: sha for path, sha in indexed.items() if in_shard(path, self.shard)}
+        removed = [path for path in indexed if path not in files]
+        changed = {
+            path: entry for path, entry in files.items()
+            if indexed.get(path) != entry.get('sha') or entry.get('sha') is None
+        }
+        stale = [path for path in changed if path in indexed]
+
+        logger.info(
+            f"Incremental plan for {repo}: {len(changed) - len(stale)} added, {len(stale)} changed, "
+            f"{len(removed)} removed, {len(files) - len(changed)} unchanged"
+        )
+        await self._delete_files(repo, removed + stale)
+        return changed
+
+    def _chunks(self, text: str, file_path: str):
+        settings = get_settings()
+        return iter_code_chunks(
+            text, file_path, settings.chunk_size, settings.chunk_overlap, mode=settings.chunking_mode
+        )
+
+    def _stage_workers(self) -> Dict[str, int]:
+        settings = get_settings()
+        workers = {
+            "fetch": self.batch_size,
+            "chunk": settings.pipeline_chunk_workers,
+            "dedup": settings.pipeline_dedup_workers,
+            "embed": settings.pipeline_embed_workers,
+            "summarize": settings.pipeline_summarize_workers,
+            "store": settings.pipeline_store_workers
+        }
+        workers.update(self.stage_workers)
+        return workers
+
+    async def _run_pipeline(self, repo: str, source) -> List:
+        """
+        Push files through fetch -> chunk -> dedup -> embed -> summarize -> store stages,
+        each with its own workers and a bounded queue in front of it. Near-duplicate chunks
+        pass through the model stages untouched and are stored as references. Returns one
+        result per file: a summary dict, or None if the file was skipped or failed.
+        """
+        settings = get_settings()
+        batcher, writer = self._get_run_helpers()
+        results = []
+        metrics = self.metrics
+        files_ok = metrics.counter("ingest_files_total", outcome="ok")
+        files_skipped = metrics.counter("ingest_files_total", outcome="skipped")
+        chunks_stored = metrics.counter("ingest_chunks_total", outcome="stored")
+        chunks_failed = metrics.counter("ingest_chunks_total", outcome="failed")
+        bytes_read = metrics.counter("ingest_bytes_total")
+        dedup_index = self.dedup_index
+        chunks_unique = metrics.counter("dedup_chunks_total", outcome="unique")
+        chunks_duplicate = metrics.counter("dedup_chunks_total", outcome="duplicate")
+        model_calls_saved = metrics.counter("dedup_model_calls_saved_total")
+        bytes_saved = metrics.counter("dedup_bytes_saved_total")
+
+        async def finish(job: _FileJob, skipped: Optional[str] = None):
+            if job.done:
+                return
+            job.done = True
+            if job.failed_chunks and not skipped:
+                skipped = f"{job.failed_chunks} of {job.chunks} chunks failed"
+                if job.sha:
+                    # A partially stored file must not look up to date on the next incremental run
+                    logger.warning(f"Dropping partial index of {job.path} ({skipped})")
+                    await self._delete_files(repo, [job.path])
+            if skipped:
+                self.skipped_files[job.path] = skipped
+                files_skipped.inc()
+                results.append(None)
+            else:
+                if dedup_index is not None:
+                    # Only chunks of fully committed files may be referenced: a file that fails
+                    # later is deleted, and references to it still in the writer would dangle
+                    for index, signature, payload_bytes in job.canonical:
+                        dedup_index.add(repo, job.path, index, signature, payload_bytes=payload_bytes)
+                        confirmed.add((repo, job.path, index))
+                files_ok.inc()
+                results.append({"file_path": job.path, "chunks_processed": job.chunks})
+            if self.job_id is not None:
+                # Every chunk of a finished file has been committed by now
+                self.job_store.mark_file(
+                    self.job_id, job.path, "skipped" if skipped else "done", chunks=job.chunks,
+                    reason=skipped, last_batch=writer.batches_written
+                )
+
+        async def chunk_finished(job: _FileJob, ok: bool):
+            job.pending -= 1
+            if ok:
+                chunks_stored.inc()
+            else:
+                chunks_failed.inc()
+                job.failed_chunks += 1
+            if job.chunked and job.pending == 0:
+                await finish(job)
+
+        async def fetch(job: _FileJob, emit):
+            if job.data is None:
+                job.data = await self.github_service.get_file_data(job.url)
+            if job.data:
+                bytes_read.inc(len(job.data))
+            await emit(job)
+
+        async def chunk(job: _FileJob, emit):
+            reason = self.file_policy.content_skip_reason(job.path, job.data)
+            if reason is not None:
+                logger.warning(f"Skipping {job.path}: {reason}")
+                return await finish(job, skipped=reason)
+            # The only decode of the file: blob bytes to text, then chunks generated lazily
+            try:
+                text = job.data.decode("utf-8") if job.data else ""
+            except UnicodeDecodeError:
+                logger.warning(f"Skipping non UTF-8 file: {job.path}")
+                return await finish(job, skipped="not UTF-8")
+            job.data = None
+            if not text:
+                logger.warning(f"Empty content for file: {job.path}")
+                return await finish(job, skipped="empty")
+            for chunk_idx, text_chunk in enumerate(self._chunks(text, job.path)):
+                job.chunks += 1
+                job.pending += 1
+                await emit(_ChunkItem(job, chunk_idx, text_chunk))
+            job.chunked = True
+            logger.debug(f"Chunked file {job.path} into {job.chunks} chunks")
+            if job.pending == 0:
+                await finish(job)
+
+        loop = asyncio.get_running_loop()
+        # Canonical chunks known to be stored; the rest are checked with the store once
+        confirmed = set()
+
+        def canonical_exists(repo_name: str, file_path: str, chunk_index: int) -> bool:
+            key = (repo_name, file_path, chunk_index)
+            if key not in confirmed:
+                if not asyncio.run_coroutine_threadsafe(self.snowflake_service.has_chunk(*key), loop).result():
+                    return False
+                confirmed.add(key)
+            return True
+
+        def find_duplicate(item: _ChunkItem):
+            item.signature = dedup_index.signature(item.text)
+            return dedup_index.find(item.signature, exists=canonical_exists)
+
+        async def dedup(item: _ChunkItem, emit):
+            # Hashing and the index lookup run off the event loop
+            match = await asyncio.to_thread(find_duplicate, item)
+            if match is None:
+                chunks_unique.inc()
+            else:
+                item.duplicate_of = (match["repo_name"], match["file_path"], match["chunk_index"])
+                chunks_duplicate.inc()
+                model_calls_saved.inc(2)
+                bytes_saved.inc(match["payload_bytes"])
+            await emit(item)
+
+        async def embed(item: _ChunkItem, emit):
+            if item.duplicate_of is None:
+                item.embedding = await batcher.embed(item.text)
+            await emit(item)
+
+        async def summarize(item: _ChunkItem, emit):
+            if item.duplicate_of is None:
+                item.summary = await batcher.summarize(item.text)
+            await emit(item)
+
+        async def store(item: _ChunkItem, emit):
+            # Returns once the buffered batch holding this row is committed
+            await writer.write({
+                "repo_name": repo,
+                "file_path": item.job.path,
+                "content": item.text,
+                "embedding": item.embedding,
+                "summary": item.summary,
+                "file_sha": item.job.sha,
+                "chunk_index": item.index,
+                "duplicate_of": item.duplicate_of
+            })
+            if dedup_index is not None and item.duplicate_of is None:
+                item.job.canonical.append(
+                    (item.index, item.signature, 4 * len(item.embedding) + len(item.summary or ""))
+                )
+            await chunk_finished(item.job, ok=True)
+            if self.progress_callback:
+                await self.progress_callback(item.job.path)
+            await emit(item)
+
+        async def on_error(stage: str, item, error: BaseException):
+            if isinstance(item, _ChunkItem):
+                logger.error(f"Error processing chunk {item.index + 1} in {item.job.path} ({stage}): {error}")
+                await chunk_finished(item.job, ok=False)
+            else:
+                logger.error(f"Error processing file {item.path} ({stage}): {error}")
+                await finish(item, skipped=f"{stage} failed: {error}")
+
+        workers = self._stage_workers()
+        queue_size = settings.pipeline_queue_size
+        stages = [
+            Stage("fetch", fetch, workers["fetch"], queue_size),
+            Stage("chunk", chunk, workers["chunk"], queue_size),
+            Stage("embed", embed, workers["embed"], queue_size),
+            Stage("summarize", summarize, workers["summarize"], queue_size),
+            Stage("store", store, workers["store"], queue_size)
+        ]
+        if dedup_index is not None:
+            stages.insert(2, Stage("dedup", dedup, workers["dedup"], queue_size))
+        pipeline = Pipeline(stages, on_error=on_error, metrics=metrics)
+        self.pipeline = pipeline
+        await pipeline.run(source)
+        logger.info(f"Pipeline stages: {pipeline.summary()}")
+        return results
+
+    async def _ingest_from_api(self, repo: str, files: Dict[str, Dict]) -> List:
+        """Fetch each blob with its own API call in the pipeline's fetch stage."""
+        logger.info(f"Processing {len(files)} files...")
+        return await self._run_pipeline(
+            repo, (_FileJob(file['path'], file.get('sha'), url=file['url']) for file in files.values())
+        )
+
+    async def _ingest_from_archive(self, owner: str, repo: str, files: Dict[str, Dict]) -> List:
+        """
+        Stream the repository tarball once; extraction pauses while the pipeline is full.
+        Files of the tree that the tarball turns out not to hold are recorded as skipped.
+        """
+        logger.info(f"Streaming repository archive for {owner}/{repo} ({len(files)} files wanted)...")
+        extracted_paths = set()
+
+        async def extracted():
+            async for file_path, data in self.github_service.iter_archive_files(
+                owner, repo, include=lambda path, size: path in files
+            ):
+                extracted_paths.add(file_path)
+                yield _FileJob(file_path, files[file_path].get('sha'), data=data)
+
+        results = await self._run_pipeline(repo, extracted())
+        missing = [path for path in files if path not in extracted_paths]
+        if missing:
+            # The tarball can lag the tree or leave out export-ignored paths
+            logger.warning(f"{len(missing)} files of the tree were not in the archive of {owner}/{repo}")
+            files_skipped = self.metrics.counter("ingest_files_total", outcome="skipped")
+            for path in missing:
+                self.skipped_files[path] = "missing: not in the repository archive"
+                files_skipped.inc()
+                results.append(None)
+                if self.job_id is not None:
+                    self.job_store.mark_file(self.job_id, path, "skipped", reason=self.skipped_files[path])
+        logger.info(f"Processed {len(results)} files from archive.")
+        return results
+
+    def _should_process_file(self, file_path: str, size: Optional[int] = None) -> bool:
         """
-        Determine if a file should be processed based on its extension.
+        Determine if a file should be processed, by the processor's file policy.
         """
-        valid_extensions = {'.py', '.js', '.md', '.yml', '.json'}
-        return any(file_path.endswith(ext) for ext in valid_extensions)
+        return self.file_policy.is_selected(file_path, size)
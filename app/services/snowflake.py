@@ -1,29 +1,198 @@
-import snowflake.connector
 from app.core.config import get_settings
-from typing import List, Dict
-import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Callable, List, Dict, Optional
+import asyncio
+import os
+import re
+import threading
+import time
+from urllib.parse import quote
+from app.services.connection_pool import ConnectionPool
+from app.services.dedup import DedupIndex
+from app.services.job_store import JobStore
+from app.services.query_cache import QueryCache
 import json
 import logging
-import base64
+
+# The connector, numpy and the index modules load on first use, so importing this
+# module (and constructing the service) stays cheap for short-lived processes
+if TYPE_CHECKING:
+    from app.services.vector_index import VectorIndex
 
 logger = logging.getLogger(__name__)
-logging.basicConfig(level=logging.INFO)
-settings = get_settings()
+
+# Schema DDL runs once per process and database, not once per service or connection
+_initialized_schemas = set()
+_schema_lock = threading.Lock()
+
+# Rows written before embeddings were packed keep theirs in the VARIANT column
+HAS_EMBEDDING = "(embedding_packed IS NOT NULL OR embedding IS NOT NULL)"
+
+# Reference rows of near-duplicate chunks have no embedding or summary of their own and
+# borrow those of the chunk they duplicate; rows are read for search through this
+RESOLVED_EMBEDDINGS = """(
+    SELECT r.id, r.repo_name, r.file_path, r.chunk_index, r.content,
+        COALESCE(r.summary, c.summary) AS summary,
+        COALESCE(r.embedding_packed, c.embedding_packed) AS embedding_packed,
+        COALESCE(r.embedding, c.embedding) AS embedding{vector_column}
+    FROM code_embeddings r
+    LEFT JOIN code_embeddings c
+        ON r.duplicate_path IS NOT NULL AND c.repo_name = r.duplicate_repo
+        AND c.file_path = r.duplicate_path AND c.chunk_index = r.duplicate_chunk_index
+) resolved"""
+
+# The embedding_vector column only exists once the "vector" encoding has stored a row,
+# and its dimension is that of the first embedding stored
+VECTOR_TYPE = re.compile(r"VECTOR\(\s*\w+\s*,\s*(\d+)\s*\)", re.IGNORECASE)
+
+
+def resolved_embeddings(vectors: bool = False) -> str:
+    """RESOLVED_EMBEDDINGS, with the embedding_vector column when the table has one."""
+    return RESOLVED_EMBEDDINGS.format(
+        vector_column=",\n        COALESCE(r.embedding_vector, c.embedding_vector) AS embedding_vector" if vectors else ""
+    )
+
+
+def has_embedding(vectors: bool = False) -> str:
+    return HAS_EMBEDDING[:-1] + " OR embedding_vector IS NOT NULL)" if vectors else HAS_EMBEDDING
+
+SEARCH_MODES = ("vector", "hybrid")
 
 class SnowflakeSearchService:
-    def __init__(self):
-        """Initialize connection to Snowflake and set up the vector search infrastructure."""
-        self.conn = snowflake.connector.connect(
+    DATABASE = 'CODE_EXPERT'
+
+    def __init__(
+        self,
+        connect: Optional[Callable] = None,
+        pool: Optional[ConnectionPool] = None,
+        job_store: Optional[JobStore] = None,
+        query_cache: Optional[QueryCache] = None,
+        dedup_index: Optional[DedupIndex] = None
+    ):
+        """
+        Set up a lazily connecting pool for Snowflake. Nothing touches the network until the
+        first query; the vector search schema is initialized on the first connection.
+        ``job_store`` is where ingestion progress is read from; it defaults to the local one.
+        ``query_cache`` holds recent search results; by default one is made from the settings.
+        ``dedup_index``, when given, forgets the chunks deleted through this service so they
+        are no longer offered as near-duplicate canonicals.
+        """
+        settings = get_settings()
+        self._job_store = job_store
+        if query_cache is None and settings.search_cache_enabled:
+            query_cache = QueryCache.from_settings()
+        self.query_cache = query_cache
+        self.dedup_index = dedup_index
+        self.pool = pool or ConnectionPool(
+            connect or self._connect,
+            max_size=settings.snowflake_pool_size,
+            max_idle_time=settings.snowflake_pool_max_idle_time,
+            health_check_interval=settings.snowflake_pool_health_check_interval,
+            on_connect=self._ensure_schema
+        )
+        # The connector blocks, so calls run on these threads instead of the event loop,
+        # one per pooled connection so concurrent searches and writes never share a session
+        self._executor = ThreadPoolExecutor(max_workers=self.pool.max_size, thread_name_prefix="snowflake")
+        # Local per-repository vector indexes and when each was last synced with code_embeddings
+        self._indexes: Dict[str, "VectorIndex"] = {}
+        self._index_synced_at: Dict[str, float] = {}
+        self._stale_indexes = set()
+        # Dimension of the embedding_vector column, None while there is none
+        self._vector_dimensions: Optional[int] = None
+        self._vector_checked = False
+        self._vector_lock = threading.Lock()
+
+    def _connect(self):
+        import snowflake.connector
+
+        settings = get_settings()
+        return snowflake.connector.connect(
             user=settings.snowflake_user,
             password=settings.snowflake_password,
             account=settings.snowflake_account,
-            database='CODE_EXPERT'
+            database=self.DATABASE
         )
-        self._initialize_vector_search()
 
-    def _initialize_vector_search(self):
+    def _ensure_schema(self, conn):
+        settings = get_settings()
+        key = (settings.snowflake_account, self.DATABASE)
+        with _schema_lock:
+            if key not in _initialized_schemas:
+                self._initialize_vector_search(conn)
+                _initialized_schemas.add(key)
+        with self._vector_lock:
+            if not self._vector_checked:
+                self._vector_dimensions = self._read_vector_dimensions(conn)
+                if self._vector_dimensions is not None:
+                    self._check_vector_dimensions(self._vector_dimensions, "code_embeddings.embedding_vector has")
+                self._vector_checked = True
+
+    def _read_vector_dimensions(self, conn) -> Optional[int]:
+        """Dimension of the table's embedding_vector column, None while it has none."""
+        cursor = conn.cursor()
+        try:
+            cursor.execute("DESCRIBE TABLE code_embeddings")
+            for row in cursor.fetchall():
+                if str(row[0]).upper() == "EMBEDDING_VECTOR":
+                    match = VECTOR_TYPE.search(str(row[1]))
+                    return int(match.group(1)) if match else None
+            return None
+        finally:
+            cursor.close()
+
+    def _check_vector_dimensions(self, dimensions: int, subject: str = "Embeddings have"):
+        """Raise unless ``dimensions`` matches the embedding_vector column and ``snowflake_vector_dimensions``."""
+        configured = get_settings().snowflake_vector_dimensions
+        if configured and dimensions != configured:
+            message = f"{subject} {dimensions} dimensions but snowflake_vector_dimensions is {configured}"
+        elif self._vector_dimensions is not None and dimensions != self._vector_dimensions:
+            message = (
+                f"{subject} {dimensions} dimensions but code_embeddings.embedding_vector is "
+                f"VECTOR(FLOAT, {self._vector_dimensions}); re-embed or migrate the stored rows first"
+            )
+        else:
+            return
+        logger.error(message)
+        raise ValueError(message)
+
+    def _vector_column(self, conn, embeddings: List):
+        """
+        Check embeddings bound for embedding_vector against its dimension, adding the
+        column sized by the first of them when the table has none yet.
+        """
+        for dimensions in sorted({len(embedding) for embedding in embeddings if embedding is not None}):
+            with self._vector_lock:
+                self._check_vector_dimensions(dimensions)
+                if self._vector_dimensions is not None:
+                    continue
+                cursor = conn.cursor()
+                try:
+                    cursor.execute(
+                        "ALTER TABLE code_embeddings ADD COLUMN IF NOT EXISTS "
+                        f"embedding_vector VECTOR(FLOAT, {dimensions})"
+                    )
+                finally:
+                    cursor.close()
+                # Another writer may have added it first, sized by its own embeddings
+                self._vector_dimensions = self._read_vector_dimensions(conn) or dimensions
+                self._check_vector_dimensions(dimensions)
+
+    @property
+    def _has_vectors(self) -> bool:
+        return self._vector_dimensions is not None
+
+    async def _run(self, func: Callable, *args, **kwargs):
+        """Run a blocking connector call with a pooled connection on a database thread."""
+        def call():
+            with self.pool.connection() as conn:
+                return func(conn, *args, **kwargs)
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, call)
+
+    def _initialize_vector_search(self, conn):
         """Initialize the database and create necessary tables if they don't exist."""
-        cursor = self.conn.cursor()
+        cursor = conn.cursor()
         try:
             cursor.execute("CREATE DATABASE IF NOT EXISTS CODE_EXPERT;")
             cursor.execute("USE DATABASE CODE_EXPERT;")
@@ -35,11 +204,21 @@ class SnowflakeSearchService:
                 content STRING,
                 is_base64 BOOLEAN,
                 embedding VARIANT,
+                embedding_packed BINARY,
                 summary STRING,
+                file_sha STRING,
+                chunk_index INTEGER,
                 created_at TIMESTAMP_NTZ DEFAULT CURRENT_TIMESTAMP(),
                 PRIMARY KEY (id)
             );
             """)
+            # Bring tables created before these columns existed up to date
+            cursor.execute("ALTER TABLE code_embeddings ADD COLUMN IF NOT EXISTS file_sha STRING;")
+            cursor.execute("ALTER TABLE code_embeddings ADD COLUMN IF NOT EXISTS chunk_index INTEGER;")
+            cursor.execute("ALTER TABLE code_embeddings ADD COLUMN IF NOT EXISTS embedding_packed BINARY;")
+            cursor.execute("ALTER TABLE code_embeddings ADD COLUMN IF NOT EXISTS duplicate_repo STRING;")
+            cursor.execute("ALTER TABLE code_embeddings ADD COLUMN IF NOT EXISTS duplicate_path STRING;")
+            cursor.execute("ALTER TABLE code_embeddings ADD COLUMN IF NOT EXISTS duplicate_chunk_index INTEGER;")
             logger.info("Database and table initialized successfully")
         except Exception as e:
             logger.error(f"Error initializing vector search: {e}")
@@ -47,80 +226,364 @@ class SnowflakeSearchService:
         finally:
             cursor.close()
 
-    def _is_base64(self, content: str) -> bool:
-        """Check if content is base64 encoded."""
+    async def store_embedding(
+        self,
+        repo_name: str,
+        file_path: str,
+        content: str,
+        embedding: List[float],
+        summary: str = None,
+        file_sha: Optional[str] = None,
+        chunk_index: Optional[int] = None
+    ):
+        """Store embedding and other metadata in the Snowflake database."""
+        await self._run(
+            self._store_embedding_sync, repo_name, file_path, content, embedding,
+            summary=summary, file_sha=file_sha, chunk_index=chunk_index
+        )
+        self._repository_changed(repo_name)
+
+    async def store_embeddings(self, rows: List[Dict]):
+        """
+        Store many chunks in one transaction using multi-row inserts.
+        Each row takes the same keys as store_embedding's arguments. A near-duplicate
+        chunk's row may instead set ``duplicate_of`` to the (repo_name, file_path,
+        chunk_index) of the stored chunk it copies, with no embedding or summary.
+        """
+        await self._run(self._store_embeddings_sync, rows)
+        for repo_name in {row["repo_name"] for row in rows}:
+            self._repository_changed(repo_name)
+
+    def _repository_changed(self, repo_name: str):
+        """After a write: the local index needs a sync and cached searches are stale."""
+        self._stale_indexes.add(repo_name)
+        if self.query_cache is not None:
+            self.query_cache.invalidate(repo_name)
+
+    async def search_similar(
+        self,
+        query_embedding: List[float],
+        repo_name: str,
+        limit: int = 5,
+        use_index: Optional[bool] = None,
+        query_text: Optional[str] = None,
+        mode: Optional[str] = None
+    ) -> List[Dict]:
+        """
+        Search for similar content based on vector similarity.
+
+        By default this runs against the local vector index of the repository, synced from
+        code_embeddings when stale; ``use_index=False`` scans the stored embeddings instead,
+        in the warehouse for rows stored with the ``vector`` encoding and client-side for
+        packed ones (see ``_search_similar_sync``).
+        In ``hybrid`` mode (``search_mode`` by default) the question's identifiers and
+        words in ``query_text`` pick BM25 candidates from the lexical index first and only
+        those are ranked with the embedding; that needs the local index and a query text.
+
+        Results are cached per repository, embedding, limit and mode for
+        ``search_cache_ttl`` seconds, and concurrent identical searches share one lookup.
+        Writes and deletes through this service invalidate the repository's entries;
+        writes by other processes show up once entries expire.
+        """
+        settings = get_settings()
+        mode = mode or settings.search_mode
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Search mode must be one of {SEARCH_MODES}, got {mode!r}")
+        use_index = settings.vector_index_enabled if use_index is None else use_index
+        if self.query_cache is None:
+            return await self._search(query_embedding, repo_name, limit, use_index, query_text, mode)
+        key = self.query_cache.key(
+            repo_name, query_embedding, limit, use_index, mode, query_text if mode == "hybrid" else None
+        )
+        return await self.query_cache.get_or_compute(
+            key, lambda: self._search(query_embedding, repo_name, limit, use_index, query_text, mode)
+        )
+
+    async def _search(
+        self,
+        query_embedding: List[float],
+        repo_name: str,
+        limit: int,
+        use_index: bool,
+        query_text: Optional[str],
+        mode: str
+    ) -> List[Dict]:
+        settings = get_settings()
+        if use_index:
+            index = await self.get_vector_index(repo_name)
+            if mode == "hybrid" and query_text and index.lexical is not None:
+                return await asyncio.to_thread(
+                    index.search_hybrid, query_embedding, query_text, limit,
+                    settings.hybrid_candidates, settings.hybrid_weight
+                )
+            return await asyncio.to_thread(index.search, query_embedding, limit)
+        return await self._run(self._search_similar_sync, query_embedding, repo_name, limit)
+
+    async def migrate_embeddings(
+        self,
+        repo_name: Optional[str] = None,
+        encoding: Optional[str] = None,
+        batch_size: int = 1000
+    ) -> int:
+        """
+        Move embeddings still stored as JSON VARIANT into the packed binary column, for one
+        repository or all of them. With ``encoding="vector"`` packed embeddings move into
+        the native VECTOR column as well, and back out of it with a packed encoding.
+        Safe to interrupt and rerun; returns the rows converted.
+        """
+        migrated = await self._run(self._migrate_embeddings_sync, repo_name, encoding, batch_size)
+        if migrated and self.query_cache is not None:
+            # Requantized embeddings can reorder results
+            if repo_name:
+                self.query_cache.invalidate(repo_name)
+            else:
+                self.query_cache.clear()
+        return migrated
+
+    async def delete_repository_data(self, repo_name: str):
+        """
+        Delete all data for a specific repository. Rows elsewhere that reference its
+        chunks as near-duplicates get a copy of their embedding and summary first.
+        """
+        await self._run(self._delete_repository_data_sync, repo_name)
+        if self.dedup_index is not None:
+            self.dedup_index.remove_repository(repo_name)
+        if repo_name in self._indexes:
+            self._indexes[repo_name].clear()
+        if self.query_cache is not None:
+            self.query_cache.invalidate(repo_name)
+
+    async def get_file_shas(self, repo_name: str) -> Dict[str, Optional[str]]:
+        """Map each indexed file path of a repository to the blob SHA it was indexed at."""
+        return await self._run(self._get_file_shas_sync, repo_name)
+
+    async def delete_file_data(self, repo_name: str, file_paths: List[str], batch_size: int = 1000):
+        """
+        Delete all chunks stored for the given files of a repository. Rows that reference
+        them as near-duplicates get a copy of their embedding and summary first.
+        """
+        if file_paths:
+            await self._run(self._delete_file_data_sync, repo_name, file_paths, batch_size)
+            if self.dedup_index is not None:
+                self.dedup_index.remove_files(repo_name, file_paths)
+            if repo_name in self._indexes:
+                self._indexes[repo_name].remove_files(file_paths)
+            if self.query_cache is not None:
+                self.query_cache.invalidate(repo_name)
+
+    async def has_chunk(self, repo_name: str, file_path: str, chunk_index: int) -> bool:
+        """Whether the chunk is stored with an embedding of its own (not as a reference)."""
+        return await self._run(self._has_chunk_sync, repo_name, file_path, chunk_index)
+
+    async def get_repository_statistics(self, repo_name: str) -> Dict:
+        """
+        Get statistics about stored embeddings for a repository, with the progress of its
+        latest ingestion job under ``'job'`` (None if it was never ingested from here). Rows
+        are kept per repository name, so the job is that of whichever owner ran last.
+        """
+        stats = await self._run(self._get_repository_statistics_sync, repo_name)
+        if stats is not None:
+            stats['job'] = self.job_store.progress(repo_name)
+        return stats
+
+    @property
+    def job_store(self) -> JobStore:
+        if self._job_store is None:
+            self._job_store = JobStore.from_settings()
+        return self._job_store
+
+    def vector_index(self, repo_name: str) -> "VectorIndex":
+        """The local index of a repository as last persisted, without syncing it."""
+        from app.services.vector_index import IVFVectorIndex, VectorIndex
+
+        settings = get_settings()
+        if repo_name not in self._indexes:
+            directory = os.path.join(settings.data_dir, "vector_index", quote(repo_name, safe=""))
+            if settings.vector_index_mode == "ivf":
+                self._indexes[repo_name] = IVFVectorIndex(
+                    directory,
+                    mmap=settings.vector_index_mmap,
+                    nlist=settings.vector_index_nlist or None,
+                    nprobe=settings.vector_index_nprobe,
+                    min_train_rows=settings.vector_index_min_train_rows,
+                    lexical=settings.lexical_index_enabled
+                )
+            else:
+                self._indexes[repo_name] = VectorIndex(
+                    directory, mmap=settings.vector_index_mmap, lexical=settings.lexical_index_enabled
+                )
+        return self._indexes[repo_name]
+
+    async def get_vector_index(self, repo_name: str) -> "VectorIndex":
+        """
+        The local index of a repository, synced first if this service wrote to the repository
+        since the last sync or ``vector_index_sync_interval`` has passed.
+        """
+        settings = get_settings()
+        synced_at = self._index_synced_at.get(repo_name)
+        if (
+            repo_name in self._stale_indexes
+            or synced_at is None
+            or time.monotonic() - synced_at > settings.vector_index_sync_interval
+        ):
+            return await self.sync_vector_index(repo_name)
+        return self.vector_index(repo_name)
+
+    async def sync_vector_index(self, repo_name: str) -> "VectorIndex":
+        """Pull rows added since the last sync, then reconcile by id if row counts disagree."""
+        index = self.vector_index(repo_name)
+        self._stale_indexes.discard(repo_name)
+        await self._run(self._sync_vector_index_sync, repo_name, index)
+        self._index_synced_at[repo_name] = time.monotonic()
+        return index
+
+    async def warm_up(self, repo_names: List[str] = ()):
+        """
+        Open a pooled connection, initializing the schema, and sync the local indexes of
+        ``repo_names`` (with index search enabled), so the first searches do not pay for it.
+        """
+        settings = get_settings()
+        await self._run(lambda conn: None)
+        if settings.vector_index_enabled:
+            await asyncio.gather(*(self.sync_vector_index(repo_name) for repo_name in repo_names))
+
+    def _add_index_rows(self, index: "VectorIndex", rows: List[tuple]):
+        from app.services.embedding_codec import read_embedding
+
+        index.add(
+            [row[0] for row in rows],
+            [read_embedding(*row[5:8]) for row in rows],
+            [{'file_path': row[1], 'chunk_index': row[2], 'content': row[3], 'summary': row[4]} for row in rows]
+        )
+
+    def _sync_vector_index_sync(self, conn, repo_name: str, index: "VectorIndex", page_size: int = 10000):
+        import numpy as np
+
+        vectors = self._has_vectors
+        columns = "id, file_path, chunk_index, content, summary, embedding_packed, embedding"
+        if vectors:
+            columns += ", embedding_vector"
+        resolved = resolved_embeddings(vectors)
+        cursor = conn.cursor()
         try:
-            return bool(base64.b64decode(content))
-        except Exception:
-            return False
-
-    def _decode_if_base64(self, content: str) -> tuple[str, bool]:
-        """Decode content if it's base64 encoded."""
-        if self._is_base64(content):
-            try:
-                decoded = base64.b64decode(content).decode('utf-8')
-                return decoded, True
-            except Exception:
-                return content, False
-        return content, False
+            while True:
+                cursor.execute(f"""
+                SELECT {columns} FROM {resolved}
+                WHERE repo_name = %s AND {has_embedding(vectors)} AND id > %s
+                ORDER BY id
+                LIMIT %s
+                """, (repo_name, index.last_id, page_size))
+                rows = cursor.fetchall()
+                self._add_index_rows(index, rows)
+                if len(rows) < page_size:
+                    break
 
-    async def store_embedding(
+            # Order-independent fingerprint of the id set; equal fingerprints mean nothing to reconcile
+            cursor.execute(f"""
+            SELECT COUNT(*), COALESCE(SUM(id), 0), COALESCE(BITXOR_AGG(id), 0)
+            FROM {resolved}
+            WHERE repo_name = %s AND {has_embedding(vectors)}
+            """, (repo_name,))
+            local_ids = index.ids()
+            local_fingerprint = (
+                len(local_ids), int(local_ids.sum()), int(np.bitwise_xor.reduce(local_ids)) if len(local_ids) else 0
+            )
+            if tuple(int(value) for value in cursor.fetchone()) == local_fingerprint:
+                return
+
+            # Ids are not guaranteed to be handed out in commit order, and other writers may
+            # have deleted rows, so compare the full id sets
+            cursor.execute(
+                f"SELECT id FROM {resolved} WHERE repo_name = %s AND {has_embedding(vectors)}",
+                (repo_name,)
+            )
+            remote = {row[0] for row in cursor.fetchall()}
+            local = set(int(i) for i in local_ids)
+            index.remove_ids(local - remote)
+            missing = sorted(remote - local)
+            for start in range(0, len(missing), 1000):
+                batch = missing[start:start + 1000]
+                cursor.execute(
+                    f"SELECT {columns} FROM {resolved} WHERE id IN ({', '.join(['%s'] * len(batch))})",
+                    batch
+                )
+                self._add_index_rows(index, cursor.fetchall())
+            logger.info(f"Reconciled vector index for {repo_name}: {len(missing)} added, {len(local - remote)} removed")
+        except Exception as e:
+            logger.error(f"Error syncing vector index: {e}")
+            raise
+        finally:
+            cursor.close()
+
+    def _store_embedding_sync(
         self,
+        conn,
         repo_name: str,
         file_path: str,
         content: str,
         embedding: List[float],
-        summary: str = None
+        summary: str = None,
+        file_sha: Optional[str] = None,
+        chunk_index: Optional[int] = None
     ):
         """Store embedding and other metadata in the Snowflake database."""
-        cursor = self.conn.cursor()
+        cursor = conn.cursor()
         try:
-            # Process content - decode if base64
-            decoded_content, is_base64 = self._decode_if_base64(content)
-            content_to_store = decoded_content if is_base64 else content
-
-            # Debug logging
-            logger.info(f"Storing embedding for file: {file_path}")
-            logger.info(f"Content snippet: {content_to_store[:100]}...")
-            logger.info(f"Is base64: {is_base64}")
-            logger.info(f"Embedding length: {len(embedding)}")
-            logger.info(f"First few embedding values: {embedding[:5]}")
-
-            # Convert embedding to JSON format
-            embedding_json = json.dumps({"vector": embedding})
+            verbose = logger.isEnabledFor(logging.DEBUG)
+            if verbose:
+                logger.debug(f"Storing embedding for file: {file_path}")
+                logger.debug(f"Content snippet: {content[:100]}...")
+                logger.debug(f"Embedding length: {len(embedding)}")
+                logger.debug(f"First few embedding values: {embedding[:5]}")
+
+            embedding_json, embedding_packed, embedding_vector = self._encode_embedding(embedding)
+            vector_column, vector_value = "", ""
+            if embedding_vector is not None:
+                self._vector_column(conn, [embedding])
+                vector_column = ", embedding_vector"
+                vector_value = f"\n                {self._vector_cast('%(embedding_vector)s')},"
             
-            query = """
+            query = f"""
             INSERT INTO code_embeddings 
-                (repo_name, file_path, content, is_base64, embedding, summary)
+                (repo_name, file_path, content, is_base64, embedding, embedding_packed{vector_column}, summary,
+                 file_sha, chunk_index)
             SELECT 
                 %(repo_name)s, 
                 %(file_path)s, 
                 %(content)s,
                 %(is_base64)s,
                 TO_VARIANT(%(embedding)s), 
-                %(summary)s
+                %(embedding_packed)s,{vector_value}
+                %(summary)s,
+                %(file_sha)s,
+                %(chunk_index)s
             """
             
             params = {
                 "repo_name": repo_name,
                 "file_path": file_path,
-                "content": content_to_store,
-                "is_base64": is_base64,
+                "content": content,
+                "is_base64": False,
                 "embedding": embedding_json,
-                "summary": summary
+                "embedding_packed": embedding_packed,
+                "summary": summary,
+                "file_sha": file_sha,
+                "chunk_index": chunk_index
             }
+            if embedding_vector is not None:
+                params["embedding_vector"] = embedding_vector
             
-            # Log the parameters being sent
-            logger.info("Query parameters:")
-            for key, value in params.items():
-                if key != 'embedding':
-                    logger.info(f"{key}: {value}")
-                else:
-                    logger.info(f"{key}: {value[:100]}...")
+            if verbose:
+                logger.debug("Query parameters:")
+                for key, value in params.items():
+                    if key not in ('embedding', 'embedding_packed', 'embedding_vector'):
+                        logger.debug(f"{key}: {value}")
+                    elif value is not None:
+                        logger.debug(f"{key}: {value[:100]}...")
 
             cursor.execute(query, params)
-            self.conn.commit()
-            logger.info("Successfully stored embedding")
+            conn.commit()
+            logger.debug("Successfully stored embedding")
             
         except Exception as e:
             logger.error(f"Error storing embedding in Snowflake: {e}")
@@ -129,69 +592,432 @@ class SnowflakeSearchService:
         finally:
             cursor.close()
 
-    async def search_similar(
+    EMBEDDING_COLUMNS = (
+        "repo_name", "file_path", "content", "is_base64", "embedding", "embedding_packed", "summary",
+        "file_sha", "chunk_index", "duplicate_repo", "duplicate_path", "duplicate_chunk_index"
+    )
+
+    @staticmethod
+    def _stores_vectors() -> bool:
+        return get_settings().snowflake_embedding_encoding == "vector"
+
+    @staticmethod
+    def _encode_embedding(embedding: List[float]) -> tuple:
+        """
+        Values for the (embedding, embedding_packed, embedding_vector) columns, only one of
+        them set: packed binary in the configured encoding, the text of a native VECTOR
+        with the "vector" encoding, or the legacy JSON VARIANT with "json".
+        """
+        from app.services.embedding_codec import encode_embedding
+
+        settings = get_settings()
+        if embedding is None:
+            return None, None, None
+        if settings.snowflake_embedding_encoding == "json":
+            return json.dumps({"vector": embedding}), None, None
+        if settings.snowflake_embedding_encoding == "vector":
+            return None, None, SnowflakeSearchService._vector_text(embedding)
+        return None, encode_embedding(embedding, settings.snowflake_embedding_encoding), None
+
+    @staticmethod
+    def _vector_text(embedding) -> Optional[str]:
+        """JSON array text of an embedding, cast to VECTOR in SQL."""
+        if embedding is None:
+            return None
+        # Nine significant digits round-trip float32
+        return "[" + ",".join(f"{float(value):.9g}" for value in embedding) + "]"
+
+    def _vector_cast(self, value: str) -> str:
+        """SQL casting JSON array text to the embedding_vector column's type; the column must exist."""
+        return f"PARSE_JSON({value})::ARRAY::VECTOR(FLOAT, {self._vector_dimensions})"
+
+    def _prepare_row(self, row: Dict) -> tuple:
+        """
+        Turn a store_embedding-style dict into bind values in EMBEDDING_COLUMNS order,
+        followed by embedding_vector with the "vector" encoding.
+        """
+        embedding_json, embedding_packed, embedding_vector = self._encode_embedding(row["embedding"])
+        # Content arrives decoded; is_base64 stays for rows written before that
+        values = (
+            row["repo_name"],
+            row["file_path"],
+            row["content"],
+            False,
+            embedding_json,
+            embedding_packed,
+            row.get("summary"),
+            row.get("file_sha"),
+            row.get("chunk_index"),
+            *(row.get("duplicate_of") or (None, None, None))
+        )
+        return values + (embedding_vector,) if self._stores_vectors() else values
+
+    def _insert_statements(self, values: List[tuple]):
+        """
+        Group rows into multi-row ``INSERT ... SELECT ... FROM VALUES`` statements, each
+        kept under the configured row count and query text size.
+        """
+        settings = get_settings()
+        columns = self.EMBEDDING_COLUMNS + (("embedding_vector",) if self._stores_vectors() else ())
+        casts = {"embedding": lambda column: f"TO_VARIANT({column})", "embedding_vector": self._vector_cast}
+        select_list = ", ".join(
+            casts.get(column, str)(f"column{idx + 1}") for idx, column in enumerate(columns)
+        )
+        row_placeholder = "(" + ", ".join(["%s"] * len(columns)) + ")"
+
+        def statement(batch):
+            query = f"""
+            INSERT INTO code_embeddings ({", ".join(columns)})
+            SELECT {select_list}
+            FROM VALUES {", ".join([row_placeholder] * len(batch))}
+            """
+            return query, [value for row in batch for value in row]
+
+        batch, batch_bytes = [], 0
+        for row in values:
+            # Binary values are inlined as hex literals, two characters per byte
+            row_bytes = sum(
+                len(value) if isinstance(value, str) else 2 * len(value)
+                for value in row if isinstance(value, (str, bytes))
+            )
+            if batch and (
+                len(batch) >= settings.snowflake_insert_max_rows
+                or batch_bytes + row_bytes > settings.snowflake_insert_max_bytes
+            ):
+                yield statement(batch)
+                batch, batch_bytes = [], 0
+            batch.append(row)
+            batch_bytes += row_bytes
+        if batch:
+            yield statement(batch)
+
+    def _store_embeddings_sync(self, conn, rows: List[Dict]):
+        """
+        Store many chunks in one transaction using multi-row inserts.
+        Each row takes the same keys as store_embedding's arguments.
+        """
+        if not rows:
+            return
+        cursor = conn.cursor()
+        try:
+            if self._stores_vectors():
+                # Before anything is bound: a mismatched dimension fails the whole batch clearly
+                self._vector_column(conn, [row["embedding"] for row in rows])
+            values = [self._prepare_row(row) for row in rows]
+            cursor.execute("BEGIN")
+            for query, params in self._insert_statements(values):
+                cursor.execute(query, params)
+            conn.commit()
+            logger.debug(f"Stored {len(rows)} embeddings")
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"Error storing {len(rows)} embeddings in Snowflake: {e}")
+            raise
+        finally:
+            cursor.close()
+
+    def _search_similar_sync(
         self,
+        conn,
         query_embedding: List[float],
         repo_name: str,
-        limit: int = 5
+        limit: int = 5,
+        page_size: int = 10000
     ) -> List[Dict]:
-        """Search for similar content based on vector similarity."""
-        cursor = self.conn.cursor()
+        """
+        Search for similar content based on vector similarity.
+
+        Rows stored with the "vector" encoding are ranked in the warehouse with
+        VECTOR_COSINE_SIMILARITY and only the top ``limit`` come back. Packed embeddings
+        cannot be compared inside the warehouse, so packed and legacy rows are paged to the
+        client, ids and embeddings only, and scored there: that transfers every such
+        embedding on every search, so it stops after ``snowflake_scan_max_rows`` rows and
+        logs a warning. The local index, or migrating to the "vector" encoding, avoids it.
+        """
+        settings = get_settings()
+        cursor = conn.cursor()
         try:
-            # Convert query embedding to string representation
-            query_embedding_str = ','.join(str(x) for x in query_embedding)
-            
-            query = """
-            SELECT 
-                file_path, 
-                content, 
-                summary,
-                VECTOR_COSINE_DISTANCE(embedding, ARRAY_CONSTRUCT({0})) as similarity
-            FROM code_embeddings
-            WHERE repo_name = ?
-            ORDER BY similarity DESC
-            LIMIT ?
-            """.format(query_embedding_str)
-            
-            cursor.execute(query, (repo_name, limit))
-
-            results = [{
-                'file_path': row[0],
-                'content': row[1],
-                'summary': row[2],
-                'similarity': float(row[3])
-            } for row in cursor.fetchall()]
-            
-            return results
+            results = []
+            if self._has_vectors:
+                self._check_vector_dimensions(len(query_embedding), "The query embedding has")
+                cursor.execute(f"""
+                SELECT file_path, content, summary,
+                    VECTOR_COSINE_SIMILARITY(embedding_vector, {self._vector_cast("%s")}) AS similarity
+                FROM {resolved_embeddings(vectors=True)}
+                WHERE repo_name = %s AND embedding_vector IS NOT NULL
+                ORDER BY similarity DESC
+                LIMIT %s
+                """, (self._vector_text(query_embedding), repo_name, limit))
+                results = [{
+                    'file_path': row[0],
+                    'content': row[1],
+                    'summary': row[2],
+                    'similarity': float(row[3])
+                } for row in cursor.fetchall()]
+            results += self._scan_similar(
+                cursor, query_embedding, repo_name, limit, page_size, settings.snowflake_scan_max_rows
+            )
+            results.sort(key=lambda row: row['similarity'], reverse=True)
+            return results[:limit]
         except Exception as e:
             logger.error(f"Error searching similar embeddings: {e}")
             raise
         finally:
             cursor.close()
 
-    async def delete_repository_data(self, repo_name: str):
+    @staticmethod
+    def _scan_similar(
+        cursor,
+        query_embedding: List[float],
+        repo_name: str,
+        limit: int,
+        page_size: int,
+        max_rows: int
+    ) -> List[Dict]:
+        """Score the repository's packed and legacy rows client-side, a page of embeddings at a time."""
+        import numpy as np
+        from app.services.embedding_codec import read_embedding
+
+        query = np.asarray(query_embedding, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+        best_ids, best_scores = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        last_id = 0
+        scanned = 0
+        while True:
+            page = min(page_size, max_rows - scanned)
+            cursor.execute(f"""
+            SELECT id, embedding_packed, embedding FROM {resolved_embeddings()}
+            WHERE repo_name = %s AND {HAS_EMBEDDING} AND id > %s
+            ORDER BY id
+            LIMIT %s
+            """, (repo_name, last_id, page))
+            rows = cursor.fetchall()
+            if rows:
+                vectors = np.stack([read_embedding(row[1], row[2]) for row in rows])
+                norms = np.linalg.norm(vectors, axis=1)
+                norms[norms == 0] = 1.0
+                best_ids = np.concatenate([best_ids, [row[0] for row in rows]])
+                best_scores = np.concatenate([best_scores, vectors @ query / norms])
+                top = np.argsort(-best_scores)[:limit]
+                best_ids, best_scores = best_ids[top], best_scores[top]
+                last_id = rows[-1][0]
+                scanned += len(rows)
+            if len(rows) < page:
+                break
+            if scanned >= max_rows:
+                logger.warning(
+                    f"Scored only the first {scanned} packed embeddings of {repo_name} client-side; "
+                    f"search the local index or migrate to the vector encoding to rank them all"
+                )
+                break
+        if not len(best_ids):
+            return []
+
+        cursor.execute(
+            f"SELECT id, file_path, content, summary FROM {resolved_embeddings()} "
+            f"WHERE id IN ({', '.join(['%s'] * len(best_ids))})",
+            [int(i) for i in best_ids]
+        )
+        records = {row[0]: row for row in cursor.fetchall()}
+        return [{
+            'file_path': records[row_id][1],
+            'content': records[row_id][2],
+            'summary': records[row_id][3],
+            'similarity': float(score)
+        } for row_id, score in zip(best_ids.tolist(), best_scores) if row_id in records]
+
+    def _migrate_embeddings_sync(
+        self,
+        conn,
+        repo_name: Optional[str] = None,
+        encoding: Optional[str] = None,
+        batch_size: int = 1000
+    ) -> int:
+        """
+        Move embeddings into ``encoding``'s column, one committed batch at a time: legacy
+        VARIANT (and VECTOR) ones into embedding_packed, or with "vector" legacy and packed
+        ones into embedding_vector.
+        """
+        from app.services.embedding_codec import encode_embedding, read_embedding
+
+        settings = get_settings()
+        encoding = encoding or settings.snowflake_embedding_encoding
+        to_vectors = encoding == "vector"
+        vectors = self._has_vectors and not to_vectors
+        if to_vectors:
+            pending = HAS_EMBEDDING
+        else:
+            pending = "embedding_packed IS NULL AND " + (
+                "(embedding IS NOT NULL OR embedding_vector IS NOT NULL)" if vectors else "embedding IS NOT NULL"
+            )
+        columns = "id, embedding_packed, embedding" + (", embedding_vector" if vectors else "")
+        cursor = conn.cursor()
+        migrated = 0
+        try:
+            repo_filter = "AND repo_name = %s" if repo_name else ""
+            while True:
+                cursor.execute(f"""
+                SELECT {columns} FROM code_embeddings
+                WHERE {pending} {repo_filter}
+                ORDER BY id
+                LIMIT %s
+                """, [repo_name, batch_size] if repo_name else [batch_size])
+                rows = cursor.fetchall()
+                if not rows:
+                    break
+                embeddings = [read_embedding(*row[1:]) for row in rows]
+                if to_vectors:
+                    self._vector_column(conn, embeddings)
+                    values = [(row[0], self._vector_text(embedding)) for row, embedding in zip(rows, embeddings)]
+                    assignments = (
+                        f"embedding_vector = {self._vector_cast('migrated.column2')}, "
+                        "embedding_packed = NULL, embedding = NULL"
+                    )
+                else:
+                    values = [(row[0], encode_embedding(embedding, encoding)) for row, embedding in zip(rows, embeddings)]
+                    assignments = "embedding_packed = migrated.column2, embedding = NULL"
+                    if vectors:
+                        assignments += ", embedding_vector = NULL"
+                cursor.execute("BEGIN")
+                for batch in self._update_batches(values):
+                    cursor.execute(f"""
+                    UPDATE code_embeddings
+                    SET {assignments}
+                    FROM (SELECT column1, column2 FROM VALUES {", ".join(["(%s, %s)"] * len(batch))}) migrated
+                    WHERE code_embeddings.id = migrated.column1
+                    """, [value for row in batch for value in row])
+                conn.commit()
+                migrated += len(rows)
+                logger.info(f"Moved {migrated} embeddings to {encoding}")
+            return migrated
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"Error migrating embeddings: {e}")
+            raise
+        finally:
+            cursor.close()
+
+    @staticmethod
+    def _update_batches(values: List[tuple]):
+        """Split (id, value) pairs like inserts: values are bound into the query text."""
+        settings = get_settings()
+        batch, batch_bytes = [], 0
+        for row in values:
+            # Binary values are inlined as hex literals, two characters per byte
+            row_bytes = len(row[1]) if isinstance(row[1], str) else 2 * len(row[1])
+            if batch and (
+                len(batch) >= settings.snowflake_insert_max_rows
+                or batch_bytes + row_bytes > settings.snowflake_insert_max_bytes
+            ):
+                yield batch
+                batch, batch_bytes = [], 0
+            batch.append(row)
+            batch_bytes += row_bytes
+        if batch:
+            yield batch
+
+    def _delete_repository_data_sync(self, conn, repo_name: str):
         """Delete all data for a specific repository."""
-        cursor = self.conn.cursor()
+        cursor = conn.cursor()
         try:
+            cursor.execute("BEGIN")
+            self._materialize_references(cursor, "c.repo_name = %s AND r.repo_name != %s", [repo_name, repo_name])
             cursor.execute(
-                "DELETE FROM code_embeddings WHERE repo_name = ?",
+                "DELETE FROM code_embeddings WHERE repo_name = %s",
                 (repo_name,)
             )
-            self.conn.commit()
+            conn.commit()
         except Exception as e:
+            conn.rollback()
             logger.error(f"Error deleting repository data: {e}")
             raise
         finally:
             cursor.close()
 
+    def _materialize_references(self, cursor, canonical_filter: str, params: List):
+        """
+        Copy the embedding and summary of the chunks matching ``canonical_filter`` (alias
+        ``c``, with ``r`` for the referencing rows) into the reference rows that point at
+        them, so those rows stay searchable once the chunks are deleted.
+        """
+        vector_assignment = " embedding_vector = c.embedding_vector," if self._has_vectors else ""
+        cursor.execute(f"""
+        UPDATE code_embeddings r
+        SET embedding_packed = c.embedding_packed, embedding = c.embedding,{vector_assignment} summary = c.summary,
+            duplicate_repo = NULL, duplicate_path = NULL, duplicate_chunk_index = NULL
+        FROM code_embeddings c
+        WHERE r.duplicate_path IS NOT NULL AND c.repo_name = r.duplicate_repo
+            AND c.file_path = r.duplicate_path AND c.chunk_index = r.duplicate_chunk_index
+            AND {canonical_filter}
+        """, params)
+
+    def _has_chunk_sync(self, conn, repo_name: str, file_path: str, chunk_index: int) -> bool:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("""
+            SELECT 1 FROM code_embeddings
+            WHERE repo_name = %s AND file_path = %s AND chunk_index = %s AND duplicate_path IS NULL
+            LIMIT 1
+            """, (repo_name, file_path, chunk_index))
+            return cursor.fetchone() is not None
+        except Exception as e:
+            logger.error(f"Error checking chunk {repo_name}/{file_path}#{chunk_index}: {e}")
+            raise
+        finally:
+            cursor.close()
+
+    def _get_file_shas_sync(self, conn, repo_name: str) -> Dict[str, Optional[str]]:
+        """Map each indexed file path of a repository to the blob SHA it was indexed at."""
+        cursor = conn.cursor()
+        try:
+            cursor.execute("""
+            SELECT file_path, MAX(file_sha)
+            FROM code_embeddings
+            WHERE repo_name = %(repo_name)s
+            GROUP BY file_path
+            """, {"repo_name": repo_name})
+            return {row[0]: row[1] for row in cursor.fetchall()}
+        except Exception as e:
+            logger.error(f"Error fetching file SHAs: {e}")
+            raise
+        finally:
+            cursor.close()
+
+    def _delete_file_data_sync(self, conn, repo_name: str, file_paths: List[str], batch_size: int = 1000):
+        """Delete all chunks stored for the given files of a repository."""
+        if not file_paths:
+            return
+        cursor = conn.cursor()
+        try:
+            cursor.execute("BEGIN")
+            for start in range(0, len(file_paths), batch_size):
+                batch = list(file_paths[start:start + batch_size])
+                placeholders = ", ".join(["%s"] * len(batch))
+                self._materialize_references(
+                    cursor, f"c.repo_name = %s AND c.file_path IN ({placeholders})", [repo_name, *batch]
+                )
+                cursor.execute(
+                    f"DELETE FROM code_embeddings WHERE repo_name = %s AND file_path IN ({placeholders})",
+                    [repo_name, *batch]
+                )
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"Error deleting file data: {e}")
+            raise
+        finally:
+            cursor.close()
+
     def close(self):
-        """Close the Snowflake connection."""
-        if self.conn:
-            self.conn.close()
+        """Close the pooled Snowflake connections and local indexes."""
+        self._executor.shutdown(wait=True)
+        self.pool.close()
+        for index in self._indexes.values():
+            index.close()
 
-    async def get_repository_statistics(self, repo_name: str) -> Dict:
+    def _get_repository_statistics_sync(self, conn, repo_name: str) -> Dict:
         """Get statistics about stored embeddings for a repository."""
-        cursor = self.conn.cursor()
+        cursor = conn.cursor()
         try:
             cursor.execute("""
             SELECT 
@@ -200,7 +1026,7 @@ class SnowflakeSearchService:
                 MIN(created_at) as first_indexed,
                 MAX(created_at) as last_indexed
             FROM code_embeddings
-            WHERE repo_name = ?
+            WHERE repo_name = %s
             """, (repo_name,))
             
             row = cursor.fetchone()
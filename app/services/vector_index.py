@@ -0,0 +1,522 @@
+# app/services/vector_index.py
+from typing import Dict, Iterable, List, Optional, Sequence
+import json
+import logging
+import os
+import sqlite3
+import threading
+import numpy as np
+from app.services.lexical_index import LexicalIndex
+
+logger = logging.getLogger(__name__)
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """Scale rows to unit length so a dot product is the cosine similarity."""
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class VectorIndex:
+    """
+    Exact cosine-similarity index over a contiguous float32 matrix of pre-normalized rows.
+
+    With a ``directory`` the index persists as raw append-only files (``vectors.f32``,
+    ``ids.i64``) plus a SQLite file holding each row's file path, content and summary,
+    so results need no warehouse round trip. ``mmap=True`` maps the vector file instead
+    of reading it into memory. Removed rows are tombstoned and compacted away once they
+    make up a quarter of the index.
+
+    With ``lexical=True`` a BM25 :class:`LexicalIndex` over each row's file path and
+    content is kept alongside (``lexical.sqlite3``), enabling :meth:`search_hybrid`.
+    """
+
+    COMPACT_RATIO = 0.25
+
+    def __init__(self, directory: Optional[str] = None, mmap: bool = True, lexical: bool = False):
+        self.directory = directory
+        self.mmap = mmap and directory is not None
+        self._lock = threading.RLock()
+        self.dim: Optional[int] = None
+        self.last_id = 0
+        self._size = 0
+        self._vectors = np.empty((0, 0), dtype=np.float32)
+        self._ids = np.empty(0, dtype=np.int64)
+        self._deleted = np.zeros(0, dtype=bool)
+        self._deleted_count = 0
+        # Live row positions sorted by id, for looking rows up by id; rebuilt after changes
+        self._by_id: Optional[np.ndarray] = None
+
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(
+            os.path.join(directory, "records.sqlite3") if directory else ":memory:",
+            check_same_thread=False
+        )
+        self._db.execute("""
+        CREATE TABLE IF NOT EXISTS records (
+            id INTEGER PRIMARY KEY,
+            file_path TEXT,
+            chunk_index INTEGER,
+            content TEXT,
+            summary TEXT
+        )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS records_file_path ON records (file_path)")
+        self._db.commit()
+        if directory and os.path.exists(self._path("meta.json")):
+            self._load()
+        self.lexical: Optional[LexicalIndex] = None
+        if lexical:
+            self.lexical = LexicalIndex(self._path("lexical.sqlite3") if directory else None)
+            if not len(self.lexical) and len(self):
+                self._backfill_lexical()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    @staticmethod
+    def _lexical_text(record: Dict) -> str:
+        return f"{record.get('file_path') or ''}\n{record.get('content') or ''}"
+
+    def _backfill_lexical(self, page_size: int = 10000):
+        """Index the rows of an index persisted before the lexical index was turned on."""
+        last = -1
+        while True:
+            rows = self._db.execute(
+                "SELECT id, file_path, content FROM records WHERE id > ? ORDER BY id LIMIT ?", (last, page_size)
+            ).fetchall()
+            if not rows:
+                break
+            self.lexical.add(
+                [row[0] for row in rows],
+                [self._lexical_text({'file_path': row[1], 'content': row[2]}) for row in rows]
+            )
+            last = rows[-1][0]
+
+    def _load(self):
+        with open(self._path("meta.json")) as f:
+            meta = json.load(f)
+        self.dim, self.last_id = meta["dim"], meta["last_id"]
+        ids = np.fromfile(self._path("ids.i64"), dtype=np.int64)
+        rows = min(len(ids), os.path.getsize(self._path("vectors.f32")) // (4 * self.dim))
+        self._ids = ids[:rows]
+        self._size = rows
+        self._map_vectors()
+        # Rows whose record is gone were removed after the last compaction
+        live = np.fromiter((row[0] for row in self._db.execute("SELECT id FROM records")), dtype=np.int64)
+        self._deleted = ~np.isin(self._ids, live)
+        self._deleted_count = int(self._deleted.sum())
+        self._after_load(meta)
+
+    def _map_vectors(self):
+        if self._size == 0:
+            self._vectors = np.empty((0, self.dim or 0), dtype=np.float32)
+        elif self.mmap:
+            self._vectors = np.memmap(self._path("vectors.f32"), dtype=np.float32, mode="r", shape=(self._size, self.dim))
+        else:
+            self._vectors = np.fromfile(self._path("vectors.f32"), dtype=np.float32, count=self._size * self.dim)
+            self._vectors = self._vectors.reshape(self._size, self.dim)
+
+    def _meta(self) -> Dict:
+        return {"dim": self.dim, "last_id": self.last_id, "rows": self._size}
+
+    def _save_meta(self):
+        with open(self._path("meta.json.tmp"), "w") as f:
+            json.dump(self._meta(), f)
+        os.replace(self._path("meta.json.tmp"), self._path("meta.json"))
+
+    # Hooks for indexes layered on top of the row storage
+    def _after_load(self, meta: Dict):
+        pass
+
+    def _after_add(self, matrix: np.ndarray):
+        """Called with the newly appended rows, which occupy the last ``len(matrix)`` positions."""
+
+    def _after_rewrite(self):
+        """Called after compaction or clearing, once row positions have changed."""
+
+    def _candidates(self, query: np.ndarray, k: int) -> Optional[np.ndarray]:
+        """Row positions worth scoring for ``query``; None scores every row."""
+        return None
+
+    def __len__(self) -> int:
+        return self._size - self._deleted_count
+
+    def add(self, ids: Sequence[int], vectors: Sequence[Sequence[float]], records: Sequence[Dict]):
+        """Append rows; ids already present are ignored so repeated syncs are harmless."""
+        if not len(ids):
+            return
+        with self._lock:
+            ids = np.asarray(ids, dtype=np.int64)
+            fresh = ~np.isin(ids, self._ids[~self._deleted]) if self._size else np.ones(len(ids), dtype=bool)
+            if not fresh.any():
+                return
+            positions = np.flatnonzero(fresh)
+            ids = ids[positions]
+            matrix = normalize(np.asarray([vectors[i] for i in positions], dtype=np.float32))
+            if self.dim is None:
+                self.dim = matrix.shape[1]
+            elif matrix.shape[1] != self.dim:
+                raise ValueError(f"Embedding dimension {matrix.shape[1]} does not match index dimension {self.dim}")
+
+            self._db.executemany(
+                "INSERT OR REPLACE INTO records (id, file_path, chunk_index, content, summary) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (int(row_id), records[i].get("file_path"), records[i].get("chunk_index"),
+                     records[i].get("content"), records[i].get("summary"))
+                    for row_id, i in zip(ids, positions)
+                ]
+            )
+            self._db.commit()
+
+            if self.directory:
+                with open(self._path("vectors.f32"), "ab") as f:
+                    matrix.tofile(f)
+                with open(self._path("ids.i64"), "ab") as f:
+                    ids.tofile(f)
+                self._ids = np.concatenate([self._ids, ids])
+                self._size += len(ids)
+                if self.mmap:
+                    self._map_vectors()
+                else:
+                    self._vectors = np.concatenate([self._vectors.reshape(-1, self.dim), matrix])
+            else:
+                self._ids = np.concatenate([self._ids, ids])
+                self._vectors = np.concatenate([self._vectors.reshape(-1, self.dim), matrix])
+                self._size += len(ids)
+            self._deleted = np.concatenate([self._deleted, np.zeros(len(ids), dtype=bool)])
+            self._by_id = None
+            self.last_id = max(self.last_id, int(ids.max()))
+            if self.lexical is not None:
+                self.lexical.add(ids.tolist(), [self._lexical_text(records[i]) for i in positions])
+            self._after_add(matrix)
+            if self.directory:
+                self._save_meta()
+
+    def remove_ids(self, ids: Iterable[int]):
+        with self._lock:
+            ids = np.fromiter(ids, dtype=np.int64)
+            if not len(ids):
+                return
+            hit = np.isin(self._ids, ids) & ~self._deleted
+            self._deleted |= hit
+            self._deleted_count += int(hit.sum())
+            self._by_id = None
+            if self.lexical is not None:
+                self.lexical.remove(ids.tolist())
+            for start in range(0, len(ids), 500):
+                batch = [int(i) for i in ids[start:start + 500]]
+                self._db.execute(f"DELETE FROM records WHERE id IN ({', '.join('?' * len(batch))})", batch)
+            self._db.commit()
+            if self._deleted_count > self.COMPACT_RATIO * max(self._size, 1):
+                self._compact()
+
+    def remove_files(self, file_paths: Iterable[str]):
+        file_paths = list(file_paths)
+        ids = []
+        for start in range(0, len(file_paths), 500):
+            batch = file_paths[start:start + 500]
+            ids.extend(row[0] for row in self._db.execute(
+                f"SELECT id FROM records WHERE file_path IN ({', '.join('?' * len(batch))})", batch
+            ))
+        self.remove_ids(ids)
+
+    def ids(self) -> np.ndarray:
+        """Ids of all live rows."""
+        return self._ids[~self._deleted]
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM records")
+            self._db.commit()
+            if self.lexical is not None:
+                self.lexical.clear()
+            self._ids = np.empty(0, dtype=np.int64)
+            self._deleted = np.zeros(0, dtype=bool)
+            self._deleted_count = 0
+            self._size = 0
+            self.last_id = 0
+            self._rewrite(np.empty((0, self.dim or 0), dtype=np.float32))
+
+    def _compact(self):
+        """Drop tombstoned rows from the matrix (and the files backing it)."""
+        keep = ~self._deleted
+        vectors = np.ascontiguousarray(self._vectors[keep])
+        self._ids = self._ids[keep]
+        self._size = len(self._ids)
+        self._deleted = np.zeros(self._size, dtype=bool)
+        self._deleted_count = 0
+        self._rewrite(vectors)
+
+    def _rewrite(self, vectors: np.ndarray):
+        self._by_id = None
+        if not self.directory:
+            self._vectors = vectors
+            self._after_rewrite()
+            return
+        # Drop the mapping before replacing the file it points at
+        self._vectors = np.empty((0, self.dim or 0), dtype=np.float32)
+        vectors.tofile(self._path("vectors.f32.tmp"))
+        self._ids.tofile(self._path("ids.i64.tmp"))
+        os.replace(self._path("vectors.f32.tmp"), self._path("vectors.f32"))
+        os.replace(self._path("ids.i64.tmp"), self._path("ids.i64"))
+        if self.mmap:
+            self._map_vectors()
+        else:
+            self._vectors = vectors
+        self._after_rewrite()
+        if self.dim is not None:
+            self._save_meta()
+
+    def search(self, query: Sequence[float], k: int = 5) -> List[Dict]:
+        """Top-k rows by cosine similarity: one matrix-vector product plus argpartition."""
+        query = normalize(np.asarray(query, dtype=np.float32))
+        with self._lock:
+            vectors, deleted, row_ids = self._vectors, self._deleted, self._ids
+            positions = self._candidates(query, k)
+        if positions is not None:
+            vectors, deleted, row_ids = vectors[positions], deleted[positions], row_ids[positions]
+        k = min(k, len(row_ids) - int(deleted.sum()))
+        if k <= 0:
+            return []
+        scores = vectors @ query
+        if deleted.any():
+            scores[deleted] = -np.inf
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return self._results([int(i) for i in row_ids[top]], [{'similarity': float(score)} for score in scores[top]])
+
+    def _results(self, top_ids: List[int], scores: List[Dict]) -> List[Dict]:
+        records = {
+            row[0]: row for row in self._db.execute(
+                f"SELECT id, file_path, chunk_index, content, summary FROM records WHERE id IN ({', '.join('?' * len(top_ids))})",
+                top_ids
+            )
+        }
+        return [
+            {
+                'id': row_id,
+                'file_path': records[row_id][1],
+                'chunk_index': records[row_id][2],
+                'content': records[row_id][3],
+                'summary': records[row_id][4],
+                **score
+            }
+            for row_id, score in zip(top_ids, scores) if row_id in records
+        ]
+
+    def _positions(self, ids: np.ndarray) -> np.ndarray:
+        """Row position of each id, or -1 where the id has no live row."""
+        if self._by_id is None:
+            live = np.flatnonzero(~self._deleted)
+            self._by_id = live[np.argsort(self._ids[live], kind="stable")]
+        if not len(self._by_id):
+            return np.full(len(ids), -1, dtype=np.int64)
+        sorted_ids = self._ids[self._by_id]
+        found = np.minimum(np.searchsorted(sorted_ids, ids), len(sorted_ids) - 1)
+        return np.where(sorted_ids[found] == ids, self._by_id[found], -1)
+
+    def search_hybrid(
+        self, query: Sequence[float], text: str, k: int = 5, candidates: int = 200, weight: float = 0.5
+    ) -> List[Dict]:
+        """
+        Top-k rows for a question and its embedding. The lexical index picks the
+        ``candidates`` best BM25 matches for ``text`` and only those rows are scored
+        against the embedding, ranked by ``weight * cosine + (1 - weight) * bm25``
+        with BM25 scaled to the best match. Falls back to :meth:`search` when no
+        token of ``text`` is indexed.
+        """
+        if self.lexical is None:
+            raise ValueError("This index was opened without a lexical index")
+        hits = self.lexical.search(text, max(candidates, k))
+        query = normalize(np.asarray(query, dtype=np.float32))
+        with self._lock:
+            positions = self._positions(np.array([doc_id for doc_id, _ in hits], dtype=np.int64))
+            keep = positions >= 0
+            positions = positions[keep]
+            vectors, row_ids = self._vectors[positions], self._ids[positions]
+        if not len(positions):
+            return self.search(query, k)
+        bm25 = np.array([score for _, score in hits])[keep]
+        similarity = vectors @ query
+        combined = weight * similarity + (1 - weight) * bm25 / bm25.max()
+        k = min(k, len(positions))
+        top = np.argpartition(-combined, k - 1)[:k]
+        top = top[np.argsort(-combined[top])]
+        return self._results(
+            [int(i) for i in row_ids[top]],
+            [
+                {'similarity': float(similarity[i]), 'bm25': float(bm25[i]), 'score': float(combined[i])}
+                for i in top
+            ]
+        )
+
+    def close(self):
+        self._db.close()
+        if self.lexical is not None:
+            self.lexical.close()
+
+
+def kmeans(data: np.ndarray, k: int, iterations: int = 15, seed: int = 0) -> np.ndarray:
+    """Spherical k-means over unit rows; returns ``k`` unit centroids."""
+    rng = np.random.default_rng(seed)
+    centroids = data[rng.choice(len(data), k, replace=False)].copy()
+    for _ in range(iterations):
+        labels = nearest_centroids(data, centroids)
+        counts = np.bincount(labels, minlength=k)
+        order = np.argsort(labels, kind="stable")
+        starts = np.cumsum(counts) - counts
+        filled = counts > 0
+        sums = np.zeros_like(centroids)
+        sums[filled] = np.add.reduceat(data[order], starts[filled])
+        # Reseed empty clusters with random rows rather than letting them die
+        empty = np.flatnonzero(~filled)
+        if len(empty):
+            sums[empty] = data[rng.choice(len(data), len(empty), replace=False)]
+        centroids = normalize(sums)
+    return centroids
+
+
+def nearest_centroids(data: np.ndarray, centroids: np.ndarray, batch_size: int = 16384) -> np.ndarray:
+    """Index of the most similar centroid for each row, computed in bounded batches."""
+    labels = np.empty(len(data), dtype=np.int32)
+    for start in range(0, len(data), batch_size):
+        labels[start:start + batch_size] = np.argmax(data[start:start + batch_size] @ centroids.T, axis=1)
+    return labels
+
+
+class IVFVectorIndex(VectorIndex):
+    """
+    Approximate variant of :class:`VectorIndex` (an inverted file index).
+
+    Rows are bucketed under k-means centroids and a query only scores the rows in the
+    ``nprobe`` buckets whose centroids are closest to it. Below ``min_train_rows`` rows
+    it answers exactly. Centroids and per-row assignments (``centroids.npy``,
+    ``assign.i32``) persist next to the vectors; rows added later are assigned to their
+    nearest centroid, and the centroids are retrained once the index has grown
+    ``RETRAIN_GROWTH`` times past the size they were trained on.
+    """
+
+    RETRAIN_GROWTH = 4.0
+    TRAIN_SAMPLE_PER_LIST = 64
+
+    def __init__(
+        self,
+        directory: Optional[str] = None,
+        mmap: bool = True,
+        nlist: Optional[int] = None,
+        nprobe: int = 16,
+        min_train_rows: int = 10000,
+        seed: int = 0,
+        lexical: bool = False
+    ):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.min_train_rows = min_train_rows
+        self.seed = seed
+        self.trained_rows = 0
+        self._centroids: Optional[np.ndarray] = None
+        self._assign = np.empty(0, dtype=np.int32)
+        self._lists: Optional[List[np.ndarray]] = None
+        super().__init__(directory, mmap, lexical=lexical)
+
+    @property
+    def is_trained(self) -> bool:
+        return self._centroids is not None
+
+    def _meta(self) -> Dict:
+        return {**super()._meta(), "trained_rows": self.trained_rows}
+
+    def _after_load(self, meta: Dict):
+        if not os.path.exists(self._path("centroids.npy")):
+            return
+        self._centroids = np.load(self._path("centroids.npy"))
+        self.trained_rows = meta.get("trained_rows", self._size)
+        assign = np.fromfile(self._path("assign.i32"), dtype=np.int32)[:self._size]
+        if len(assign) < self._size:
+            # Rows appended after the assignments were last written (e.g. a crash in between)
+            missing = nearest_centroids(np.asarray(self._vectors[len(assign):]), self._centroids)
+            assign = np.concatenate([assign, missing])
+            self._write_assignments(assign)
+        self._assign = assign
+
+    def _write_assignments(self, assign: np.ndarray):
+        if not self.directory:
+            return
+        assign.tofile(self._path("assign.i32.tmp"))
+        os.replace(self._path("assign.i32.tmp"), self._path("assign.i32"))
+
+    def train(self):
+        """(Re)compute the centroids from the live rows and reassign every row."""
+        with self._lock:
+            live = np.flatnonzero(~self._deleted)
+            nlist = min(self.nlist or max(1, int(np.sqrt(len(live)))), len(live))
+            if nlist == 0:
+                return
+            rng = np.random.default_rng(self.seed)
+            sample_size = min(len(live), nlist * self.TRAIN_SAMPLE_PER_LIST)
+            sample = np.sort(rng.choice(live, sample_size, replace=False))
+            self._centroids = kmeans(np.asarray(self._vectors[sample]), nlist, seed=self.seed)
+            self._assign = nearest_centroids(self._vectors, self._centroids)
+            self._lists = None
+            self.trained_rows = len(live)
+            if self.directory:
+                np.save(self._path("centroids.tmp.npy"), self._centroids)
+                os.replace(self._path("centroids.tmp.npy"), self._path("centroids.npy"))
+                self._write_assignments(self._assign)
+            logger.info(f"Trained IVF index: {nlist} lists over {len(live)} rows")
+
+    def _after_add(self, matrix: np.ndarray):
+        if self._centroids is None:
+            if len(self) >= self.min_train_rows:
+                self.train()
+            return
+        if len(self) > self.RETRAIN_GROWTH * self.trained_rows:
+            self.train()
+            return
+        labels = nearest_centroids(matrix, self._centroids)
+        if self.directory:
+            with open(self._path("assign.i32"), "ab") as f:
+                labels.tofile(f)
+        if self._lists is not None:
+            positions = np.arange(self._size - len(labels), self._size)
+            for label in np.unique(labels):
+                self._lists[label] = np.concatenate([self._lists[label], positions[labels == label]])
+        self._assign = np.concatenate([self._assign, labels])
+
+    def _compact(self):
+        if self._centroids is not None:
+            self._assign = self._assign[~self._deleted]
+        super()._compact()
+
+    def _after_rewrite(self):
+        self._lists = None
+        if self._centroids is not None:
+            self._write_assignments(self._assign)
+
+    def clear(self):
+        with self._lock:
+            self._centroids = None
+            self._assign = np.empty(0, dtype=np.int32)
+            self.trained_rows = 0
+            if self.directory:
+                for name in ("centroids.npy", "assign.i32"):
+                    if os.path.exists(self._path(name)):
+                        os.remove(self._path(name))
+            super().clear()
+
+    def _candidates(self, query: np.ndarray, k: int) -> Optional[np.ndarray]:
+        if self._centroids is None or self.nprobe >= len(self._centroids):
+            return None
+        if self._lists is None:
+            order = np.argsort(self._assign, kind="stable")
+            bounds = np.searchsorted(self._assign[order], np.arange(len(self._centroids) + 1))
+            self._lists = [order[bounds[i]:bounds[i + 1]] for i in range(len(self._centroids))]
+        scores = self._centroids @ query
+        probes = np.argpartition(-scores, self.nprobe - 1)[:self.nprobe]
+        positions = np.concatenate([self._lists[i] for i in probes])
+        # Too few rows in the probed lists to fill the result: score everything instead
+        return positions if len(positions) >= k else None
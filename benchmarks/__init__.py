@@ -0,0 +1,10 @@
+# benchmarks/__init__.py
+"""Local benchmarks; they run against in-process stand-ins, so no real credentials are needed."""
+import os
+import tempfile
+
+for _name in ("GITHUB_TOKEN", "SNOWFLAKE_ACCOUNT", "SNOWFLAKE_USER", "SNOWFLAKE_PASSWORD", "MISTRAL_API_KEY"):
+    os.environ.setdefault(_name, "benchmark")
+
+# Every run starts with empty local caches unless DATA_DIR points somewhere else
+os.environ.setdefault("DATA_DIR", tempfile.mkdtemp(prefix="code_expert_bench_"))
@@ -0,0 +1,118 @@
+# benchmarks/bench_api.py
+"""
+Load test of the question answering API under concurrent users, against local stand-ins.
+
+    python -m benchmarks.bench_api --chunks 500 --requests 200 --concurrency 1 10 50 --latency 0.1
+
+The API runs in uvicorn on a local port, in a thread of its own, backed by an in-memory
+SQLite store of --chunks chunks and FakeMistralService with --latency seconds per model
+call. The stand-in store scans every chunk on the event loop, so keep --chunks small
+enough that searching is not what is being measured. Each concurrency level sends --requests questions drawn from --questions distinct
+ones to /ask and to /ask/stream; for streams, the time to the first answer piece is
+reported too.
+"""
+import argparse
+import asyncio
+import logging
+import random
+import socket
+import threading
+import time
+
+import httpx
+import uvicorn
+
+from app.api.services import APIServices
+from app.main import create_app
+from app.services.job_store import JobStore
+from app.services.model_cache import ModelCache
+from benchmarks.fakes import FakeMistralService, SQLiteSearchService
+
+
+def _percentile(values, share: float) -> float:
+    return sorted(values)[min(int(len(values) * share), len(values) - 1)] * 1000
+
+
+def _serve(services: APIServices):
+    """Start the API on a free local port; returns the server and its base URL."""
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    server = uvicorn.Server(uvicorn.Config(create_app(services), log_level="warning", lifespan="on"))
+    thread = threading.Thread(target=server.run, kwargs={"sockets": [sock]}, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    return server, thread, f"http://127.0.0.1:{sock.getsockname()[1]}"
+
+
+async def _load(base_url: str, path: str, questions, requests: int, concurrency: int):
+    picks = iter(random.Random(concurrency).choices(questions, k=requests))
+    latencies, first_pieces, errors = [], [], 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        async def user():
+            nonlocal errors
+            for question in picks:
+                start = time.perf_counter()
+                first_piece = None
+                async with client.stream("POST", path, json=question) as response:
+                    async for line in response.aiter_lines():
+                        if first_piece is None and line == "event: answer":
+                            first_piece = time.perf_counter() - start
+                    if response.status_code != 200:
+                        errors += 1
+                latencies.append(time.perf_counter() - start)
+                if first_piece is not None:
+                    first_pieces.append(first_piece)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(user() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    line = (f"  {path:12s} {concurrency:4d} users  {requests / elapsed:8.1f} req/s  "
+            f"p50 {_percentile(latencies, 0.5):8.1f} ms  p99 {_percentile(latencies, 0.99):8.1f} ms")
+    if first_pieces:
+        line += f"  first piece p50 {_percentile(first_pieces, 0.5):7.1f} ms  p99 {_percentile(first_pieces, 0.99):7.1f} ms"
+    return line + (f"  {errors} errors" if errors else "")
+
+
+def main(args):
+    mistral = FakeMistralService(latency=args.latency, jitter=0.2, dim=args.dim)
+    store = SQLiteSearchService()
+    rng = random.Random(0)
+    rows = []
+    for idx in range(args.chunks):
+        content = f"def handler_{idx}(request):\n    return request.get('{rng.random()}')\n"
+        rows.append({"repo_name": "demo", "file_path": f"src/module_{idx // 20}.py", "content": content,
+                     "embedding": mistral.embed_text(content), "summary": f"Handler {idx}", "chunk_index": idx % 20})
+    asyncio.run(store.store_embeddings(rows))
+    handlers = [rng.randrange(args.chunks) for _ in range(args.questions)]
+
+    services = APIServices(search_service=store, mistral_service=mistral, model_cache=ModelCache(), job_store=JobStore())
+    server, thread, base_url = _serve(services)
+    print(f"{args.chunks} chunks, {args.questions} distinct questions, model latency {args.latency}s")
+    try:
+        for concurrency in args.concurrency:
+            for path in ("/ask", "/ask/stream"):
+                # Questions are new to every run, so answers cached by earlier runs do not flatter it
+                questions = [{"repository": "demo", "query": f"What does handler_{handler} return? ({path} {concurrency})"}
+                             for handler in handlers]
+                calls = mistral.calls
+                line = asyncio.run(_load(base_url, path, questions, args.requests, concurrency))
+                print(f"{line}  {mistral.calls - calls} model calls")
+    finally:
+        server.should_exit = True
+        thread.join()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--chunks", type=int, default=500)
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--questions", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=200, help="questions sent per concurrency level and endpoint")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--latency", type=float, default=0.1, help="simulated seconds per model call")
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+    main(args)
@@ -0,0 +1,70 @@
+# benchmarks/bench_batching.py
+"""
+Chunks per second for embedding + summarization: one model call per chunk vs MistralBatcher.
+
+    python -m benchmarks.bench_batching --files 20 --chunks-per-file 10 --latency 0.02
+"""
+import argparse
+import asyncio
+import time
+
+from app.services.mistral import MistralService
+from app.services.repository_ingestion import RepositoryProcessor
+from benchmarks.fakes import SQLiteSearchService
+
+
+def _chunk(file_idx: int, chunk_idx: int) -> str:
+    return f"def function_{file_idx}_{chunk_idx}():\n    return {chunk_idx}\n" * 40
+
+
+async def per_chunk_calls(mistral: MistralService, files: int, chunks_per_file: int) -> float:
+    """The previous behaviour: two blocking model calls per chunk, in a serial loop."""
+    start = time.perf_counter()
+    for file_idx in range(files):
+        for chunk_idx in range(chunks_per_file):
+            chunk = _chunk(file_idx, chunk_idx)
+            mistral.generate_embedding(chunk)
+            mistral.generate_response(
+                prompt="Analyze and summarize this code chunk:",
+                messages=[{"role": "user", "content": chunk}]
+            )
+    return files * chunks_per_file / (time.perf_counter() - start)
+
+
+async def batched(mistral: MistralService, files: int, chunks_per_file: int, batch_size: int) -> float:
+    processor = RepositoryProcessor(
+        batch_size=batch_size,
+        mistral_service=mistral,
+        snowflake_service=SQLiteSearchService()
+    )
+    semaphore = asyncio.Semaphore(batch_size)
+
+    async def one_file(file_idx):
+        async with semaphore:
+            content = "\n".join(_chunk(file_idx, i) for i in range(chunks_per_file))
+            await processor.process_content(content, f"src/file_{file_idx}.py", "bench")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one_file(i) for i in range(files)))
+    await processor.flush()
+    stats = await processor.snowflake_service.get_repository_statistics("bench")
+    return stats["total_chunks"] / (time.perf_counter() - start)
+
+
+async def main(files: int, chunks_per_file: int, latency: float, batch_size: int):
+    mistral = MistralService(latency=latency)
+    before = await per_chunk_calls(mistral, files, chunks_per_file)
+    after = await batched(mistral, files, chunks_per_file, batch_size)
+    print(f"{files} files x {chunks_per_file} chunks, {latency * 1000:.0f} ms per model call")
+    print(f"  call per chunk: {before:10.1f} chunks/s")
+    print(f"  batched:        {after:10.1f} chunks/s  ({after / before:.1f}x)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--files", type=int, default=20)
+    parser.add_argument("--chunks-per-file", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.02, help="simulated seconds per model call")
+    parser.add_argument("--batch-size", type=int, default=4, help="files processed concurrently")
+    args = parser.parse_args()
+    asyncio.run(main(args.files, args.chunks_per_file, args.latency, args.batch_size))
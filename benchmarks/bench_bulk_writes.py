@@ -0,0 +1,70 @@
+# benchmarks/bench_bulk_writes.py
+"""
+Rows per second for storing chunks: one insert + commit per row vs EmbeddingWriter batches.
+
+    python -m benchmarks.bench_bulk_writes --rows 5000 --batch-rows 500
+
+Runs against the file-backed SQLite stand-in, so every commit pays a real fsync.
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from app.services.batching import EmbeddingWriter
+from benchmarks.fakes import SQLiteSearchService
+
+
+def _rows(count: int, repo_name: str):
+    return [
+        {
+            "repo_name": repo_name,
+            "file_path": f"src/module_{idx // 10}.py",
+            "content": f"def handler_{idx}(request):\n    return {idx}\n" * 20,
+            "embedding": [((idx * 7 + dim) % 100) / 100 for dim in range(64)],
+            "summary": f"Handler number {idx}",
+            "file_sha": f"{idx // 10:040x}",
+            "chunk_index": idx % 10
+        }
+        for idx in range(count)
+    ]
+
+
+def _snapshot(store: SQLiteSearchService, repo_name: str):
+    return store.conn.execute(
+        "SELECT file_path, chunk_index, content, embedding, summary, file_sha FROM code_embeddings "
+        "WHERE repo_name = ? ORDER BY file_path, chunk_index",
+        (repo_name,)
+    ).fetchall()
+
+
+async def main(rows: int, batch_rows: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SQLiteSearchService(os.path.join(tmp, "bench.sqlite3"))
+
+        start = time.perf_counter()
+        for row in _rows(rows, "per_row"):
+            await store.store_embedding(**row)
+        per_row = rows / (time.perf_counter() - start)
+
+        writer = EmbeddingWriter(store, max_rows=batch_rows, max_wait=0.05)
+        start = time.perf_counter()
+        await asyncio.gather(*(writer.write(row) for row in _rows(rows, "batched")))
+        await writer.drain()
+        batched = rows / (time.perf_counter() - start)
+
+        assert _snapshot(store, "per_row") == _snapshot(store, "batched"), "batched rows differ"
+        store.close()
+
+    print(f"{rows} rows, {batch_rows} rows per batch ({writer.batches_written} batches)")
+    print(f"  insert + commit per row: {per_row:10.1f} rows/s")
+    print(f"  buffered batches:        {batched:10.1f} rows/s  ({batched / per_row:.1f}x)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--batch-rows", type=int, default=500)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.batch_rows))
@@ -0,0 +1,76 @@
+# benchmarks/bench_chunking.py
+"""
+Chunking throughput and peak memory: the list-building splitter vs the streaming one.
+
+    python -m benchmarks.bench_chunking --files 20 --size 2000000
+
+Files are generated Python modules; peak memory is measured with tracemalloc while
+each chunker walks every file, keeping only a running count of chunks.
+"""
+import argparse
+import time
+import tracemalloc
+
+from app.services.chunking import iter_chunks, iter_code_chunks
+
+
+def reference_chunk_text(text, chunk_size=3000, overlap=200):
+    """The splitter as it was: walks back one character at a time and builds the full list."""
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = min(start + chunk_size, len(text))
+        while end > start and not text[end - 1].isspace() and end < len(text):
+            end -= 1
+        chunks.append(text[start:end].strip())
+        start += chunk_size - overlap
+    return [chunk for chunk in chunks if chunk]
+
+
+def generate_module(size: int, seed: int) -> str:
+    parts = ["import os\nimport sys\n\n"]
+    length = len(parts[0])
+    i = 0
+    while length < size:
+        lines = 5 + (seed + i) % 40
+        part = (
+            f"@decorator({i})\ndef function_{seed}_{i}(argument, other=None):\n"
+            + "".join(f"    value_{j} = compute(argument, {j}) + other_value_{j}\n" for j in range(lines))
+            + "    return value_0\n\n\n"
+        )
+        parts.append(part)
+        length += len(part)
+        i += 1
+    return "".join(parts)
+
+
+def measure(name, chunker, texts, chunk_size, overlap):
+    tracemalloc.start()
+    start = time.perf_counter()
+    chunks = 0
+    for path, text in texts:
+        for _ in chunker(text, path, chunk_size, overlap):
+            chunks += 1
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"  {name:14s} {chunks:8d} chunks  {chunks / elapsed:10.0f} chunks/s  peak {peak / 1e6:8.2f} MB")
+
+
+def main(files: int, size: int, chunk_size: int, overlap: int):
+    texts = [(f"module_{i}.py", generate_module(size, i)) for i in range(files)]
+    total = sum(len(text) for _, text in texts)
+    print(f"{files} files, {total / 1e6:.1f} MB of source, chunk_size={chunk_size} overlap={overlap}")
+    measure("list", lambda text, path, size, over: reference_chunk_text(text, size, over), texts, chunk_size, overlap)
+    measure("streaming", lambda text, path, size, over: iter_chunks(text, size, over), texts, chunk_size, overlap)
+    measure("syntax", iter_code_chunks, texts, chunk_size, overlap)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--files", type=int, default=20)
+    parser.add_argument("--size", type=int, default=2_000_000)
+    parser.add_argument("--chunk-size", type=int, default=3000)
+    parser.add_argument("--overlap", type=int, default=200)
+    args = parser.parse_args()
+    main(args.files, args.size, args.chunk_size, args.overlap)
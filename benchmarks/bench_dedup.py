@@ -0,0 +1,94 @@
+# benchmarks/bench_dedup.py
+"""
+Model calls, stored bytes and time saved by near-duplicate detection when ingesting a fork.
+
+    python -m benchmarks.bench_dedup --files 200 --copied 0.8 --latency 0.5
+
+An upstream repository is ingested first, then a fork that vendors --copied of its
+modules with a one-line edit each and rewrites the rest. The fork is ingested with and
+without the dedup stage into fresh stores that already hold upstream.
+"""
+import argparse
+import asyncio
+import logging
+import random
+import time
+
+import httpx
+
+from app.services.dedup import DedupIndex
+from app.services.file_selection import FileSelectionPolicy
+from app.services.github import GitHubService
+from app.services.http_cache import HTTPCache
+from app.services.model_cache import ModelCache
+from app.services.repository_ingestion import RepositoryProcessor
+from benchmarks.fakes import FakeGitHubRepo, FakeMistralService, SQLiteSearchService
+
+
+def _fork(upstream: FakeGitHubRepo, copied: float, seed: int) -> dict:
+    rng = random.Random(seed)
+    rewritten = FakeGitHubRepo.synthetic(len(upstream.files), seed=seed + 1).files
+    files = {}
+    for (path, data), other in zip(upstream.files.items(), rewritten.values()):
+        if rng.random() < copied:
+            files[f"vendor/{path}"] = data.replace(b"import os\n", b"import os  # vendored\n", 1)
+        else:
+            files[path] = other
+    return files
+
+
+async def _ingest(files: dict, name: str, store, dedup_index, mistral) -> RepositoryProcessor:
+    repo = FakeGitHubRepo(files, name=name)
+    processor = RepositoryProcessor(
+        batch_size=8,
+        github_service=GitHubService(transport=httpx.MockTransport(repo.handler), cache=HTTPCache()),
+        mistral_service=mistral,
+        snowflake_service=store,
+        model_cache=ModelCache(),
+        dedup_index=dedup_index,
+        # The copies are what is measured here, not left out as vendored code
+        file_policy=FileSelectionPolicy(skip_vendored=False)
+    )
+    if dedup_index is None:
+        processor.dedup_index = None
+    if not await processor.ingest_repository("octo", name, incremental=False):
+        raise RuntimeError("Ingestion failed; see the log")
+    return processor
+
+
+def _stored_bytes(store, repo_name: str) -> int:
+    return store.conn.execute(
+        "SELECT COALESCE(SUM(LENGTH(content) + COALESCE(LENGTH(embedding), 0) + COALESCE(LENGTH(summary), 0)), 0) "
+        "FROM code_embeddings WHERE repo_name = ?", (repo_name,)
+    ).fetchone()[0]
+
+
+async def run(files: int, functions: int, copied: float, latency: float, threshold: float):
+    upstream = FakeGitHubRepo.synthetic(files, functions)
+    fork = _fork(upstream, copied, seed=7)
+    print(f"upstream {files} files, fork vendors {copied:.0%} of them; model latency {latency}s")
+    for dedup in (False, True):
+        store = SQLiteSearchService()
+        dedup_index = DedupIndex(threshold=threshold) if dedup else None
+        await _ingest(upstream.files, "upstream", store, dedup_index, FakeMistralService())
+        mistral = FakeMistralService(latency=latency)
+        start = time.perf_counter()
+        processor = await _ingest(fork, "fork", store, dedup_index, mistral)
+        elapsed = time.perf_counter() - start
+        report = processor.dedup_report() if dedup else {}
+        print(f"  dedup {'on ' if dedup else 'off'}  {elapsed:7.2f}s  {mistral.calls:5d} model batches  "
+              f"{_stored_bytes(store, 'fork') / 2**20:7.2f} MB stored  "
+              f"{report.get('duplicate_chunks', 0)} duplicate chunks, {report.get('model_calls_saved', 0)} calls saved")
+        store.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--files", type=int, default=200)
+    parser.add_argument("--functions", type=int, default=40)
+    parser.add_argument("--copied", type=float, default=0.8, help="share of upstream modules vendored into the fork")
+    parser.add_argument("--latency", type=float, default=0.5, help="simulated seconds per model call")
+    parser.add_argument("--threshold", type=float, default=0.9)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+    asyncio.run(run(args.files, args.functions, args.copied, args.latency, args.threshold))
@@ -0,0 +1,189 @@
+# benchmarks/bench_e2e.py
+"""
+End-to-end ingestion and search throughput against local fakes of GitHub, Mistral and Snowflake.
+
+    python -m benchmarks.bench_e2e --files 500 --latency 0.02 --save-baseline benchmarks/baselines/e2e.json
+    python -m benchmarks.bench_e2e --files 500 --latency 0.02 --baseline benchmarks/baselines/e2e.json
+
+RepositoryProcessor.ingest_repository runs unchanged over a synthetic repository served
+through httpx's MockTransport, a latency-injecting FakeMistralService and the SQLite
+store; search_similar is then timed over the stored chunks. Each figure is the median
+of --repeat runs. With --baseline the report is compared to a saved one and the exit
+status is 1 if any figure regressed by more than --tolerance. Baselines depend on the
+machine; record them where you compare them.
+"""
+from typing import Dict, List
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+
+import httpx
+import numpy as np
+
+from app.services.github import GitHubService
+from app.services.http_cache import HTTPCache
+from app.services.model_cache import ModelCache
+from app.services.repository_ingestion import RepositoryProcessor
+from benchmarks.fakes import FakeGitHubRepo, FakeMistralService, SQLiteSearchService
+
+STAGES = ("fetch", "chunk", "embed", "summarize", "store")
+
+# Changes smaller than these are noise, whatever the relative difference
+NOISE_FLOOR = {"_seconds": 0.002, "_mb": 8.0}
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+def _percentiles(samples: List[float]) -> Dict[str, float]:
+    values = np.asarray(samples) if samples else np.zeros(1)
+    return {"p50_seconds": float(np.percentile(values, 50)), "p99_seconds": float(np.percentile(values, 99))}
+
+
+async def run(files: int, functions: int, latency: float, jitter: float, fetch_workers: int, queries: int,
+              store_path: str) -> Dict:
+    repo = FakeGitHubRepo.synthetic(files, functions)
+    mistral = FakeMistralService(latency=latency, jitter=jitter)
+    store = SQLiteSearchService(store_path)
+    processor = RepositoryProcessor(
+        batch_size=fetch_workers,
+        github_service=GitHubService(transport=httpx.MockTransport(repo.handler), cache=HTTPCache()),
+        mistral_service=mistral,
+        snowflake_service=store,
+        model_cache=ModelCache(memory_bytes=4 * 1024 * 1024)
+    )
+
+    start = time.perf_counter()
+    ok = await processor.ingest_repository("octo", "demo", incremental=False)
+    elapsed = time.perf_counter() - start
+    if not ok:
+        raise RuntimeError("Ingestion failed; see the log")
+    metrics = processor.metrics.summary()
+    chunks = int(metrics["ingest_chunks_total"].get("outcome=stored", 0))
+    stage_latency = metrics["pipeline_stage_seconds"]
+    report = {
+        "ingest": {
+            "files_per_second": files / elapsed,
+            "chunks_per_second": chunks / elapsed,
+            "peak_rss_mb": _peak_rss_mb(),
+            **{
+                f"{stage}_{quantile}_seconds": stage_latency[f"stage={stage}"][quantile]
+                for stage in STAGES for quantile in ("p50", "p99")
+            }
+        }
+    }
+
+    contents = [row[0] for row in store.conn.execute("SELECT content FROM code_embeddings LIMIT 1000")]
+    rng = random.Random(0)
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(queries):
+        query = mistral.embed_text(rng.choice(contents))
+        began = time.perf_counter()
+        await store.search_similar(query, "demo", limit=5)
+        latencies.append(time.perf_counter() - began)
+    report["search"] = {"queries_per_second": queries / (time.perf_counter() - start), **_percentiles(latencies)}
+    report["config"] = {
+        "files": files, "functions": functions, "chunks": chunks, "latency": latency,
+        "jitter": jitter, "fetch_workers": fetch_workers, "queries": queries
+    }
+    store.close()
+    return report
+
+
+def median_report(reports: List[Dict]) -> Dict:
+    """Per-figure median over repeated runs."""
+    return {
+        "ingest": {name: float(np.median([r["ingest"][name] for r in reports])) for name in reports[0]["ingest"]},
+        "search": {name: float(np.median([r["search"][name] for r in reports])) for name in reports[0]["search"]},
+        "config": {**reports[0]["config"], "repeat": len(reports)}
+    }
+
+
+def find_regressions(current: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """
+    Figures that got worse than the baseline by more than ``tolerance`` (a fraction).
+    Rates (``*_per_second``) must not fall; latencies and memory must not rise.
+    """
+    regressions = []
+    for section in ("ingest", "search"):
+        for name, before in baseline.get(section, {}).items():
+            after = current.get(section, {}).get(name)
+            if after is None or not before:
+                continue
+            if name.endswith("_per_second"):
+                worse = after < before * (1 - tolerance)
+            else:
+                floor = next((value for suffix, value in NOISE_FLOOR.items() if name.endswith(suffix)), 0.0)
+                worse = after > before * (1 + tolerance) and after - before > floor
+            if worse:
+                regressions.append(f"{section}.{name}: {before:.4g} -> {after:.4g} ({(after - before) / before:+.0%})")
+    return regressions
+
+
+def _print_report(report: Dict):
+    config, ingest, search = report["config"], report["ingest"], report["search"]
+    print(f"{config['files']} files, {config['chunks']} chunks, model latency {config['latency']}s")
+    print(f"  ingest  {ingest['files_per_second']:9.1f} files/s  {ingest['chunks_per_second']:9.1f} chunks/s  "
+          f"peak RSS {ingest['peak_rss_mb']:.0f} MB")
+    for stage in STAGES:
+        print(f"  {stage:10s} p50 {ingest[f'{stage}_p50_seconds'] * 1000:8.2f} ms  "
+              f"p99 {ingest[f'{stage}_p99_seconds'] * 1000:8.2f} ms")
+    print(f"  search  {search['queries_per_second']:9.1f} queries/s  p50 {search['p50_seconds'] * 1000:.2f} ms  "
+          f"p99 {search['p99_seconds'] * 1000:.2f} ms")
+
+
+def main(args) -> int:
+    reports = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for attempt in range(args.repeat):
+            reports.append(asyncio.run(run(
+                args.files, args.functions, args.latency, args.jitter, args.fetch_workers, args.queries,
+                os.path.join(tmp, f"store_{attempt}.sqlite3")
+            )))
+    report = median_report(reports)
+    _print_report(report)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save_baseline)), exist_ok=True)
+        with open(args.save_baseline, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print(f"Baseline saved to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("config") != report["config"]:
+            print(f"Warning: baseline was recorded with {baseline.get('config')}")
+        regressions = find_regressions(report, baseline, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} regressions beyond {args.tolerance:.0%}:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"No regressions beyond {args.tolerance:.0%} against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--files", type=int, default=500)
+    parser.add_argument("--functions", type=int, default=40, help="functions per generated module")
+    parser.add_argument("--latency", type=float, default=0.02, help="simulated seconds per model call")
+    parser.add_argument("--jitter", type=float, default=0.25, help="latency varies by up to this fraction")
+    parser.add_argument("--fetch-workers", type=int, default=8)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--baseline", help="compare against this saved report")
+    parser.add_argument("--save-baseline", help="write this run's report here")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    sys.exit(main(parser.parse_args()))
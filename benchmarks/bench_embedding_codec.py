@@ -0,0 +1,54 @@
+# benchmarks/bench_embedding_codec.py
+"""
+Stored bytes and encode/decode throughput of embedding encodings vs the JSON VARIANT form.
+
+    python -m benchmarks.bench_embedding_codec --rows 2000 --dim 1024
+
+Bytes are as sent in an INSERT: JSON text, or binary inlined as a hex literal.
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from app.services.embedding_codec import ENCODINGS, decode_embedding, encode_embedding, parse_json_embedding
+
+
+def main(rows: int, dim: int):
+    vectors = np.random.default_rng(0).normal(size=(rows, dim)).astype(np.float32)
+    lists = [vector.tolist() for vector in vectors]
+
+    start = time.perf_counter()
+    encoded = [json.dumps({"vector": vector}) for vector in lists]
+    encode_time = time.perf_counter() - start
+    start = time.perf_counter()
+    for value in encoded:
+        parse_json_embedding(value)
+    decode_time = time.perf_counter() - start
+    stored = sum(len(value) for value in encoded) / rows
+    baseline = (stored, rows / encode_time, rows / decode_time)
+
+    print(f"{rows} embeddings x {dim} dims")
+    print(f"  {'json':8s} {baseline[0]:9.0f} B/row  encode {baseline[1]:9.0f}/s  decode {baseline[2]:9.0f}/s")
+    for encoding in ENCODINGS:
+        start = time.perf_counter()
+        packed = [encode_embedding(vector, encoding) for vector in lists]
+        encode_rate = rows / (time.perf_counter() - start)
+        start = time.perf_counter()
+        restored = np.stack([decode_embedding(value) for value in packed])
+        decode_rate = rows / (time.perf_counter() - start)
+        cosine = np.sum(restored * vectors, axis=1) / (np.linalg.norm(restored, axis=1) * np.linalg.norm(vectors, axis=1))
+        stored = 2 * sum(len(value) for value in packed) / rows
+        print(
+            f"  {encoding:8s} {stored:9.0f} B/row  encode {encode_rate:9.0f}/s  decode {decode_rate:9.0f}/s  "
+            f"({baseline[0] / stored:.1f}x smaller, min cosine {cosine.min():.5f})"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--dim", type=int, default=1024)
+    args = parser.parse_args()
+    main(args.rows, args.dim)
@@ -0,0 +1,103 @@
+# benchmarks/bench_github_client.py
+"""
+Requests per second for file fetches: a new client per call vs the pooled GitHubService client.
+
+    python -m benchmarks.bench_github_client --requests 500 --concurrency 10
+    python -m benchmarks.bench_github_client --mock
+
+By default a local HTTP server is started on a real socket, so connection setup is
+included in the numbers. ``--mock`` uses ``httpx.MockTransport`` instead, which only
+measures client construction and request overhead.
+"""
+import argparse
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+
+from app.services.github import GitHubService
+
+PAYLOAD = json.dumps({"content": "cHJpbnQoImhlbGxvIik=\n", "encoding": "base64"}).encode()
+
+
+class _BlobHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(PAYLOAD)))
+        self.end_headers()
+        self.wfile.write(PAYLOAD)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _start_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _BlobHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def _mock_transport() -> httpx.MockTransport:
+    return httpx.MockTransport(lambda request: httpx.Response(200, content=PAYLOAD))
+
+
+async def _per_call_client(url: str, transport) -> None:
+    """The previous behaviour: one AsyncClient (and connection) per request."""
+    async with httpx.AsyncClient(follow_redirects=True, transport=transport) as client:
+        response = await client.get(url)
+        response.raise_for_status()
+        response.json().get("content")
+
+
+async def _run(fetch, urls, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(url):
+        async with semaphore:
+            await fetch(url)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(url) for url in urls))
+    return len(urls) / (time.perf_counter() - start)
+
+
+async def main(requests: int, concurrency: int, mock: bool):
+    server = None
+    if mock:
+        base_url = "https://api.github.test"
+    else:
+        server, base_url = _start_server()
+    urls = [f"{base_url}/repos/o/r/git/blobs/{i}" for i in range(requests)]
+
+    try:
+        per_call = await _run(
+            lambda url: _per_call_client(url, _mock_transport() if mock else None),
+            urls,
+            concurrency
+        )
+        async with GitHubService(transport=_mock_transport() if mock else None) as service:
+            pooled = await _run(service.get_file_content, urls, concurrency)
+    finally:
+        if server:
+            server.shutdown()
+
+    mode = "MockTransport" if mock else "local socket"
+    print(f"{requests} requests, concurrency {concurrency} ({mode})")
+    print(f"  client per call: {per_call:10.1f} req/s")
+    print(f"  pooled client:   {pooled:10.1f} req/s  ({pooled / per_call:.1f}x)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--mock", action="store_true", help="use httpx.MockTransport instead of a socket")
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency, args.mock))
@@ -0,0 +1,41 @@
+# benchmarks/bench_parallel.py
+"""
+Multi-repository ingestion throughput as worker processes are added.
+
+    python -m benchmarks.bench_parallel --repos 8 --files 200 --processes 1 2 4
+
+Model latency defaults to zero so that decoding, chunking, hashing and storing (the
+CPU-bound part a single event loop cannot spread over cores) dominate.
+"""
+import argparse
+import functools
+import logging
+import tempfile
+
+from app.services.parallel_ingestion import IngestionTask, ingest_repositories
+from benchmarks.fakes import offline_processor
+
+
+def main(repos: int, files: int, functions: int, latency: float, processes_list):
+    logging.disable(logging.INFO)
+    tasks = [IngestionTask("octo", f"repo_{idx}") for idx in range(repos)]
+    print(f"{repos} repositories x {files} files, model latency {latency}s")
+    for processes in processes_list:
+        with tempfile.TemporaryDirectory() as store_dir:
+            factory = functools.partial(
+                offline_processor, store_dir=store_dir, files=files, functions=functions, latency=latency
+            )
+            report = ingest_repositories(tasks, processes=processes, processor_factory=factory)
+        print(f"  {processes:2d} processes  {report['seconds']:7.2f}s  {report['files_per_second']:9.1f} files/s  "
+              f"{report['chunks_per_second']:9.1f} chunks/s  ({report['succeeded']}/{report['tasks']} ok)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repos", type=int, default=8)
+    parser.add_argument("--files", type=int, default=200)
+    parser.add_argument("--functions", type=int, default=40)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--processes", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
+    main(args.repos, args.files, args.functions, args.latency, args.processes)
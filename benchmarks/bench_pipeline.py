@@ -0,0 +1,77 @@
+# benchmarks/bench_pipeline.py
+"""
+Throughput, per-stage activity and peak memory of the staged ingestion pipeline.
+
+    python -m benchmarks.bench_pipeline --files 50000 --latency 0.02
+
+Files are generated on the fly and fed in as if extracted from a repository archive, so
+memory should stay flat as --files grows: compare the RSS growth of a small and a large run.
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+import psutil
+
+from app.services.mistral import MistralService
+from app.services.model_cache import ModelCache
+from app.services.repository_ingestion import RepositoryProcessor, _FileJob
+from benchmarks.fakes import SQLiteSearchService
+
+
+def _files(count: int):
+    for idx in range(count):
+        body = "".join(f"def handler_{idx}_{fn}(request):\n    return {fn}\n\n" for fn in range(200))
+        yield _FileJob(f"src/pkg_{idx // 100}/module_{idx}.py", f"{idx:040x}", data=body.encode())
+
+
+async def run(files: int, latency: float, fetch_workers: int, store_path: str):
+    processor = RepositoryProcessor(
+        batch_size=fetch_workers,
+        mistral_service=MistralService(latency=latency),
+        snowflake_service=SQLiteSearchService(store_path),
+        model_cache=ModelCache(memory_bytes=4 * 1024 * 1024)
+    )
+    process = psutil.Process()
+    baseline = peak = process.memory_info().rss
+    done = False
+
+    async def sample():
+        nonlocal peak
+        while not done:
+            peak = max(peak, process.memory_info().rss)
+            await asyncio.sleep(0.05)
+
+    sampler = asyncio.create_task(sample())
+    start = time.perf_counter()
+    results = await processor._run_pipeline("bench", _files(files))
+    await processor.flush()
+    elapsed = time.perf_counter() - start
+    done = True
+    await sampler
+    processor.snowflake_service.close()
+
+    chunks = sum(result["chunks_processed"] for result in results if result)
+    return elapsed, chunks, (peak - baseline) / 2**20, processor.pipeline.summary()
+
+
+async def main(files: int, latency: float, fetch_workers: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        for count in (max(1, files // 10), files):
+            elapsed, chunks, growth, stages = await run(count, latency, fetch_workers, os.path.join(tmp, f"{count}.sqlite3"))
+            print(f"{count} files, {chunks} chunks in {elapsed:.1f}s: {count / elapsed:.1f} files/s, "
+                  f"{chunks / elapsed:.1f} chunks/s, peak RSS +{growth:.1f} MB")
+            for name, stage in stages.items():
+                print(f"  {name:10s} workers {stage['workers']:3d}  {stage['per_second']:9.1f}/s  "
+                      f"utilization {stage['utilization']:.2f}  max queue {stage['max_queue_depth']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--files", type=int, default=5000)
+    parser.add_argument("--latency", type=float, default=0.02, help="simulated seconds per model call")
+    parser.add_argument("--fetch-workers", type=int, default=8)
+    args = parser.parse_args()
+    asyncio.run(main(args.files, args.latency, args.fetch_workers))
@@ -0,0 +1,89 @@
+# benchmarks/bench_query_cache.py
+"""
+Search latency for concurrent users repeating popular questions, with and without the query cache.
+
+    python -m benchmarks.bench_query_cache --users 20 --requests 2000 --questions 50 --latency 0.2
+
+Questions are drawn from a Zipf-like distribution over --questions distinct embeddings.
+Each warehouse scan blocks a database thread for --latency seconds, standing in for
+the Snowflake round trip; the scan count is how many reached the warehouse.
+"""
+import argparse
+import asyncio
+import logging
+import statistics
+import time
+
+import numpy as np
+
+from app.services.query_cache import QueryCache
+from app.services.snowflake import SnowflakeSearchService
+
+
+class SlowWarehouse:
+    """Connection stand-in: every scan sleeps ``latency`` seconds and finds nothing."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.scans = 0
+
+    def cursor(self):
+        return self
+
+    def execute(self, query, params=None):
+        if " ".join(query.split()).startswith("SELECT id, embedding_packed, embedding FROM"):
+            self.scans += 1
+            time.sleep(self.latency)
+
+    def fetchall(self):
+        return []
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+async def run(cached: bool, users: int, requests: int, questions: int, latency: float, dim: int):
+    warehouse = SlowWarehouse(latency)
+    service = SnowflakeSearchService(connect=lambda: warehouse, query_cache=QueryCache())
+    if not cached:
+        service.query_cache = None
+    rng = np.random.default_rng(0)
+    embeddings = rng.standard_normal((questions, dim), dtype=np.float32).tolist()
+    weights = 1 / np.arange(1, questions + 1)
+    picks = iter(rng.choice(questions, requests, p=weights / weights.sum()).tolist())
+    latencies = []
+
+    async def user():
+        for pick in picks:
+            start = time.perf_counter()
+            await service.search_similar(embeddings[pick], "demo", use_index=False)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(user() for _ in range(users)))
+    elapsed = time.perf_counter() - start
+    service.close()
+    latencies.sort()
+    print(f"  cache {'on ' if cached else 'off'}  {requests / elapsed:8.1f} searches/s  "
+          f"p50 {statistics.median(latencies) * 1000:8.2f} ms  p99 {latencies[int(len(latencies) * 0.99)] * 1000:8.2f} ms  "
+          f"{warehouse.scans} warehouse scans")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--questions", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds per warehouse scan")
+    parser.add_argument("--dim", type=int, default=1024)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+    print(f"{args.users} users, {args.requests} searches over {args.questions} questions, scan latency {args.latency}s")
+    for cached in (False, True):
+        asyncio.run(run(cached, args.users, args.requests, args.questions, args.latency, args.dim))
@@ -0,0 +1,81 @@
+# benchmarks/bench_startup.py
+"""
+Import time and cold start of the services, each measured in a fresh interpreter.
+
+    python -m benchmarks.bench_startup --runs 7
+
+Every case runs --runs times in a new Python process; the medians of the case's own time
+and of the whole process (interpreter start-up and exit included) are reported, with the
+heavy dependencies the case ended up loading. The deferred dependencies are timed on
+their own too: that is what a process pays on first use instead of at import.
+Placeholder credentials are used where none are set; nothing connects anywhere.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+HEAVY_MODULES = ("snowflake.connector", "numpy", "psutil", "pydantic_settings", "httpx", "fastapi")
+
+CASES = {
+    "interpreter": "",
+    "import github": "import app.services.github",
+    "import snowflake": "import app.services.snowflake",
+    "import ingestion": "import app.services.repository_ingestion",
+    "import api": "import app.main",
+    "cold start: processor": (
+        "from app.services.repository_ingestion import RepositoryProcessor\n"
+        "RepositoryProcessor()"
+    ),
+    "cold start: worker": (
+        "from app.services.parallel_ingestion import IngestionTask, default_processor\n"
+        "from app.services.rate_limit import RateLimitScheduler\n"
+        "default_processor(IngestionTask('octo', 'demo'), RateLimitScheduler())"
+    ),
+    "deferred: snowflake.connector": "import snowflake.connector",
+    "deferred: numpy": "import numpy",
+    "deferred: psutil": "import psutil",
+}
+
+TEMPLATE = """
+import time
+started = time.perf_counter()
+{code}
+elapsed = time.perf_counter() - started
+import json, sys
+print(json.dumps([elapsed, [name for name in {heavy!r} if name in sys.modules]]))
+"""
+
+
+def measure(code: str, runs: int, env: dict):
+    times, totals, loaded = [], [], []
+    script = TEMPLATE.format(code=code, heavy=HEAVY_MODULES)
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = subprocess.run([sys.executable, "-c", script], env=env, capture_output=True, text=True, check=True)
+        totals.append(time.perf_counter() - started)
+        elapsed, loaded = json.loads(result.stdout)
+        times.append(elapsed)
+    return statistics.median(times), statistics.median(totals), loaded
+
+
+def main(runs: int):
+    env = dict(os.environ)
+    for name in ("GITHUB_TOKEN", "SNOWFLAKE_ACCOUNT", "SNOWFLAKE_USER", "SNOWFLAKE_PASSWORD", "MISTRAL_API_KEY"):
+        env.setdefault(name, "placeholder")
+    env.setdefault("DATA_DIR", tempfile.mkdtemp(prefix="code_expert_bench_"))
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [os.getcwd(), env.get("PYTHONPATH")]))
+    for name, code in CASES.items():
+        elapsed, total, loaded = measure(code, runs, env)
+        print(f"  {name:30s} {elapsed * 1000:7.1f} ms  process {total * 1000:7.1f} ms  {', '.join(loaded) or '-'}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=7)
+    args = parser.parse_args()
+    main(args.runs)
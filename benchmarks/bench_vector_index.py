@@ -0,0 +1,69 @@
+# benchmarks/bench_vector_index.py
+"""
+Query latency of the local VectorIndex against a naive NumPy scan.
+
+    python -m benchmarks.bench_vector_index --rows 200000 --dim 256
+    python -m benchmarks.bench_vector_index --rows 1000000 --dim 256 --mmap
+
+The naive scan mirrors what the warehouse query does per call: compute cosine distance
+against every raw row (norms included) and fully sort the scores.
+"""
+import argparse
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+from app.services.vector_index import VectorIndex
+
+
+def _percentile(samples, pct):
+    return sorted(samples)[min(len(samples) - 1, int(len(samples) * pct / 100))]
+
+
+def naive_search(vectors: np.ndarray, query: np.ndarray, k: int):
+    scores = (vectors @ query) / (np.linalg.norm(vectors, axis=1) * np.linalg.norm(query))
+    return np.argsort(-scores)[:k]
+
+
+def main(rows: int, dim: int, queries: int, k: int, mmap: bool):
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((rows, dim), dtype=np.float32)
+    records = [{"file_path": f"src/{i % 1000}.py", "chunk_index": i, "content": "", "summary": ""} for i in range(rows)]
+    query_set = rng.standard_normal((queries, dim), dtype=np.float32)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        index = VectorIndex(tmp if mmap else None, mmap=mmap)
+        start = time.perf_counter()
+        for offset in range(0, rows, 50000):
+            index.add(range(offset + 1, min(rows, offset + 50000) + 1), vectors[offset:offset + 50000],
+                      records[offset:offset + 50000])
+        build = time.perf_counter() - start
+
+        naive, indexed = [], []
+        for query in query_set:
+            start = time.perf_counter()
+            expected = naive_search(vectors, query, k)
+            naive.append((time.perf_counter() - start) * 1000)
+
+            start = time.perf_counter()
+            results = index.search(query, k)
+            indexed.append((time.perf_counter() - start) * 1000)
+            assert [row["id"] - 1 for row in results] == [int(i) for i in expected]
+        index.close()
+
+    print(f"{rows} x {dim} float32 ({'memory-mapped' if mmap else 'in memory'}), top-{k}, build {build:.1f}s")
+    print(f"  naive scan:   p50 {statistics.median(naive):8.2f} ms  p99 {_percentile(naive, 99):8.2f} ms")
+    print(f"  VectorIndex:  p50 {statistics.median(indexed):8.2f} ms  p99 {_percentile(indexed, 99):8.2f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--mmap", action="store_true", help="persist to a temp dir and memory-map the vectors")
+    args = parser.parse_args()
+    main(args.rows, args.dim, args.queries, args.k, args.mmap)
@@ -0,0 +1,290 @@
+# benchmarks/fakes.py
+"""Local stand-ins for the remote services, used by the benchmarks and the offline tests."""
+from typing import Dict, List, Optional
+import base64
+import hashlib
+import os
+import random
+import sqlite3
+import time
+import zlib
+import httpx
+import numpy as np
+
+from app.services.embedding_codec import decode_embedding, encode_embedding
+from app.services.github import GitHubService
+from app.services.http_cache import HTTPCache
+from app.services.job_store import JobStore
+from app.services.mistral import MistralService
+from app.services.model_cache import ModelCache
+from app.services.repository_ingestion import RepositoryProcessor
+
+
+class FakeMistralService(MistralService):
+    """
+    MistralService stand-in with realistic vectors and latency. Embeddings are
+    deterministic per text (seeded by its CRC32), so searches rank consistently across
+    runs; every call sleeps ``latency`` seconds, varied by up to ``jitter`` either way.
+    """
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, dim: int = 1024, seed: int = 0):
+        super().__init__(latency=latency)
+        self.jitter = jitter
+        self.dim = dim
+        self._random = random.Random(seed)
+        self.calls = 0
+
+    def _simulate_call(self):
+        self.calls += 1
+        if self.latency:
+            spread = self.latency * self.jitter
+            time.sleep(max(self.latency + self._random.uniform(-spread, spread), 0.0))
+
+    def embed_text(self, text: str) -> List[float]:
+        rng = np.random.default_rng(zlib.crc32(text.encode("utf-8")))
+        return rng.standard_normal(self.dim, dtype=np.float32).tolist()
+
+    def generate_embedding(self, text: str) -> List[float]:
+        self._simulate_call()
+        return self.embed_text(text)
+
+    def generate_embeddings(self, texts: List[str]) -> List[List[float]]:
+        self._simulate_call()
+        return [self.embed_text(text) for text in texts]
+
+
+class SQLiteSearchService:
+    """
+    SQLite-backed substitute for SnowflakeSearchService exposing the same async interface.
+    Pass a file path instead of ``:memory:`` to include commit/fsync costs in benchmarks.
+    """
+
+    def __init__(self, path: str = ":memory:", job_store: Optional[JobStore] = None, dedup_index=None):
+        self.job_store = job_store
+        self.dedup_index = dedup_index
+        # Used from one event loop at a time, though not always the thread that made it
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("""
+        CREATE TABLE IF NOT EXISTS code_embeddings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            repo_name TEXT,
+            file_path TEXT,
+            content TEXT,
+            is_base64 INTEGER,
+            embedding BLOB,
+            summary TEXT,
+            file_sha TEXT,
+            chunk_index INTEGER,
+            duplicate_repo TEXT,
+            duplicate_path TEXT,
+            duplicate_chunk_index INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """)
+        self.conn.commit()
+
+    def _materialize_references(self, canonical_filter: str, params: List):
+        self.conn.execute(f"""
+        UPDATE code_embeddings AS r
+        SET embedding = c.embedding, summary = c.summary,
+            duplicate_repo = NULL, duplicate_path = NULL, duplicate_chunk_index = NULL
+        FROM code_embeddings AS c
+        WHERE r.duplicate_path IS NOT NULL AND c.repo_name = r.duplicate_repo
+            AND c.file_path = r.duplicate_path AND c.chunk_index = r.duplicate_chunk_index
+            AND {canonical_filter}
+        """, params)
+
+    async def store_embedding(
+        self,
+        repo_name: str,
+        file_path: str,
+        content: str,
+        embedding: List[float],
+        summary: str = None,
+        file_sha: Optional[str] = None,
+        chunk_index: Optional[int] = None
+    ):
+        self.conn.execute(
+            "INSERT INTO code_embeddings (repo_name, file_path, content, is_base64, embedding, summary, "
+            "file_sha, chunk_index) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (repo_name, file_path, content, False, encode_embedding(embedding), summary,
+             file_sha, chunk_index)
+        )
+        self.conn.commit()
+
+    async def store_embeddings(self, rows: List[Dict]):
+        self.conn.executemany(
+            "INSERT INTO code_embeddings (repo_name, file_path, content, is_base64, embedding, summary, "
+            "file_sha, chunk_index, duplicate_repo, duplicate_path, duplicate_chunk_index) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [
+                (row["repo_name"], row["file_path"], row["content"], False,
+                 None if row["embedding"] is None else encode_embedding(row["embedding"]), row.get("summary"),
+                 row.get("file_sha"), row.get("chunk_index"), *(row.get("duplicate_of") or (None, None, None)))
+                for row in rows
+            ]
+        )
+        self.conn.commit()
+
+    async def get_file_shas(self, repo_name: str) -> Dict[str, Optional[str]]:
+        rows = self.conn.execute(
+            "SELECT file_path, MAX(file_sha) FROM code_embeddings WHERE repo_name = ? GROUP BY file_path",
+            (repo_name,)
+        )
+        return {path: sha for path, sha in rows}
+
+    async def delete_file_data(self, repo_name: str, file_paths: List[str], batch_size: int = 500):
+        for start in range(0, len(file_paths), batch_size):
+            batch = list(file_paths[start:start + batch_size])
+            self._materialize_references(
+                f"c.repo_name = ? AND c.file_path IN ({', '.join('?' * len(batch))})", [repo_name, *batch]
+            )
+            self.conn.execute(
+                f"DELETE FROM code_embeddings WHERE repo_name = ? AND file_path IN ({', '.join('?' * len(batch))})",
+                [repo_name, *batch]
+            )
+        self.conn.commit()
+        if self.dedup_index is not None:
+            self.dedup_index.remove_files(repo_name, file_paths)
+
+    async def delete_repository_data(self, repo_name: str):
+        self._materialize_references("c.repo_name = ? AND r.repo_name != ?", [repo_name, repo_name])
+        self.conn.execute("DELETE FROM code_embeddings WHERE repo_name = ?", (repo_name,))
+        self.conn.commit()
+        if self.dedup_index is not None:
+            self.dedup_index.remove_repository(repo_name)
+
+    async def has_chunk(self, repo_name: str, file_path: str, chunk_index: int) -> bool:
+        return self.conn.execute(
+            "SELECT 1 FROM code_embeddings WHERE repo_name = ? AND file_path = ? AND chunk_index = ? "
+            "AND duplicate_path IS NULL LIMIT 1", (repo_name, file_path, chunk_index)
+        ).fetchone() is not None
+
+    async def warm_up(self, repo_names: List[str] = ()):
+        pass
+
+    async def search_similar(
+        self,
+        query_embedding: List[float],
+        repo_name: str,
+        limit: int = 5,
+        use_index: Optional[bool] = None,
+        query_text: Optional[str] = None,
+        mode: Optional[str] = None
+    ) -> List[Dict]:
+        # Always a full scan by embedding; the index and hybrid options are accepted for compatibility
+        # Reference rows of near-duplicates borrow the embedding and summary of their chunk
+        rows = self.conn.execute("""
+        SELECT r.file_path, r.content, COALESCE(r.summary, c.summary), COALESCE(r.embedding, c.embedding)
+        FROM code_embeddings r
+        LEFT JOIN code_embeddings c
+            ON r.duplicate_path IS NOT NULL AND c.repo_name = r.duplicate_repo
+            AND c.file_path = r.duplicate_path AND c.chunk_index = r.duplicate_chunk_index
+        WHERE r.repo_name = ? AND COALESCE(r.embedding, c.embedding) IS NOT NULL
+        """, (repo_name,))
+        query = np.asarray(query_embedding, dtype=np.float32)
+        query_norm = np.linalg.norm(query) or 1.0
+        results = []
+        for file_path, content, summary, embedding in rows:
+            vector = decode_embedding(embedding)
+            norm = np.linalg.norm(vector) or 1.0
+            results.append({
+                'file_path': file_path,
+                'content': content,
+                'summary': summary,
+                'similarity': float(vector @ query / (norm * query_norm))
+            })
+        results.sort(key=lambda row: row['similarity'], reverse=True)
+        return results[:limit]
+
+    async def get_repository_statistics(self, repo_name: str) -> Dict:
+        row = self.conn.execute("""
+        SELECT COUNT(*), COUNT(DISTINCT file_path), MIN(created_at), MAX(created_at)
+        FROM code_embeddings WHERE repo_name = ?
+        """, (repo_name,)).fetchone()
+        return {
+            'total_chunks': row[0],
+            'total_files': row[1],
+            'first_indexed': row[2],
+            'last_indexed': row[3],
+            'job': self.job_store.progress(repo_name) if self.job_store else None
+        }
+
+    def close(self):
+        self.conn.close()
+
+
+class FakeGitHubRepo:
+    """
+    Serves a mutable in-memory repository through the GitHub tree and blob endpoints.
+    ``faults[path]`` holds (status, headers, body) responses served, in order, for that
+    file's blob before the real one; use it to inject rate limits and server errors.
+    """
+
+    def __init__(self, files, owner: str = "octo", name: str = "demo"):
+        self.files = dict(files)
+        self.prefix = f"/repos/{owner}/{name}"
+        self.blob_requests = []
+        self.faults: Dict[str, List[tuple]] = {}
+        self._by_sha: Dict[str, str] = {}
+
+    @classmethod
+    def synthetic(cls, files: int, functions_per_file: int = 40, seed: int = 0, **kwargs) -> "FakeGitHubRepo":
+        """A repository of ``files`` generated Python modules, spread over packages of 50."""
+        rng = random.Random(seed)
+        contents = {}
+        for idx in range(files):
+            body = "".join(
+                f"def handler_{idx}_{fn}(request, limit={rng.randint(1, 100)}):\n"
+                f"    \"\"\"Handle request {fn} of module {idx}.\"\"\"\n"
+                + "".join(f"    value_{line} = request.get('{line}', limit) * {rng.randint(1, 9)}\n"
+                          for line in range(rng.randint(2, 12)))
+                + "    return value_0\n\n\n"
+                for fn in range(functions_per_file)
+            )
+            contents[f"src/pkg_{idx // 50}/module_{idx}.py"] = f"import os\n\n\n{body}".encode()
+        return cls(contents, **kwargs)
+
+    @staticmethod
+    def sha(data: bytes) -> str:
+        return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        path = request.url.path
+        if path == self.prefix:
+            return httpx.Response(200, json={"default_branch": "main"})
+        if path == f"{self.prefix}/git/trees/main":
+            shas = {name: self.sha(data) for name, data in self.files.items()}
+            self._by_sha = {sha: name for name, sha in shas.items()}
+            tree_sha = hashlib.sha1("".join(f"{name}\0{sha}\n" for name, sha in sorted(shas.items())).encode()).hexdigest()
+            return httpx.Response(200, json={"sha": tree_sha, "tree": [
+                {"path": name, "type": "blob", "sha": sha, "size": len(self.files[name]),
+                 "url": f"https://api.github.com{self.prefix}/git/blobs/{sha}"}
+                for name, sha in shas.items()
+            ]})
+        sha = path.rsplit("/", 1)[-1]
+        self.blob_requests.append(sha)
+        name = self._by_sha[sha]
+        data = self.files[name]
+        if self.faults.get(name):
+            status, headers, body = self.faults[name].pop(0)
+            return httpx.Response(status, headers=headers, content=body)
+        return httpx.Response(200, json={"content": base64.b64encode(data).decode(), "encoding": "base64"})
+
+
+def offline_processor(task, scheduler, store_dir: str, files: int = 20, functions: int = 10, latency: float = 0.0):
+    """
+    Processor factory for parallel_ingestion.ingest_repositories that needs no network:
+    a synthetic repository per task (seeded by its name), FakeMistralService and a
+    SQLite store file per task in ``store_dir``. Bind the options with functools.partial.
+    """
+    repo = FakeGitHubRepo.synthetic(files, functions, seed=zlib.crc32(task.repo.encode()), owner=task.owner, name=task.repo)
+    store_name = task.name.replace("/", "_").replace("[", "_").replace("]", "")
+    return RepositoryProcessor(
+        github_service=GitHubService(transport=httpx.MockTransport(repo.handler), scheduler=scheduler, cache=HTTPCache()),
+        mistral_service=FakeMistralService(latency=latency),
+        snowflake_service=SQLiteSearchService(os.path.join(store_dir, f"{store_name}.sqlite3")),
+        model_cache=ModelCache(),
+        job_store=JobStore(),
+        shard=task.shard
+    )
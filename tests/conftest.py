@@ -0,0 +1,21 @@
+import os
+import sys
+import tempfile
+
+# Ensure project root is in sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Offline tests use local stand-ins, so placeholder credentials are enough
+for name in ("GITHUB_TOKEN", "SNOWFLAKE_ACCOUNT", "SNOWFLAKE_USER", "SNOWFLAKE_PASSWORD", "MISTRAL_API_KEY"):
+    os.environ.setdefault(name, "test")
+
+# Keep local caches and indexes out of the working tree
+os.environ.setdefault("DATA_DIR", tempfile.mkdtemp(prefix="code_expert_test_"))
+# Flush buffered writes quickly; the tests ingest tiny repositories
+os.environ.setdefault("SNOWFLAKE_WRITE_MAX_WAIT", "0.01")
+# Each GitHubService gets its own in-memory response cache, so tests can count requests
+os.environ.setdefault("GITHUB_CACHE_PERSISTENT", "false")
+# Each processor gets its own in-memory job store, so a failed run does not resume in another test
+os.environ.setdefault("INGESTION_JOBS_PERSISTENT", "false")
+# ...and its own in-memory dedup index, so chunks stored by one test are not duplicates in another
+os.environ.setdefault("DEDUP_PERSISTENT", "false")
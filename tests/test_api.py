@@ -0,0 +1,136 @@
+import asyncio
+import json
+import time
+import httpx
+from app.api.services import APIServices
+from app.main import create_app
+from app.services.github import GitHubService
+from app.services.job_store import JobStore
+from app.services.model_cache import ModelCache
+from app.services.repository_ingestion import RepositoryProcessor
+from benchmarks.fakes import FakeGitHubRepo, FakeMistralService, SQLiteSearchService
+
+
+def parse_events(body: str):
+    events = []
+    for block in body.strip().split("\n\n"):
+        event, data = block.split("\n")
+        events.append((event.removeprefix("event: "), json.loads(data.removeprefix("data: "))))
+    return events
+
+
+async def with_client(services: APIServices, test):
+    app = create_app(services)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://api") as client:
+            await test(client)
+
+
+def test_answers_share_one_embedding_batch_and_stream():
+    mistral = FakeMistralService(dim=32)
+    store = SQLiteSearchService()
+    services = APIServices(search_service=store, mistral_service=mistral, model_cache=ModelCache(), job_store=JobStore())
+
+    async def test(client):
+        questions = [{"repository": "demo", "query": f"How does login work? ({i})"} for i in range(10)]
+        await store.store_embeddings([
+            {"repo_name": "demo", "file_path": path, "content": text, "embedding": mistral.embed_text(query), "summary": None}
+            for path, text, query in [("auth.py", "def login(user): ...", questions[0]["query"]),
+                                      ("db.py", "def connect(): ...", "database")]
+        ])
+        responses = await asyncio.gather(*(client.post("/ask", json=question) for question in questions))
+        assert all(response.status_code == 200 for response in responses)
+        answer = responses[0].json()
+        assert answer["references"][0] == "auth.py" and answer["confidence"] > 0.99
+        # Ten question embeddings in one model call, plus one call per answer
+        assert mistral.calls == 1 + len(questions)
+
+        response = await client.post("/ask/stream", json={"repository": "demo", "query": "Where is the database?"})
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = parse_events(response.text)
+        assert events[0][0] == "context" and set(events[0][1]["references"]) == {"auth.py", "db.py"}
+        pieces = [data["text"] for event, data in events if event == "answer"]
+        assert len(pieces) > 1 and "".join(pieces) == answer["answer"]
+        assert events[-1] == ("done", {})
+
+        missing = (await client.post("/ask", json={"repository": "other", "query": "anything"})).json()
+        assert missing["references"] == [] and missing["confidence"] == 0.0
+
+    asyncio.run(with_client(services, test))
+
+
+def test_ingestion_progress_is_streamed():
+    repo = FakeGitHubRepo.synthetic(4, functions_per_file=3, name="demo")
+    store = SQLiteSearchService()
+    job_store = JobStore()
+
+    def processor_factory(owner, name):
+        return RepositoryProcessor(
+            github_service=GitHubService(transport=httpx.MockTransport(repo.handler)),
+            mistral_service=FakeMistralService(dim=32, latency=0.01),
+            snowflake_service=store,
+            model_cache=ModelCache(),
+            job_store=job_store
+        )
+
+    services = APIServices(
+        search_service=store, mistral_service=FakeMistralService(dim=32), model_cache=ModelCache(),
+        job_store=job_store, processor_factory=processor_factory
+    )
+
+    async def test(client):
+        started = await client.post("/repositories/octo/demo/ingest?incremental=false")
+        assert started.status_code == 202
+        assert started.json()["progress"] == "/repositories/octo/demo/progress"
+        assert (await client.post("/repositories/octo/demo/ingest")).status_code == 409
+        events = parse_events((await client.get(started.json()["progress"])).text)
+        assert events[0][0] == "job"
+        assert [event for event, _ in events[1:-1]] == ["progress"] * (len(events) - 2) and len(events) > 2
+        event, outcome = events[-1]
+        assert event == "done" and outcome["success"] and outcome["job"]["status"] == "completed"
+
+        stats = (await client.get("/repositories/demo/stats")).json()
+        assert stats["total_files"] == 4 and stats["total_chunks"] == outcome["chunks_stored"]
+        assert (await client.post("/repositories/octo/demo/ingest?fetch_mode=ftp")).status_code == 422
+
+    asyncio.run(with_client(services, test))
+
+
+def test_ingestion_does_not_hold_up_questions():
+    repo = FakeGitHubRepo.synthetic(5, functions_per_file=3, name="demo")
+    store = SQLiteSearchService()
+
+    class SlowChunkingProcessor(RepositoryProcessor):
+        def _chunks(self, text, file_path):
+            # CPU-bound work on the ingestion's event loop
+            time.sleep(0.2)
+            return super()._chunks(text, file_path)
+
+    def processor_factory(owner, name):
+        return SlowChunkingProcessor(
+            github_service=GitHubService(transport=httpx.MockTransport(repo.handler)),
+            mistral_service=FakeMistralService(dim=32),
+            snowflake_service=store,
+            model_cache=ModelCache(),
+            job_store=JobStore()
+        )
+
+    services = APIServices(
+        search_service=store, mistral_service=FakeMistralService(dim=32), model_cache=ModelCache(),
+        job_store=JobStore(), processor_factory=processor_factory
+    )
+
+    async def test(client):
+        assert (await client.post("/repositories/octo/demo/ingest")).status_code == 202
+        # Same name, another owner: a separate run
+        assert (await client.post("/repositories/fork/demo/ingest")).status_code == 202
+        latencies = []
+        while not all(run.done for run in services.runs.values()):
+            started = time.perf_counter()
+            response = await client.post("/ask", json={"repository": "demo", "query": f"q{len(latencies)}"})
+            assert response.status_code == 200
+            latencies.append(time.perf_counter() - started)
+            await asyncio.sleep(0.01)
+        assert len(latencies) > 5 and max(latencies) < 0.15
+
+    asyncio.run(with_client(services, test))
@@ -0,0 +1,118 @@
+import asyncio
+import io
+import tarfile
+import httpx
+from app.services.archive import iter_tar_files
+from app.services.github import GitHubService
+from app.services.job_store import JobStore
+from app.services.repository_ingestion import RepositoryProcessor
+from app.services.mistral import MistralService
+from benchmarks.fakes import SQLiteSearchService
+
+LONG_PATH = "src/" + "nested/" * 20 + "module.py"
+
+
+def build_tarball(files: dict, prefix: str = "octo-demo-abc123") -> bytes:
+    """Build a gzipped tarball laid out like GitHub's, with a top-level prefix directory."""
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz", format=tarfile.PAX_FORMAT) as archive:
+        archive.pax_headers = {"comment": "abc123"}
+        directory = tarfile.TarInfo(prefix)
+        directory.type = tarfile.DIRTYPE
+        archive.addfile(directory)
+        for path, data in files.items():
+            info = tarfile.TarInfo(f"{prefix}/{path}")
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+    return buffer.getvalue()
+
+
+FILES = {
+    "README.md": b"# Demo\n",
+    "app.py": b"print('hello')\n" * 200,
+    "logo.png": b"\x89PNG" + bytes(range(256)) * 50,
+    LONG_PATH: b"def f():\n    return 1\n",
+}
+
+
+async def in_pieces(data: bytes, size: int = 97):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+def test_iter_tar_files_streams_selected_members():
+    async def collect():
+        return [
+            item async for item in iter_tar_files(
+                in_pieces(build_tarball(FILES)),
+                include=lambda path, size: not path.endswith(".png"),
+                strip_components=1
+            )
+        ]
+
+    extracted = dict(asyncio.run(collect()))
+    assert extracted == {path: data for path, data in FILES.items() if not path.endswith(".png")}
+
+
+def test_archive_mode_ingests_from_one_download():
+    requests = []
+    tarball = build_tarball(FILES)
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request.url.path)
+        if request.url.path == "/repos/octo/demo":
+            return httpx.Response(200, json={"default_branch": "main"})
+        if request.url.path == "/repos/octo/demo/git/trees/main":
+            return httpx.Response(200, json={"tree": [
+                {"path": path, "type": "blob", "sha": f"sha-{path}"} for path in FILES
+            ]})
+        if request.url.path == "/repos/octo/demo/tarball":
+            return httpx.Response(302, headers={"Location": "https://codeload.github.test/octo/demo/tar.gz/main"})
+        return httpx.Response(200, content=tarball)
+
+    store = SQLiteSearchService()
+    processor = RepositoryProcessor(
+        fetch_mode="archive",
+        github_service=GitHubService(transport=httpx.MockTransport(handler)),
+        mistral_service=MistralService(),
+        snowflake_service=store
+    )
+    assert asyncio.run(processor.ingest_repository("octo", "demo"))
+    assert requests == [
+        "/repos/octo/demo", "/repos/octo/demo/git/trees/main", "/repos/octo/demo/tarball", "/octo/demo/tar.gz/main"
+    ]
+    assert asyncio.run(store.get_file_shas("demo")) == {
+        path: f"sha-{path}" for path in ("README.md", "app.py", LONG_PATH)
+    }
+
+    # Nothing changed, so the archive is not downloaded again
+    requests.clear()
+    assert asyncio.run(processor.ingest_repository("octo", "demo"))
+    assert requests == ["/repos/octo/demo", "/repos/octo/demo/git/trees/main"]
+
+
+def test_tree_files_missing_from_the_archive_are_skipped():
+    tarball = build_tarball({"app.py": FILES["app.py"]})
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/repos/octo/demo":
+            return httpx.Response(200, json={"default_branch": "main"})
+        if request.url.path == "/repos/octo/demo/git/trees/main":
+            return httpx.Response(200, json={"tree": [
+                {"path": path, "type": "blob", "sha": f"sha-{path}"} for path in ("app.py", "README.md")
+            ]})
+        return httpx.Response(200, content=tarball)
+
+    jobs = JobStore()
+    processor = RepositoryProcessor(
+        fetch_mode="archive",
+        github_service=GitHubService(transport=httpx.MockTransport(handler)),
+        mistral_service=MistralService(),
+        snowflake_service=SQLiteSearchService(),
+        job_store=jobs
+    )
+    assert asyncio.run(processor.ingest_repository("octo", "demo"))
+    assert processor.skipped_files == {"README.md": "missing: not in the repository archive"}
+    job = jobs.progress("demo", "octo")
+    assert job["status"] == "completed" and job["done_files"] == 1 and job["skipped_files"] == 1
+    assert job["pending_files"] == 0
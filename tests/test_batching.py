@@ -0,0 +1,91 @@
+import asyncio
+from app.services.batching import MistralBatcher
+from app.services.mistral import MistralService
+
+
+class CountingMistralService(MistralService):
+    def __init__(self):
+        super().__init__()
+        self.embedding_batches = []
+        self.summary_batches = []
+
+    def generate_embeddings(self, texts):
+        self.embedding_batches.append(list(texts))
+        return [[float(len(text))] for text in texts]
+
+    def generate_responses(self, prompt, conversations):
+        self.summary_batches.append(len(conversations))
+        return [f"summary of {messages[0]['content']}" for messages in conversations]
+
+
+def test_batches_flush_on_item_count():
+    service = CountingMistralService()
+
+    async def run():
+        batcher = MistralBatcher(service, max_items=4, max_tokens=10_000, max_wait=10)
+        texts = [f"chunk {i}" for i in range(8)]
+        embeddings = await asyncio.gather(*(batcher.embed(text) for text in texts))
+        summaries = await asyncio.gather(*(batcher.summarize(text) for text in texts))
+        return texts, embeddings, summaries
+
+    texts, embeddings, summaries = asyncio.run(run())
+    assert embeddings == [[float(len(text))] for text in texts]
+    assert summaries == [f"summary of {text}" for text in texts]
+    assert [len(batch) for batch in service.embedding_batches] == [4, 4]
+    assert service.summary_batches == [4, 4]
+
+
+def test_batches_flush_on_token_budget_and_timeout():
+    service = CountingMistralService()
+
+    async def run():
+        batcher = MistralBatcher(service, max_items=100, max_tokens=10, max_wait=0.01)
+        # 16 characters is about 4 tokens, so only two fit under the budget
+        await asyncio.gather(*(batcher.embed("x" * 16) for _ in range(5)))
+
+    asyncio.run(run())
+    assert [len(batch) for batch in service.embedding_batches] == [2, 2, 1]
+
+
+def test_batch_errors_reach_every_caller():
+    class FailingService(CountingMistralService):
+        def generate_embeddings(self, texts):
+            raise RuntimeError("model unavailable")
+
+    async def run():
+        batcher = MistralBatcher(FailingService(), max_items=3, max_wait=0.01)
+        return await asyncio.gather(*(batcher.embed("x") for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+def test_embedding_writer_commits_in_batches():
+    from app.services.batching import EmbeddingWriter
+    from benchmarks.fakes import SQLiteSearchService
+
+    class CountingStore(SQLiteSearchService):
+        batch_sizes = []
+
+        async def store_embeddings(self, rows):
+            self.batch_sizes.append(len(rows))
+            await super().store_embeddings(rows)
+
+    store = CountingStore()
+
+    async def run():
+        writer = EmbeddingWriter(store, max_rows=3, max_wait=0.01)
+        rows = [
+            {"repo_name": "demo", "file_path": f"f{idx}.py", "content": f"x = {idx}",
+             "embedding": [0.1, 0.2], "summary": "s", "chunk_index": 0}
+            for idx in range(7)
+        ]
+        await asyncio.gather(*(writer.write(row) for row in rows))
+        await writer.drain()
+        return writer
+
+    writer = asyncio.run(run())
+    assert store.batch_sizes == [3, 3, 1]
+    assert writer.rows_written == 7
+    stats = asyncio.run(store.get_repository_statistics("demo"))
+    assert stats["total_chunks"] == 7 and stats["total_files"] == 7
@@ -0,0 +1,26 @@
+import asyncio
+import os
+import tempfile
+from benchmarks.bench_e2e import find_regressions, run
+
+
+def test_harness_reports_and_flags_regressions():
+    with tempfile.TemporaryDirectory() as tmp:
+        report = asyncio.run(run(
+            files=4, functions=6, latency=0.0, jitter=0.0, fetch_workers=2, queries=3,
+            store_path=os.path.join(tmp, "store.sqlite3")
+        ))
+    assert report["config"]["chunks"] >= 4
+    assert report["ingest"]["files_per_second"] > 0 and report["ingest"]["peak_rss_mb"] > 0
+    assert report["search"]["p99_seconds"] >= report["search"]["p50_seconds"] > 0
+    assert find_regressions(report, report, 0.2) == []
+
+    slower = {
+        "ingest": {**report["ingest"], "files_per_second": report["ingest"]["files_per_second"] / 2},
+        "search": {**report["search"], "p50_seconds": report["search"]["p50_seconds"] + 1.0}
+    }
+    assert [line.split(":")[0] for line in find_regressions(slower, report, 0.2)] == [
+        "ingest.files_per_second", "search.p50_seconds"
+    ]
+    # Sub-millisecond jitter in a fast stage is not a regression
+    assert find_regressions({"ingest": {"chunk_p50_seconds": 0.001}}, {"ingest": {"chunk_p50_seconds": 0.0005}}, 0.2) == []
@@ -0,0 +1,53 @@
+import random
+from app.services.chunking import iter_chunks, iter_code_chunks
+
+
+def reference_chunk_text(text, chunk_size=3000, overlap=200):
+    """The original list-building splitter, kept to pin iter_chunks' behaviour."""
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = min(start + chunk_size, len(text))
+        while end > start and not text[end - 1].isspace() and end < len(text):
+            end -= 1
+        chunks.append(text[start:end].strip())
+        start += chunk_size - overlap
+    return [chunk for chunk in chunks if chunk]
+
+
+def test_plain_chunks_match_the_original_splitter():
+    rng = random.Random(0)
+    words = ["def", "value", "=", "\n", "    ", "return", "call(arg)", "# note", "\t"]
+    for _ in range(30):
+        text = " ".join(rng.choice(words) for _ in range(rng.randint(0, 4000)))
+        assert list(iter_chunks(text, 500, 50)) == reference_chunk_text(text, 500, 50)
+
+    # Text without whitespace used to vanish; now it is cut at the chunk size
+    assert [len(chunk) for chunk in iter_chunks("x" * 1200, 500, 100)] == [500, 500, 400]
+
+
+def test_python_and_typescript_split_on_definitions():
+    body = "    total = total + 1\n" * 20
+    python = "import os\n\n" + "".join(
+        f"@cached\ndef handler_{i}(total):\n{body}    return total\n\n\n" for i in range(6)
+    ) + "class Service:\n    def run(self):\n        return 1\n"
+    chunks = list(iter_code_chunks(python, "app/handlers.py", chunk_size=1200, overlap=100))
+    assert chunks[0].startswith("import os")
+    assert all(chunk.startswith(("import os", "@cached\ndef handler_", "class Service")) for chunk in chunks)
+    assert sum(chunk.count("def handler_") for chunk in chunks) == 6
+    assert "class Service:" in chunks[-1]
+
+    typescript = "".join(
+        f"/** Handler {i} */\nexport const handler{i} = async (req: Request): Promise<number> => {{\n"
+        + "  req.count++;\n" * 30 + "};\n\n"
+        for i in range(4)
+    )
+    chunks = list(iter_code_chunks(typescript, "src/handlers.ts", chunk_size=600, overlap=50))
+    assert [chunk.split("\n")[1][:24] for chunk in chunks] == [
+        f"export const handler{i} = " for i in range(4)
+    ]
+
+    # Oversized definitions fall back to the plain splitter; other files are never parsed
+    huge = "def huge():\n" + "    x = 1\n" * 500
+    assert list(iter_code_chunks(huge, "big.py", 1000, 100)) == list(iter_chunks(huge, 1000, 100))
+    assert list(iter_code_chunks(python, "notes.md", 1200, 100)) == list(iter_chunks(python, 1200, 100))
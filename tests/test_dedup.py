@@ -0,0 +1,169 @@
+import asyncio
+import random
+import httpx
+from app.services.dedup import DedupIndex, lsh_parameters
+from app.services.file_selection import FileSelectionPolicy
+from app.services.github import GitHubService
+from app.services.model_cache import ModelCache
+from app.services.repository_ingestion import RepositoryProcessor
+from benchmarks.fakes import FakeGitHubRepo, FakeMistralService, SQLiteSearchService
+
+
+def module_source(seed: int, functions: int = 60) -> str:
+    rng = random.Random(seed)
+    return "".join(
+        f"def helper_{seed}_{i}(value, limit={rng.randint(1, 100)}):\n"
+        f"    return clamp(value * {rng.randint(2, 9)}, limit) + offset_{i}\n\n"
+        for i in range(functions)
+    )
+
+
+def test_signatures_find_near_duplicates_only():
+    assert lsh_parameters(128, 0.9) == (9, 13)
+    index = DedupIndex(threshold=0.9)
+    original = module_source(1)
+    index.add("one", "util.py", 0, index.signature(original), payload_bytes=4096)
+    index.flush()
+
+    edited = original.replace("helper_1_7(", "helper_1_7_renamed(")
+    match = index.find(index.signature(edited))
+    assert match["file_path"] == "util.py" and match["similarity"] >= 0.9 and match["payload_bytes"] == 4096
+    assert index.find(index.signature(module_source(2))) is None
+    assert index.find(index.signature("")) is None
+
+    index.remove_files("one", ["util.py"])
+    assert index.find(index.signature(edited)) is None
+    assert len(index) == 0
+    index.close()
+
+
+def test_entries_waiting_for_their_batch_are_found():
+    index = DedupIndex(threshold=0.9, write_batch=256)
+    original = module_source(1)
+    index.add("one", "util.py", 0, index.signature(original), payload_bytes=4096)
+    # Nothing written to SQLite yet, but a repeat later in the same run must still match
+    assert index._conn.execute("SELECT COUNT(*) FROM dedup_chunks").fetchone()[0] == 0
+    assert index.find(index.signature(original))["file_path"] == "util.py"
+    index.remove_files("one", ["util.py"])
+    assert index.find(index.signature(original)) is None
+    index.close()
+
+
+def test_vendored_copies_are_stored_as_references():
+    upstream = {"src/util.py": module_source(1).encode()}
+    fork = {
+        "vendor/util.py": module_source(1).replace("offset_3\n", "offset_three\n").encode(),
+        "src/app.py": module_source(2).encode(),
+    }
+    store = SQLiteSearchService()
+    dedup_index = DedupIndex()
+    mistral = FakeMistralService(dim=32)
+
+    def processor_for(files, name):
+        repo = FakeGitHubRepo(files, name=name)
+        return RepositoryProcessor(
+            github_service=GitHubService(transport=httpx.MockTransport(repo.handler)),
+            mistral_service=mistral,
+            snowflake_service=store,
+            model_cache=ModelCache(),
+            dedup_index=dedup_index,
+            # Kept despite the vendor/ path: the copies are what is under test
+            file_policy=FileSelectionPolicy(skip_vendored=False)
+        )
+
+    assert asyncio.run(processor_for(upstream, "upstream").ingest_repository("octo", "upstream"))
+    processor = processor_for(fork, "fork")
+    assert asyncio.run(processor.ingest_repository("octo", "fork"))
+
+    references = store.conn.execute(
+        "SELECT file_path, duplicate_repo, embedding, summary FROM code_embeddings WHERE duplicate_path IS NOT NULL"
+    ).fetchall()
+    copied = store.conn.execute("SELECT COUNT(*) FROM code_embeddings WHERE file_path = 'vendor/util.py'").fetchone()[0]
+    assert copied and len(references) == copied
+    assert all(row[:2] == ("vendor/util.py", "upstream") and row[2] is None and row[3] is None for row in references)
+    report = processor.dedup_report()
+    assert report["duplicate_chunks"] == copied and report["model_calls_saved"] == 2 * copied
+    assert report["bytes_saved"] >= copied * 4 * 32
+
+    # References borrow their chunk's embedding, and keep a copy of it once that chunk is gone
+    query = mistral.embed_text(module_source(1))
+    for _ in range(2):
+        results = asyncio.run(store.search_similar(query, "fork", limit=10))
+        assert {row["file_path"] for row in results} == {"vendor/util.py", "src/app.py"}
+        asyncio.run(store.delete_repository_data("upstream"))
+    assert store.conn.execute(
+        "SELECT COUNT(*) FROM code_embeddings WHERE duplicate_path IS NULL AND embedding IS NOT NULL"
+    ).fetchone()[0] == store.conn.execute("SELECT COUNT(*) FROM code_embeddings").fetchone()[0]
+
+
+def test_references_only_point_at_committed_files():
+    class FailingMistralService(FakeMistralService):
+        def generate_embeddings(self, texts):
+            if any("explode" in text for text in texts):
+                raise RuntimeError("model error")
+            return super().generate_embeddings(texts)
+
+    shared = module_source(3, functions=20)
+    files = {
+        "a.py": (shared + module_source(4, functions=20).replace("offset_0\n", "explode\n")).encode(),
+        "b.py": shared.encode(),
+        "c.py": shared.encode(),
+    }
+    dedup_index = DedupIndex()
+    store = SQLiteSearchService(dedup_index=dedup_index)
+    repo = FakeGitHubRepo(files)
+    processor = RepositoryProcessor(
+        github_service=GitHubService(transport=httpx.MockTransport(repo.handler)),
+        mistral_service=FailingMistralService(dim=32),
+        snowflake_service=store,
+        model_cache=ModelCache(),
+        batch_options={"max_items": 1}
+    )
+    assert processor.dedup_index is dedup_index
+    asyncio.run(processor.ingest_repository("octo", "demo"))
+
+    assert "a.py" in processor.skipped_files
+    dangling = store.conn.execute("""
+    SELECT COUNT(*) FROM code_embeddings r
+    WHERE r.duplicate_path IS NOT NULL AND NOT EXISTS (
+        SELECT 1 FROM code_embeddings c
+        WHERE c.repo_name = r.duplicate_repo AND c.file_path = r.duplicate_path
+            AND c.chunk_index = r.duplicate_chunk_index
+    )
+    """).fetchone()[0]
+    assert dangling == 0
+    dedup_index.flush()
+    assert dedup_index._conn.execute("SELECT COUNT(*) FROM dedup_chunks WHERE file_path = 'a.py'").fetchone()[0] == 0
+
+
+def test_deleted_canonicals_are_forgotten():
+    source = module_source(5)
+    dedup_index = DedupIndex()
+    store = SQLiteSearchService(dedup_index=dedup_index)
+
+    def ingest(files, name):
+        repo = FakeGitHubRepo(files, name=name)
+        processor = RepositoryProcessor(
+            github_service=GitHubService(transport=httpx.MockTransport(repo.handler)),
+            mistral_service=FakeMistralService(dim=32),
+            snowflake_service=store,
+            model_cache=ModelCache(),
+            dedup_index=dedup_index
+        )
+        assert asyncio.run(processor.ingest_repository("octo", name))
+        return processor
+
+    ingest({"util.py": source.encode()}, "one")
+    assert len(dedup_index)
+    # Deletes through the store drop the index entries
+    asyncio.run(store.delete_repository_data("one"))
+    assert len(dedup_index) == 0
+
+    ingest({"util.py": source.encode()}, "one")
+    # Rows deleted behind the index's back are found stale on lookup and skipped
+    store.conn.execute("DELETE FROM code_embeddings WHERE repo_name = 'one'")
+    processor = ingest({"copy.py": source.encode()}, "two")
+    assert processor.dedup_report()["duplicate_chunks"] == 0
+    assert store.conn.execute("SELECT COUNT(*) FROM code_embeddings WHERE duplicate_path IS NOT NULL").fetchone()[0] == 0
+    dedup_index.flush()
+    assert dedup_index._conn.execute("SELECT COUNT(*) FROM dedup_chunks WHERE repo_name = 'one'").fetchone()[0] == 0
@@ -0,0 +1,189 @@
+import asyncio
+import json
+import numpy as np
+import pytest
+from app.core.config import get_settings
+from app.services.embedding_codec import decode_embedding, encode_embedding, read_embedding
+from app.services.snowflake import SnowflakeSearchService
+
+
+def test_encodings_round_trip_within_their_precision():
+    vector = np.random.default_rng(0).normal(size=1024).astype(np.float32)
+    legacy = len(json.dumps({"vector": vector.tolist()}))
+
+    exact = encode_embedding(vector, "float32")
+    assert np.array_equal(decode_embedding(exact), vector)
+    assert np.allclose(decode_embedding(encode_embedding(vector, "float16")), vector, atol=1e-2)
+
+    quantized = encode_embedding(vector, "int8")
+    restored = decode_embedding(quantized)
+    cosine = restored @ vector / (np.linalg.norm(restored) * np.linalg.norm(vector))
+    assert cosine > 0.999
+    assert len(quantized) == 1 + 4 + 1024 and len(exact) < legacy / 4
+
+    assert np.array_equal(read_embedding(None, json.dumps(json.dumps({"vector": [1.0, 2.0]}))), [1.0, 2.0])
+    assert read_embedding(None, None) is None
+    assert np.array_equal(read_embedding(None, None, [0.5, 1.5]), [0.5, 1.5])
+    with pytest.raises(ValueError):
+        encode_embedding(vector, "int4")
+
+
+class ScriptedConnection:
+    """
+    Answers statements from a script of (expected SQL fragment, rows), in order; any
+    statement off the script fails the test. The schema DDL of the first connect is let through.
+    """
+
+    def __init__(self, *script):
+        self.script = list(script)
+        self.executed = []
+        self.commits = 0
+
+    def expect(self, *script):
+        self.script.extend(script)
+
+    def cursor(self):
+        return ScriptedCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class ScriptedCursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self.result = None
+
+    def execute(self, query, params=None):
+        query = " ".join(query.split())
+        if query.startswith(("CREATE", "USE")) or (query.startswith("ALTER") and "embedding_vector" not in query):
+            return
+        assert self.connection.script, f"Unexpected statement: {query}"
+        fragment, rows = self.connection.script.pop(0)
+        assert fragment in query, f"Expected {fragment!r} in: {query}"
+        self.connection.executed.append((query, params))
+        self.result = rows
+
+    def fetchall(self):
+        assert self.result is not None, "Fetch without a scripted result"
+        rows, self.result = self.result, None
+        return rows
+
+    def close(self):
+        pass
+
+
+def test_migration_repacks_legacy_rows_and_search_reads_both_forms():
+    legacy_a = json.dumps({"vector": [1.0, 0.0]})
+    legacy_c = json.dumps({"vector": [0.6, 0.8]})
+    connection = ScriptedConnection(
+        ("DESCRIBE TABLE code_embeddings", []),
+        ("SELECT id, embedding_packed, embedding FROM (", [
+            (1, None, legacy_a), (2, encode_embedding([0.0, 1.0]), None), (3, None, legacy_c)
+        ]),
+        ("SELECT id, file_path, content, summary FROM (", [(1, "a.py", "", ""), (3, "c.py", "", "")]),
+    )
+    service = SnowflakeSearchService(connect=lambda: connection)
+
+    results = asyncio.run(service.search_similar([1.0, 0.1], "demo", limit=2, use_index=False))
+    assert [row["file_path"] for row in results] == ["a.py", "c.py"]
+    # Without a VECTOR column nothing is ranked in the warehouse or refers to one
+    assert all("embedding_vector" not in query for query, _ in connection.executed)
+
+    connection.expect(
+        ("SELECT id, embedding_packed, embedding FROM code_embeddings WHERE embedding_packed IS NULL AND "
+         "embedding IS NOT NULL ORDER BY id LIMIT %s", [(1, None, legacy_a)]),
+        ("BEGIN", []),
+        ("UPDATE code_embeddings SET embedding_packed = migrated.column2, embedding = NULL FROM", []),
+        ("SELECT id, embedding_packed, embedding FROM code_embeddings", [(3, None, legacy_c)]),
+        ("BEGIN", []),
+        ("UPDATE code_embeddings SET embedding_packed = migrated.column2", []),
+        ("SELECT id, embedding_packed, embedding FROM code_embeddings", []),
+    )
+    assert asyncio.run(service.migrate_embeddings(encoding="int8", batch_size=1)) == 2
+    assert connection.commits == 2 and not connection.script
+    updates = [params for query, params in connection.executed if query.startswith("UPDATE")]
+    assert [params[0] for params in updates] == [1, 3]
+    assert np.allclose(decode_embedding(updates[1][1]), [0.6, 0.8], atol=1e-2)
+    service.close()
+
+
+def test_vector_rows_are_ranked_in_the_warehouse():
+    connection = ScriptedConnection(
+        ("DESCRIBE TABLE code_embeddings", [("ID", "NUMBER(38,0)"), ("EMBEDDING_VECTOR", "VECTOR(FLOAT, 3)")]),
+        ("VECTOR_COSINE_SIMILARITY(embedding_vector, PARSE_JSON(%s)::ARRAY::VECTOR(FLOAT, 3)) AS similarity",
+         [("b.py", "y = 2", "s", 0.9)]),
+        ("SELECT id, embedding_packed, embedding FROM (", [(7, encode_embedding([1.0, 0.0, 0.0]), None)]),
+        ("SELECT id, file_path, content, summary FROM (", [(7, "a.py", "x = 1", "s")]),
+    )
+    service = SnowflakeSearchService(connect=lambda: connection)
+
+    results = asyncio.run(service.search_similar([0.0, 1.0, 0.0], "demo", limit=2, use_index=False))
+    assert [(row["file_path"], round(row["similarity"], 2)) for row in results] == [("b.py", 0.9), ("a.py", 0.0)]
+    ranked, params = connection.executed[1]
+    # Reference rows rank by the vector of the canonical row they point at
+    assert "COALESCE(r.embedding_vector, c.embedding_vector) AS embedding_vector" in ranked
+    assert (
+        "LEFT JOIN code_embeddings c ON r.duplicate_path IS NOT NULL AND c.repo_name = r.duplicate_repo "
+        "AND c.file_path = r.duplicate_path AND c.chunk_index = r.duplicate_chunk_index"
+    ) in ranked
+    assert json.loads(params[0]) == [0.0, 1.0, 0.0] and params[1:] == ("demo", 2)
+
+    # A query embedding of another dimension is refused before anything is sent
+    with pytest.raises(ValueError, match=r"query embedding has 2 dimensions"):
+        asyncio.run(service.search_similar([1.0, 0.0], "demo", use_index=False))
+
+    # Packed rows move into the column; one of another dimension stops the migration
+    connection.expect(
+        ("SELECT id, embedding_packed, embedding FROM code_embeddings "
+         "WHERE (embedding_packed IS NOT NULL OR embedding IS NOT NULL)", [(7, encode_embedding([1.0, 0.0, 0.0]), None)]),
+        ("BEGIN", []),
+        ("SET embedding_vector = PARSE_JSON(migrated.column2)::ARRAY::VECTOR(FLOAT, 3), "
+         "embedding_packed = NULL, embedding = NULL", []),
+        ("SELECT id, embedding_packed, embedding FROM code_embeddings", [(8, encode_embedding([1.0, 0.0]), None)]),
+    )
+    with pytest.raises(ValueError, match=r"VECTOR\(FLOAT, 3\)"):
+        asyncio.run(service.migrate_embeddings(encoding="vector", batch_size=1))
+    assert connection.commits == 1 and not connection.script
+    assert connection.executed[-2][1] == [7, "[1,0,0]"]
+    service.close()
+
+
+def test_vector_column_takes_the_dimension_of_the_first_embedding(monkeypatch):
+    monkeypatch.setattr(get_settings(), "snowflake_embedding_encoding", "vector")
+    connection = ScriptedConnection(
+        ("DESCRIBE TABLE code_embeddings", []),
+        ("ALTER TABLE code_embeddings ADD COLUMN IF NOT EXISTS embedding_vector VECTOR(FLOAT, 3)", []),
+        ("DESCRIBE TABLE code_embeddings", [("EMBEDDING_VECTOR", "VECTOR(FLOAT, 3)")]),
+        ("BEGIN", []),
+        ("INSERT INTO code_embeddings", []),
+    )
+    service = SnowflakeSearchService(connect=lambda: connection)
+    row = {"repo_name": "demo", "file_path": "a.py", "content": "x = 1", "embedding": [0.1, 0.2, 0.3], "chunk_index": 0}
+
+    asyncio.run(service.store_embeddings([row]))
+    insert, params = connection.executed[-1]
+    assert "duplicate_chunk_index, embedding_vector)" in insert
+    assert "PARSE_JSON(column13)::ARRAY::VECTOR(FLOAT, 3)" in insert
+    # One stored form: no packed copy beside the vector
+    assert params[4] is None and params[5] is None and json.loads(params[-1]) == [0.1, 0.2, 0.3]
+
+    # Embeddings of another dimension fail before anything is bound
+    with pytest.raises(ValueError, match=r"Embeddings have 2 dimensions"):
+        asyncio.run(service.store_embeddings([dict(row, embedding=[0.1, 0.2])]))
+    assert not connection.script
+    service.close()
+
+    # A configured dimension the existing column does not have is caught on connect
+    monkeypatch.setattr(get_settings(), "snowflake_vector_dimensions", 4)
+    connection = ScriptedConnection(("DESCRIBE TABLE code_embeddings", [("EMBEDDING_VECTOR", "VECTOR(FLOAT, 3)")]))
+    service = SnowflakeSearchService(connect=lambda: connection)
+    with pytest.raises(ValueError, match="snowflake_vector_dimensions is 4"):
+        asyncio.run(service.get_file_shas("demo"))
+    service.close()
@@ -0,0 +1,81 @@
+import asyncio
+import httpx
+from app.services.file_selection import FileSelectionPolicy, PathPatterns
+from app.services.github import GitHubService
+from app.services.mistral import MistralService
+from app.services.model_cache import ModelCache
+from app.services.repository_ingestion import RepositoryProcessor
+from benchmarks.fakes import FakeGitHubRepo, SQLiteSearchService
+
+
+def test_gitignore_style_patterns():
+    patterns = PathPatterns(["# comment", "", "*.snap", "/docs/", "tests/**/fixtures", "src/gen?.py"])
+    assert patterns.match("a/b/x.snap") == "*.snap"
+    assert patterns.match("docs/index.md") == "/docs/"
+    assert patterns.match("src/docs/index.md") is None
+    assert patterns.match("tests/fixtures/a.json") == "tests/**/fixtures"
+    assert patterns.match("tests/unit/io/fixtures/a.json") == "tests/**/fixtures"
+    assert patterns.match("src/gen1.py") == "src/gen?.py"
+    assert patterns.match("src/sub/gen1.py") is None
+    assert not PathPatterns(["# only a comment"])
+
+
+def test_policy_reasons():
+    policy = FileSelectionPolicy(max_bytes=1000, size_caps={".json": 100}, exclude=["examples/"])
+    assert policy.skip_reason("src/app.py", 500) is None
+    assert policy.skip_reason("src/app.ts") is None
+    assert policy.skip_reason("logo.png").startswith("extension:")
+    assert policy.skip_reason("examples/demo.py").startswith("excluded:")
+    assert policy.skip_reason("web/node_modules/left-pad/index.js").startswith("vendored:")
+    assert policy.skip_reason("package-lock.json", 10).startswith("generated:")
+    assert policy.skip_reason("static/app.min.js").startswith("generated:")
+    assert policy.skip_reason("dist/index.js").startswith("generated:")
+    assert policy.skip_reason("docs/dist/index.js") is None
+    assert policy.skip_reason("data/fixture.json", 101) == "too_large: 101 B over the 100 B cap for .json files"
+    assert policy.skip_reason("src/app.py", 2048) == "too_large: 2 KB over the 1000 B cap per file"
+
+    # Include patterns replace the extension list and take precedence over the heuristics
+    policy = FileSelectionPolicy(include=["src/**", "vendor/ours/"], exclude=["src/legacy/"])
+    assert policy.skip_reason("src/Makefile") is None
+    assert policy.skip_reason("vendor/ours/lib.py") is None
+    assert policy.skip_reason("vendor/theirs/lib.py").startswith("not_included:")
+    assert policy.skip_reason("src/legacy/old.py").startswith("excluded:")
+
+
+def test_content_sniffing():
+    policy = FileSelectionPolicy()
+    assert policy.content_skip_reason("a.py", b"def f():\n    return 1\n" * 200) is None
+    assert policy.content_skip_reason("a.json", b"{\"a\": \"\x00\x01\"}").startswith("binary:")
+    assert policy.content_skip_reason("a.js", b"var a=1;" * 500).startswith("minified:")
+    assert policy.content_skip_reason("a.md", b"") is None
+
+
+def test_ingestion_selects_files_before_fetching():
+    code = b"def f():\n    return 1\n"
+    repo = FakeGitHubRepo({
+        "src/app.py": code,
+        "node_modules/pkg/index.js": code,
+        "package-lock.json": b"{}\n",
+        "data/huge.json": b"[" + b"1,\n" * 200_000 + b"1]\n",
+        "assets/logo.png": b"\x89PNG",
+        "static/app.js": b"var a=1;" * 500,
+    })
+    store = SQLiteSearchService()
+    processor = RepositoryProcessor(
+        github_service=GitHubService(transport=httpx.MockTransport(repo.handler)),
+        mistral_service=MistralService(),
+        snowflake_service=store,
+        model_cache=ModelCache()
+    )
+
+    assert asyncio.run(processor.ingest_repository("octo", "demo"))
+    assert sorted(repo.blob_requests) == sorted([repo.sha(code), repo.sha(repo.files["static/app.js"])])
+    assert sorted(asyncio.run(store.get_file_shas("demo"))) == ["src/app.py"]
+    assert {path: reason.split(":")[0] for path, reason in processor.excluded_files.items()} == {
+        "node_modules/pkg/index.js": "vendored",
+        "package-lock.json": "generated",
+        "data/huge.json": "too_large",
+        "assets/logo.png": "extension",
+    }
+    assert processor.skipped_files["static/app.js"].startswith("minified:")
+    assert processor.metrics.summary()["ingest_files_excluded_total"]["reason=vendored"] == 1
@@ -0,0 +1,40 @@
+import asyncio
+import httpx
+from app.services.github import GitHubService
+
+
+def test_github_service_reuses_one_client():
+    seen_clients = set()
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        assert request.headers["Authorization"].startswith("token ")
+        if request.url.path == "/repos/octo/demo":
+            return httpx.Response(200, json={"default_branch": "main"})
+        if request.url.path == "/repos/octo/demo/git/trees/main":
+            return httpx.Response(200, json={"tree": [{"path": "a.py", "url": "https://api.github.com/blob/1"}]})
+        return httpx.Response(200, json={"content": "cHJpbnQoMSk="})
+
+    async def run():
+        async with GitHubService(transport=httpx.MockTransport(handler)) as service:
+            seen_clients.add(id(service.client))
+            tree = await service.get_repository_tree("octo", "demo")
+            seen_clients.add(id(service.client))
+            content = await service.get_file_content(tree[0]["url"])
+            seen_clients.add(id(service.client))
+        return service, tree, content
+
+    service, tree, content = asyncio.run(run())
+    assert [entry["path"] for entry in tree] == ["a.py"]
+    assert content == "cHJpbnQoMSk="
+    assert len(seen_clients) == 1
+    assert service._client is None
+
+
+def test_explicit_zero_limits_override_the_settings():
+    service = GitHubService(max_keepalive_connections=0, keepalive_expiry=0, timeout=0)
+    assert service.limits.max_keepalive_connections == 0
+    assert service.limits.keepalive_expiry == 0
+    assert service.timeout == 0
+
+    defaults = GitHubService()
+    assert defaults.limits.max_keepalive_connections > 0 and defaults.timeout > 0
@@ -0,0 +1,103 @@
+import asyncio
+import httpx
+from app.services.github import GitHubService
+from app.services.http_cache import HTTPCache
+
+BLOB_SHA = "a" * 40
+REPO_URL = "https://api.github.com/repos/octo/demo"
+
+
+def test_conditional_requests_and_immutable_blobs(tmp_path):
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append((request.url.path, request.headers.get("if-none-match")))
+        if "/git/blobs/" in request.url.path:
+            return httpx.Response(200, json={"content": "eA=="})
+        etag = f'"{request.url.path}-v1"'
+        if request.headers.get("if-none-match") == etag:
+            return httpx.Response(304, headers={"ETag": etag})
+        if request.url.path == "/repos/octo/demo":
+            return httpx.Response(200, json={"default_branch": "main"}, headers={"ETag": etag})
+        return httpx.Response(200, json={"tree": [{"path": "a.py"}]}, headers={"ETag": etag})
+
+    cache = HTTPCache(str(tmp_path / "http.sqlite3"))
+    service = GitHubService(transport=httpx.MockTransport(handler), cache=cache)
+
+    async def run():
+        tree = await service.get_repository_tree("octo", "demo")
+        blob = await service.get_file_content(f"https://api.github.com/repos/octo/demo/git/blobs/{BLOB_SHA}")
+        return tree, blob
+
+    first = asyncio.run(run())
+    requests.clear()
+    assert asyncio.run(run()) == first
+    # Repository and tree were revalidated, the blob was not requested at all
+    assert requests == [
+        ("/repos/octo/demo", '"/repos/octo/demo-v1"'),
+        ("/repos/octo/demo/git/trees/main", '"/repos/octo/demo/git/trees/main-v1"'),
+    ]
+    assert cache.summary()["revalidated"] == 2 and cache.summary()["fresh_hits"] == 1
+    assert cache.summary()["hit_rate"] == 0.5
+    cache.close()
+
+    # Persisted, and blobs are shared by SHA across repositories
+    reopened = HTTPCache(str(tmp_path / "http.sqlite3"))
+    assert reopened.get(f"https://api.github.com/repos/fork/demo/git/blobs/{BLOB_SHA}").body == b'{"content":"eA=="}'
+    reopened.close()
+
+
+def test_eviction_keeps_recently_used_entries():
+    cache = HTTPCache(max_bytes=1000)
+    for idx in range(3):
+        cache.store(f"https://api.github.com/repos/octo/r{idx}", b"x" * 300, etag=f'"{idx}"')
+    cache.hit("https://api.github.com/repos/octo/r0", revalidated=True)
+    cache.store("https://api.github.com/repos/octo/r3", b"x" * 300, etag='"3"')
+
+    assert cache.size_bytes <= 900
+    assert cache.get("https://api.github.com/repos/octo/r0") is not None
+    assert cache.get("https://api.github.com/repos/octo/r1") is None
+    # Responses without validators cannot be revalidated and are not stored
+    cache.store("https://api.github.com/repos/octo/plain", b"{}")
+    assert cache.get("https://api.github.com/repos/octo/plain") is None
+    assert cache.summary()["evictions"] >= 1
+
+
+def test_processes_sharing_a_file_stay_within_the_budget(tmp_path):
+    path = str(tmp_path / "shared.sqlite3")
+    first, second = HTTPCache(path, max_bytes=1000), HTTPCache(path, max_bytes=1000)
+    for idx in range(3):
+        first.store(f"https://api.github.com/repos/octo/a{idx}", b"x" * 300, etag=f'"a{idx}"')
+    # The second process sees the first one's bodies, not just its own
+    second.store("https://api.github.com/repos/octo/b0", b"x" * 300, etag='"b0"')
+    assert first.size_bytes == second.size_bytes <= 900
+    assert second.get("https://api.github.com/repos/octo/b0") is not None
+    first.close()
+    second.close()
+
+
+def test_unmatched_not_modified_is_fetched_again():
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request.headers.get("if-none-match"))
+        if len(requests) == 1:
+            # e.g. an intermediary answering from validators this process no longer has
+            return httpx.Response(304, headers={"ETag": '"v1"'})
+        return httpx.Response(200, json={"default_branch": "main"}, headers={"ETag": '"v1"'})
+
+    cache = HTTPCache()
+    service = GitHubService(transport=httpx.MockTransport(handler), cache=cache)
+    assert asyncio.run(service._get(REPO_URL)).json() == {"default_branch": "main"}
+    assert requests == [None, None]
+    assert cache.get(REPO_URL) is not None
+
+    # Revalidated while another process evicted the entry: it is stored again
+    def evicting_handler(request: httpx.Request) -> httpx.Response:
+        cache._conn.execute("DELETE FROM http_cache")
+        return httpx.Response(304, headers={"ETag": '"v1"'})
+
+    service = GitHubService(transport=httpx.MockTransport(evicting_handler), cache=cache)
+    assert asyncio.run(service._get(REPO_URL)).json() == {"default_branch": "main"}
+    assert cache.get(REPO_URL) is not None
+    cache.close()
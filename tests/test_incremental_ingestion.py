@@ -0,0 +1,248 @@
+import asyncio
+import httpx
+from app.services.github import GitHubService
+from app.services.job_store import JobStore
+from app.services.mistral import MistralService
+from app.services.model_cache import ModelCache
+from app.services.repository_ingestion import RepositoryProcessor
+from benchmarks.fakes import FakeGitHubRepo, SQLiteSearchService
+
+
+def test_incremental_ingestion_only_processes_changes():
+    repo = FakeGitHubRepo({
+        "a.py": b"print('a')\n",
+        "b.py": b"print('b')\n",
+        "docs/c.md": b"# c\n",
+    })
+    store = SQLiteSearchService()
+    processor = RepositoryProcessor(
+        github_service=GitHubService(transport=httpx.MockTransport(repo.handler)),
+        mistral_service=MistralService(),
+        snowflake_service=store
+    )
+
+    assert asyncio.run(processor.ingest_repository("octo", "demo"))
+    assert len(repo.blob_requests) == 3
+
+    repo.blob_requests.clear()
+    assert asyncio.run(processor.ingest_repository("octo", "demo"))
+    assert repo.blob_requests == []
+
+    repo.files["b.py"] = b"print('b2')\n"
+    del repo.files["docs/c.md"]
+    repo.files["d.py"] = b"print('d')\n"
+    assert asyncio.run(processor.ingest_repository("octo", "demo"))
+    assert sorted(repo.blob_requests) == sorted([repo.sha(repo.files["b.py"]), repo.sha(repo.files["d.py"])])
+
+    indexed = asyncio.run(store.get_file_shas("demo"))
+    assert indexed == {name: repo.sha(data) for name, data in repo.files.items()}
+    stats = asyncio.run(store.get_repository_statistics("demo"))
+    assert stats["total_chunks"] == 3
+
+
+def test_full_rebuild_reuses_cached_model_outputs():
+    class CountingMistralService(MistralService):
+        calls = 0
+
+        def generate_embeddings(self, texts):
+            CountingMistralService.calls += 1
+            return super().generate_embeddings(texts)
+
+        def generate_responses(self, prompt, conversations):
+            CountingMistralService.calls += 1
+            return super().generate_responses(prompt, conversations)
+
+    repo = FakeGitHubRepo({f"src/module_{i}.py": f"value = {i}\n".encode() for i in range(5)})
+    processor = RepositoryProcessor(
+        github_service=GitHubService(transport=httpx.MockTransport(repo.handler)),
+        mistral_service=CountingMistralService(),
+        snowflake_service=SQLiteSearchService(),
+        model_cache=ModelCache()
+    )
+
+    assert asyncio.run(processor.ingest_repository("octo", "demo", incremental=False))
+    first_run_calls = CountingMistralService.calls
+    assert first_run_calls > 0
+    assert asyncio.run(processor.ingest_repository("octo", "demo", incremental=False))
+    assert CountingMistralService.calls == first_run_calls
+    assert processor.model_cache.summary()["hits"] == 10
+
+
+def test_pipeline_drops_files_with_failed_chunks():
+    class FlakyMistralService(MistralService):
+        def generate_embeddings(self, texts):
+            if any("broken" in text for text in texts):
+                raise RuntimeError("model unavailable")
+            return super().generate_embeddings(texts)
+
+    repo = FakeGitHubRepo({
+        "good.py": b"print('fine')\n",
+        "bad.py": b"broken = True\n",
+    })
+    store = SQLiteSearchService()
+    progress = []
+
+    async def on_progress(file_path):
+        progress.append(file_path)
+
+    processor = RepositoryProcessor(
+        github_service=GitHubService(transport=httpx.MockTransport(repo.handler)),
+        mistral_service=FlakyMistralService(),
+        snowflake_service=store,
+        model_cache=ModelCache(),
+        batch_options={"max_items": 1}
+    )
+    processor.set_callback(on_progress)
+
+    assert asyncio.run(processor.ingest_repository("octo", "demo"))
+    assert asyncio.run(store.get_file_shas("demo")) == {"good.py": repo.sha(repo.files["good.py"])}
+    assert progress == ["good.py"]
+    stages = processor.pipeline.summary()
+    assert list(stages) == ["fetch", "chunk", "dedup", "embed", "summarize", "store"]
+    assert stages["fetch"]["processed"] == 2 and stages["embed"]["failed"] == 1 and stages["store"]["processed"] == 1
+
+    metrics = processor.metrics.summary()
+    assert metrics["ingest_files_total"] == {"outcome=ok": 1, "outcome=skipped": 1}
+    assert metrics["ingest_chunks_total"] == {"outcome=stored": 1, "outcome=failed": 1}
+    assert metrics["pipeline_stage_seconds"]["stage=embed"]["count"] == 2
+    assert metrics["process_resident_memory_bytes"]["total"]["max"] > 0
+    assert 'pipeline_items_total{outcome="error",stage="embed"} 1' in processor.metrics.render_prometheus()
+
+
+def test_interrupted_run_resumes_from_its_checkpoint():
+    class Killed(BaseException):
+        """Stands in for the worker being preempted mid-run."""
+
+    repo = FakeGitHubRepo({f"mod_{i}.py": f"value_{i} = {i}\n".encode() * 1000 for i in range(8)})
+    jobs = JobStore()
+    store = SQLiteSearchService(job_store=jobs)
+    stored = []
+
+    async def die_after_three(file_path):
+        stored.append(file_path)
+        if len(set(stored)) == 3:
+            raise Killed()
+
+    def processor():
+        return RepositoryProcessor(
+            github_service=GitHubService(transport=httpx.MockTransport(repo.handler)),
+            mistral_service=MistralService(),
+            snowflake_service=store,
+            model_cache=ModelCache(),
+            job_store=jobs,
+            write_options={"max_rows": 1}
+        )
+
+    first = processor()
+    first.set_callback(die_after_three)
+    try:
+        asyncio.run(first.ingest_repository("octo", "demo"))
+        assert False, "the run should have been killed"
+    except Killed:
+        pass
+    interrupted = jobs.progress("demo", "octo")
+    assert interrupted["status"] == "running" and 0 < interrupted["done_files"] < 8
+
+    repo.blob_requests.clear()
+    second = processor()
+    assert asyncio.run(second.ingest_repository("octo", "demo"))
+    assert second.job_id == first.job_id
+    # Only the files without a checkpoint are fetched again...
+    assert len(repo.blob_requests) == 8 - interrupted["done_files"]
+    # ...and none of their partial rows survive as duplicates
+    rows = store.conn.execute(
+        "SELECT file_path, COUNT(*), COUNT(DISTINCT chunk_index) FROM code_embeddings GROUP BY file_path"
+    ).fetchall()
+    assert len(rows) == 8 and all(count == distinct for _, count, distinct in rows)
+
+    job = asyncio.run(store.get_repository_statistics("demo"))["job"]
+    assert job["status"] == "completed" and job["resumes"] == 1
+    assert job["done_files"] == 8 and job["percent_complete"] == 100.0
+    assert job["stored_chunks"] == sum(distinct for _, _, distinct in rows) and job["last_batch"] > 0
+
+    # A changed tree starts a new job instead of resuming
+    repo.files["mod_0.py"] = b"changed = True\n"
+    third = processor()
+    assert asyncio.run(third.ingest_repository("octo", "demo"))
+    assert third.job_id != first.job_id and jobs.progress("demo", "octo")["total_files"] == 1
+
+
+def test_full_rebuild_abandons_an_interrupted_job():
+    class Killed(BaseException):
+        """Stands in for the worker being preempted mid-run."""
+
+    repo = FakeGitHubRepo({f"mod_{i}.py": f"value_{i} = {i}\n".encode() * 1000 for i in range(8)})
+    jobs = JobStore()
+    store = SQLiteSearchService(job_store=jobs)
+
+    def processor():
+        return RepositoryProcessor(
+            github_service=GitHubService(transport=httpx.MockTransport(repo.handler)),
+            mistral_service=MistralService(),
+            snowflake_service=store,
+            model_cache=ModelCache(),
+            job_store=jobs,
+            write_options={"max_rows": 1}
+        )
+
+    stored = []
+
+    async def die_after_three(file_path):
+        stored.append(file_path)
+        if len(set(stored)) == 3:
+            raise Killed()
+
+    first = processor()
+    first.set_callback(die_after_three)
+    try:
+        asyncio.run(first.ingest_repository("octo", "demo"))
+        assert False, "the run should have been killed"
+    except Killed:
+        pass
+    assert jobs.resumable_job("demo", "octo")["job_id"] == first.job_id
+
+    repo.blob_requests.clear()
+    second = processor()
+    assert asyncio.run(second.ingest_repository("octo", "demo", incremental=False))
+    assert second.job_id != first.job_id
+    # Every file is fetched and stored again, not just the ones left unfinished
+    assert len(repo.blob_requests) == 8
+    assert jobs._fetch_job("job_id = ?", (first.job_id,))["status"] == "abandoned"
+    progress = jobs.progress("demo", "octo")
+    assert progress["status"] == "completed" and progress["done_files"] == progress["total_files"] == 8
+    rows = store.conn.execute(
+        "SELECT file_path, COUNT(*), COUNT(DISTINCT chunk_index) FROM code_embeddings GROUP BY file_path"
+    ).fetchall()
+    assert len(rows) == 8 and all(count == distinct for _, count, distinct in rows)
+
+
+def test_jobs_are_kept_per_owner_and_shard():
+    jobs = JobStore()
+    files = {f"mod_{i}.py": f"sha-{i}" for i in range(4)}
+    first = jobs.create_job("demo", "octo", "tree", dict(list(files.items())[:2]), shard=(0, 2))
+    second = jobs.create_job("demo", "octo", "tree", dict(list(files.items())[2:]), shard=(1, 2))
+    fork = jobs.create_job("demo", "fork", "tree", files)
+
+    # A fork or another shard of the same repository never resumes this job
+    assert jobs.resumable_job("demo", "octo", (0, 2))["job_id"] == first
+    assert jobs.resumable_job("demo", "octo", (1, 2))["job_id"] == second
+    assert jobs.resumable_job("demo", "octo") is None
+    assert jobs.resumable_job("demo", "fork")["job_id"] == fork
+
+    jobs.mark_file(first, "mod_0.py", "done", chunks=3)
+    jobs.mark_file(first, "mod_1.py", "done", chunks=2)
+    jobs.finish_job(first, "completed")
+    jobs.mark_file(second, "mod_2.py", "skipped", reason="empty")
+
+    progress = jobs.progress("demo", "octo")
+    assert progress["status"] == "running" and progress["shard_count"] == 2 and progress["missing_shards"] == []
+    assert (progress["total_files"], progress["done_files"], progress["skipped_files"]) == (4, 2, 1)
+    assert progress["stored_chunks"] == 5 and progress["pending_files"] == 1
+    assert progress["percent_complete"] == 75.0
+    assert [shard["shard_index"] for shard in progress["shards"]] == [0, 1]
+    assert jobs.progress("demo", "fork")["job_id"] == fork
+
+    # Resharding starts over: shards of the old layout are not counted
+    jobs.create_job("demo", "octo", "tree", files, shard=(0, 3))
+    progress = jobs.progress("demo", "octo")
+    assert progress["shard_count"] == 3 and progress["missing_shards"] == [1, 2] and progress["total_files"] == 4
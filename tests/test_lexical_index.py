@@ -0,0 +1,72 @@
+import numpy as np
+from app.services.lexical_index import LexicalIndex, tokenize
+from app.services.vector_index import VectorIndex
+
+
+def code_rows(count: int, dim: int = 16, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    records = [
+        {
+            "file_path": f"src/module_{i}.py",
+            "chunk_index": 0,
+            "content": f"def handler_{i}(request):\n    return request.value + {i}\n",
+            "summary": "s"
+        }
+        for i in range(count)
+    ]
+    records[42]["content"] = "def getFileShas(repo_name):\n    return fetch_shas(repo_name)\n"
+    return list(range(1, count + 1)), rng.normal(size=(count, dim)).astype(np.float32), records
+
+
+def test_tokenize_splits_identifiers():
+    assert tokenize("def getFileShas(repo_name): HTTPCache.x") == [
+        "def", "getfileshas", "get", "file", "shas", "repo_name", "repo", "name", "httpcache", "http", "cache"
+    ]
+    assert tokenize("_run a1 __init__") == ["_run", "run", "a1", "__init__", "init"]
+
+
+def test_bm25_ranks_rare_terms_and_forgets_removed_documents(tmp_path):
+    index = LexicalIndex(str(tmp_path / "lexical.sqlite3"))
+    index.add([1, 2, 3], [
+        "def save(conn): conn.commit()",
+        "def save_embedding(conn, embedding): conn.execute(embedding)",
+        "class EmbeddingWriter: pass",
+    ])
+    assert [doc_id for doc_id, _ in index.search("embedding writer")] == [3, 2]
+    assert index.search("unknown_symbol") == []
+
+    index.add([2], ["def unrelated(): pass"])  # replaces the old document 2
+    index.remove([3])
+    index.close()
+
+    reopened = LexicalIndex(str(tmp_path / "lexical.sqlite3"))
+    assert len(reopened) == 2
+    assert reopened.search("embedding") == []
+    assert [doc_id for doc_id, _ in reopened.search("unrelated save")] in ([1, 2], [2, 1])
+
+
+def test_hybrid_search_finds_exact_symbols(tmp_path):
+    ids, vectors, records = code_rows(200)
+    index = VectorIndex(str(tmp_path), lexical=True)
+    index.add(ids, vectors, records)
+    query = np.random.default_rng(7).normal(size=16)
+
+    # The embedding alone has no idea where getFileShas is; the identifier does
+    assert 43 not in [row["id"] for row in index.search(query, k=5)]
+    results = index.search_hybrid(query, "where is getFileShas defined?", k=5)
+    assert results[0]["id"] == 43 and results[0]["bm25"] > 0
+    assert results[0]["file_path"] == "src/module_42.py"
+
+    # Only candidates are re-ranked; questions without indexed tokens use the plain search
+    index.remove_files(["src/module_42.py"])
+    assert 43 not in [row["id"] for row in index.search_hybrid(query, "getFileShas", k=5)]
+    assert index.search_hybrid(query, "??", k=3) == index.search(query, k=3)
+    index.close()
+
+    # An index persisted without the lexical side gets it built on open
+    plain = VectorIndex(str(tmp_path / "plain"))
+    plain.add(ids, vectors, records)
+    plain.close()
+    upgraded = VectorIndex(str(tmp_path / "plain"), lexical=True)
+    assert len(upgraded.lexical) == 200
+    assert upgraded.search_hybrid(query, "getFileShas", k=1)[0]["id"] == 43
@@ -0,0 +1,48 @@
+import logging
+import os
+import tempfile
+from app.services.metrics import MetricsRegistry, profile_run
+
+
+def test_histograms_counters_and_prometheus_text():
+    metrics = MetricsRegistry()
+    metrics.describe("work_seconds", "Time per item")
+    latency = metrics.histogram("work_seconds", buckets=(0.1, 1.0), stage="embed")
+    for value in [0.05] * 90 + [0.5] * 9 + [5.0]:
+        latency.observe(value)
+    metrics.counter("items_total", outcome="ok").inc(3)
+    metrics.gauge("memory_bytes").set(10)
+    metrics.gauge("memory_bytes").set(4)
+
+    summary = metrics.summary()
+    assert summary["items_total"] == {"outcome=ok": 3}
+    assert summary["memory_bytes"]["total"] == {"value": 4, "max": 10}
+    assert summary["work_seconds"]["stage=embed"]["count"] == 100
+    assert summary["work_seconds"]["stage=embed"]["p50"] < 0.1 < summary["work_seconds"]["stage=embed"]["p99"]
+
+    text = metrics.render_prometheus()
+    assert "# HELP work_seconds Time per item\n# TYPE work_seconds histogram" in text
+    assert 'work_seconds_bucket{stage="embed",le="0.1"} 90' in text
+    assert 'work_seconds_bucket{stage="embed",le="+Inf"} 100' in text
+    assert 'items_total{outcome="ok"} 3.0' in text
+
+    try:
+        metrics.counter("work_seconds")
+        assert False, "a histogram name cannot be reused for a counter"
+    except ValueError:
+        pass
+
+
+def test_profile_run(caplog):
+    with tempfile.TemporaryDirectory() as directory:
+        with profile_run("cprofile", "run", directory):
+            sorted(range(1000), key=lambda x: -x)
+        assert os.path.exists(os.path.join(directory, "run.prof"))
+
+    with caplog.at_level(logging.INFO, logger="app.services.metrics"):
+        with profile_run("tracemalloc", "run", ""):
+            kept = [bytes(1000) for _ in range(100)]
+    assert "Peak traced memory" in caplog.text and kept
+
+    with profile_run(None, "run", ""):
+        pass
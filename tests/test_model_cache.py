@@ -0,0 +1,70 @@
+import os
+from app.services.mistral import MistralService
+from app.services.model_cache import CachedMistralService, ModelCache, cache_key
+
+
+class CountingMistralService(MistralService):
+    def __init__(self):
+        super().__init__()
+        self.embedded = []
+
+    def generate_embeddings(self, texts):
+        self.embedded.extend(texts)
+        return [[float(len(text))] for text in texts]
+
+
+def test_cache_key_depends_on_model_and_version():
+    base = cache_key("embedding", "mistral-embed", "1", "text")
+    assert base == cache_key("embedding", "mistral-embed", "1", "text")
+    assert base != cache_key("embedding", "mistral-embed", "2", "text")
+    assert base != cache_key("summary", "mistral-embed", "1", "text")
+
+
+def test_only_misses_reach_the_model(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    service = CountingMistralService()
+    cached = CachedMistralService(service, ModelCache(path))
+
+    assert cached.generate_embeddings(["a", "bb", "a"]) == [[1.0], [2.0], [1.0]]
+    assert service.embedded == ["a", "bb"]
+    assert cached.generate_embeddings(["bb", "ccc"]) == [[2.0], [3.0]]
+    assert service.embedded == ["a", "bb", "ccc"]
+    assert cached.cache.summary()["memory_hits"] == 1
+
+    # A new process starts with an empty memory tier but finds results on disk
+    fresh = CachedMistralService(service, ModelCache(path))
+    assert fresh.generate_embeddings(["a", "bb", "ccc"]) == [[1.0], [2.0], [3.0]]
+    assert service.embedded == ["a", "bb", "ccc"]
+    assert fresh.cache.summary()["disk_hits"] == 3
+    assert fresh.generate_response("p", [{"role": "user", "content": "a"}]) == cached.generate_response(
+        "p", [{"role": "user", "content": "a"}]
+    )
+
+
+def test_disk_tier_evicts_least_recently_used(tmp_path):
+    cache = ModelCache(str(tmp_path / "cache.sqlite3"), memory_bytes=300, max_bytes=100)
+    for idx in range(10):
+        cache.set(f"key-{idx}", "x" * 20)
+    assert cache.size_bytes <= 100
+    assert cache.stats["evictions"] > 0
+    assert cache.get("key-9") == "x" * 20
+    assert cache.get("key-0") is None
+    assert os.path.exists(tmp_path / "cache.sqlite3")
+
+
+def test_memory_tier_holds_packed_embeddings_within_its_budget(tmp_path):
+    embedding = [0.25 * i for i in range(1024)]
+    cache = ModelCache(str(tmp_path / "cache.sqlite3"), memory_bytes=3 * 4500)
+    for idx in range(5):
+        cache.set(f"key-{idx}", embedding)
+    cache.set("summary", "a summary")
+
+    assert cache.memory_size_bytes <= 3 * 4500
+    assert all(isinstance(value, (bytes, str)) for value in cache._memory.values())
+    assert len(cache._memory["key-4"]) == 1 + 4 * 1024
+    assert "key-0" not in cache._memory
+    # Evicted from memory, still on disk, and read back as plain floats either way
+    assert cache.get("key-0") == embedding and cache.get("key-4") == embedding
+    assert cache.get("summary") == "a summary"
+    assert cache.stats["disk_hits"] == 1
+    assert cache.size_bytes < 5 * 4200
@@ -0,0 +1,31 @@
+import functools
+import os
+import sqlite3
+import tempfile
+from app.services.parallel_ingestion import IngestionTask, ingest_repositories, shard_tasks
+from app.services.repository_ingestion import in_shard
+from benchmarks.fakes import offline_processor
+
+
+def test_repositories_and_shards_are_ingested_in_worker_processes():
+    with tempfile.TemporaryDirectory() as store_dir:
+        factory = functools.partial(offline_processor, store_dir=store_dir, files=12, functions=4)
+        tasks = [IngestionTask("octo", "alpha")] + shard_tasks("octo", "beta", 3)
+        report = ingest_repositories(tasks, processes=2, max_concurrency=4, processor_factory=factory)
+
+        assert report["tasks"] == report["succeeded"] == 4
+        assert report["files"] == 12 + 12 and report["chunks"] >= report["files"]
+        assert len({result["pid"] for result in report["results"]}) <= 2
+        assert [result["task"] for result in report["results"]] == [
+            "octo/alpha", "octo/beta[0/3]", "octo/beta[1/3]", "octo/beta[2/3]"
+        ]
+
+        # Shards cover disjoint sets of files
+        seen = []
+        for index in range(3):
+            conn = sqlite3.connect(os.path.join(store_dir, f"octo_beta_{index}_3.sqlite3"))
+            paths = [row[0] for row in conn.execute("SELECT DISTINCT file_path FROM code_embeddings")]
+            conn.close()
+            assert all(in_shard(path, (index, 3)) for path in paths)
+            seen.extend(paths)
+        assert len(seen) == len(set(seen)) == 12
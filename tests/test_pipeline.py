@@ -0,0 +1,66 @@
+import asyncio
+import time
+from app.services.pipeline import Pipeline, Stage
+
+
+def test_stages_overlap_and_queues_bound_items_in_flight():
+    in_flight = 0
+    peak = 0
+    stored = []
+
+    async def produce(item, emit):
+        nonlocal in_flight, peak
+        for part in range(3):
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await emit((item, part))
+
+    async def slow(item, emit):
+        await asyncio.sleep(0.01)
+        await emit(item)
+
+    async def store(item, emit):
+        nonlocal in_flight
+        in_flight -= 1
+        stored.append(item)
+
+    pipeline = Pipeline([
+        Stage("produce", produce, workers=1, queue_size=2),
+        Stage("slow", slow, workers=4, queue_size=4),
+        Stage("store", store, workers=1, queue_size=4),
+    ])
+    start = time.perf_counter()
+    asyncio.run(pipeline.run(range(40)))
+
+    assert sorted(stored) == [(item, part) for item in range(40) for part in range(3)]
+    # 120 sleeps of 10ms over 4 workers; serial would take 1.2s
+    assert time.perf_counter() - start < 0.8
+    # Producer waits on the bounded queues instead of running ahead of the slow stage
+    assert peak <= 4 + 4 + 4 + 2
+    summary = pipeline.summary()
+    assert summary["produce"]["processed"] == 40 and summary["produce"]["emitted"] == 120
+    assert summary["slow"]["max_queue_depth"] <= 4 and summary["slow"]["queue_depth"] == 0
+    assert summary["store"]["processed"] == 120 and summary["slow"]["per_second"] > 0
+
+
+def test_failures_are_reported_per_item():
+    errors = []
+    stored = []
+
+    async def check(item, emit):
+        if item % 5 == 0:
+            raise ValueError(f"bad {item}")
+        await emit(item)
+
+    async def store(item, emit):
+        stored.append(item)
+
+    async def on_error(stage, item, error):
+        errors.append((stage, item, str(error)))
+
+    pipeline = Pipeline([Stage("check", check, workers=2), Stage("store", store)], on_error=on_error)
+    asyncio.run(pipeline.run(iter(range(12))))
+
+    assert sorted(stored) == [item for item in range(12) if item % 5]
+    assert sorted(errors) == [("check", 0, "bad 0"), ("check", 5, "bad 5"), ("check", 10, "bad 10")]
+    assert pipeline.summary()["check"]["failed"] == 3
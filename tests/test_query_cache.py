@@ -0,0 +1,112 @@
+import asyncio
+import time
+import pytest
+from app.services.query_cache import QueryCache
+from app.services.snowflake import SnowflakeSearchService
+
+
+def test_ttl_lru_and_invalidation():
+    cache = QueryCache(max_entries=2, ttl=0.05)
+    first, second, third = (cache.key("demo", [float(i), 1.0], 5) for i in range(3))
+    assert cache.key("demo", [0.1, 0.2], 5) == cache.key("demo", [0.1 + 1e-9, 0.2], 5)
+    assert cache.key("demo", [0.1, 0.2], 5) != cache.key("demo", [0.1, 0.2], 10)
+
+    cache.put(first, [{"file_path": "a.py"}])
+    cache.put(second, [{"file_path": "b.py"}])
+    cache.get(first)[0]["file_path"] = "changed"  # callers get copies
+    cache.put(third, [{"file_path": "c.py"}])  # evicts the least recently used: second
+    assert cache.get(second) is None
+    assert cache.get(first) == [{"file_path": "a.py"}]
+
+    cache.invalidate("demo")
+    assert cache.get(first) is None and cache.get(third) is None
+    cache.put(first, [])
+    time.sleep(0.06)
+    assert cache.get(first) is None
+    assert cache.summary()["evictions"] == 1 and cache.summary()["expired"] == 1
+
+
+def test_identical_searches_in_flight_are_coalesced():
+    cache = QueryCache()
+    calls = []
+
+    async def search():
+        calls.append(1)
+        await asyncio.sleep(0.02)
+        return [{"file_path": "a.py", "similarity": 0.9}]
+
+    async def failing():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        raise RuntimeError("warehouse unavailable")
+
+    async def run():
+        key = cache.key("demo", [0.1, 0.2], 5)
+        results = await asyncio.gather(*(cache.get_or_compute(key, search) for _ in range(10)))
+        assert all(result == results[0] for result in results) and len(calls) == 1
+
+        other = cache.key("demo", [0.3, 0.4], 5)
+        outcomes = await asyncio.gather(*(cache.get_or_compute(other, failing) for _ in range(3)), return_exceptions=True)
+        assert all(isinstance(outcome, RuntimeError) for outcome in outcomes) and len(calls) == 2
+
+        # A write landing while a search is in flight keeps its results out of the cache
+        pending = asyncio.ensure_future(cache.get_or_compute(other, search))
+        await asyncio.sleep(0)
+        cache.invalidate("demo")
+        await pending
+        assert cache.get(other) is None
+
+    asyncio.run(run())
+    assert cache.summary()["coalesced"] == 11
+
+
+class ScanCounter:
+    """Connection stand-in that counts warehouse scans and returns nothing."""
+
+    def __init__(self):
+        self.scans = 0
+
+    def cursor(self):
+        return self
+
+    def execute(self, query, params=None):
+        if " ".join(query.split()).startswith("SELECT id, embedding_packed, embedding FROM"):
+            self.scans += 1
+
+    def fetchall(self):
+        return []
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+@pytest.mark.parametrize("write", ["store", "delete_files", "delete_repository"])
+def test_writes_invalidate_the_repository(write):
+    connection = ScanCounter()
+    service = SnowflakeSearchService(connect=lambda: connection)
+
+    async def search(repo_name="demo"):
+        return await service.search_similar([0.1, 0.2], repo_name, use_index=False)
+
+    async def run():
+        await asyncio.gather(search(), search(), search("other"))
+        await search()
+        assert connection.scans == 2
+        if write == "store":
+            await service.store_embeddings([{"repo_name": "demo", "file_path": "a.py", "content": "x", "embedding": [0.1, 0.2]}])
+        elif write == "delete_files":
+            await service.delete_file_data("demo", ["a.py"])
+        else:
+            await service.delete_repository_data("demo")
+        await search()
+        await search("other")
+        assert connection.scans == 3
+
+    asyncio.run(run())
+    service.close()
@@ -0,0 +1,111 @@
+import asyncio
+import time
+import httpx
+import pytest
+from app.services.github import GitHubService
+from app.services.mistral import MistralService
+from app.services.model_cache import ModelCache
+from app.services.rate_limit import RateLimitExceeded, RateLimitScheduler, SharedRateBudget
+from app.services.repository_ingestion import RepositoryProcessor
+from benchmarks.fakes import FakeGitHubRepo, SQLiteSearchService
+
+
+def fast_scheduler(**options):
+    return RateLimitScheduler(backoff_base=0.001, backoff_max=0.01, **{"max_retries": 3, **options})
+
+
+def test_transient_failures_are_retried_and_permanent_ones_reported():
+    repo = FakeGitHubRepo({f"src/m{i}.py": f"value = {i}\n".encode() for i in range(4)})
+    repo.faults = {
+        "src/m0.py": [(502, {}, b"bad gateway"), (503, {}, b"")],
+        "src/m1.py": [(429, {"Retry-After": "0"}, b"")],
+        "src/m2.py": [(403, {}, b'{"message": "You have exceeded a secondary rate limit"}')],
+        "src/m3.py": [(500, {}, b"")] * 10,
+    }
+    scheduler = fast_scheduler()
+    store = SQLiteSearchService()
+    processor = RepositoryProcessor(
+        github_service=GitHubService(transport=httpx.MockTransport(repo.handler), scheduler=scheduler),
+        mistral_service=MistralService(),
+        snowflake_service=store,
+        model_cache=ModelCache()
+    )
+
+    assert asyncio.run(processor.ingest_repository("octo", "demo"))
+    assert sorted(asyncio.run(store.get_file_shas("demo"))) == ["src/m0.py", "src/m1.py", "src/m2.py"]
+    assert list(processor.skipped_files) == ["src/m3.py"]
+    assert "500" in processor.skipped_files["src/m3.py"]
+    assert scheduler.stats["throttled"] == 2 and scheduler.stats["failed"] == 1
+    assert scheduler.stats["retries"] == 2 + 1 + 1 + 3
+
+
+def test_network_errors_are_retried():
+    attempts = []
+
+    def handler(request):
+        attempts.append(request.url.path)
+        if len(attempts) < 3:
+            raise httpx.ConnectError("connection refused", request=request)
+        return httpx.Response(200, json={"content": "eA=="})
+
+    service = GitHubService(transport=httpx.MockTransport(handler), scheduler=fast_scheduler())
+    assert asyncio.run(service.get_file_content("https://api.github.com/blob/1")) == "eA=="
+    assert len(attempts) == 3
+
+
+def test_concurrency_follows_throttling_and_budget():
+    scheduler = fast_scheduler(max_concurrency=8, reserve=10)
+    reset = str(int(time.time()) + 3600)
+    request = httpx.Request("GET", "https://api.github.com/repos/octo/demo")
+    responses = iter([
+        httpx.Response(429, headers={"Retry-After": "0"}, request=request),
+        httpx.Response(200, headers={"X-RateLimit-Remaining": "500", "X-RateLimit-Reset": reset}, request=request),
+        httpx.Response(200, headers={"X-RateLimit-Remaining": "5", "X-RateLimit-Reset": reset}, request=request),
+        httpx.Response(403, headers={"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": reset}, request=request),
+    ])
+
+    async def send():
+        return next(responses)
+
+    async def run():
+        await scheduler.request(send)
+        assert scheduler.limit == 4  # halved by the 429, then one healthy response
+        await scheduler.request(send)
+        assert scheduler.limit == 1 and scheduler.budget_low
+        with pytest.raises(RateLimitExceeded):
+            await scheduler.request(send)  # budget exhausted for an hour, longer than max_wait
+
+    asyncio.run(run())
+
+
+def test_shared_budget_caps_and_pauses_every_scheduler():
+    budget = SharedRateBudget(max_concurrency=2)
+    schedulers = [RateLimitScheduler(max_concurrency=8, budget=budget) for _ in range(2)]
+    in_flight = peak = 0
+    throttled = False
+
+    async def send(request):
+        nonlocal in_flight, peak, throttled
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.005)
+        in_flight -= 1
+        if not throttled:
+            throttled = True
+            return httpx.Response(429, headers={"Retry-After": "0.2"}, request=request)
+        return httpx.Response(200, headers={"X-RateLimit-Remaining": "4000"}, request=request)
+
+    async def main():
+        request = httpx.Request("GET", "https://api.github.com/x")
+        start = time.monotonic()
+        await asyncio.gather(*(
+            schedulers[idx % 2].request(lambda: send(request)) for idx in range(20)
+        ))
+        return time.monotonic() - start
+
+    elapsed = asyncio.run(main())
+    # Both schedulers together never exceed the global cap...
+    assert peak <= 2
+    # ...and the 429 seen by one paused the other as well
+    assert elapsed >= 0.2
+    assert budget.remaining == 4000 and all(s.remaining == 4000 for s in schedulers)
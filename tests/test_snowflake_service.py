@@ -0,0 +1,178 @@
+import asyncio
+import time
+from app.services.snowflake import SnowflakeSearchService
+
+
+class SlowCursor:
+    """Cursor stand-in whose statements block the calling thread like a slow warehouse."""
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def execute(self, query, params=None):
+        self.connection.statements.append(" ".join(query.split())[:40])
+        if not query.lstrip().upper().startswith(("CREATE", "USE", "ALTER", "BEGIN")):
+            time.sleep(self.connection.delay)
+
+    def fetchall(self):
+        return []
+
+    def fetchone(self):
+        return (0, 0, None, None)
+
+    def close(self):
+        pass
+
+
+class SlowConnection:
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.statements = []
+
+    def cursor(self):
+        return SlowCursor(self)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def test_event_loop_stays_responsive_during_slow_db_calls():
+    service = SnowflakeSearchService(connect=lambda: SlowConnection(delay=0.2))
+
+    async def run():
+        max_lag = 0.0
+        ticks = 0
+
+        async def heartbeat(stop: asyncio.Event):
+            nonlocal max_lag, ticks
+            while not stop.is_set():
+                before = time.perf_counter()
+                await asyncio.sleep(0.01)
+                max_lag = max(max_lag, time.perf_counter() - before - 0.01)
+                ticks += 1
+
+        stop = asyncio.Event()
+        beat = asyncio.create_task(heartbeat(stop))
+        start = time.perf_counter()
+        await asyncio.gather(
+            service.store_embedding("demo", "a.py", "x = 1", [0.1, 0.2]),
+            service.get_file_shas("demo"),
+            service.get_repository_statistics("demo"),
+        )
+        elapsed = time.perf_counter() - start
+        stop.set()
+        await beat
+        return max_lag, ticks, elapsed
+
+    max_lag, ticks, elapsed = asyncio.run(run())
+    service.close()
+    # Three 200 ms statements ran on pooled connections in database threads, side by side,
+    # while the loop kept ticking
+    assert elapsed < 0.5
+    assert ticks >= 10
+    assert max_lag < 0.1
+
+
+def test_pool_connects_lazily_and_reuses_connections():
+    opened = []
+
+    def connect():
+        opened.append(SlowConnection(delay=0))
+        return opened[-1]
+
+    service = SnowflakeSearchService(connect=connect)
+    assert opened == []
+
+    async def run():
+        for _ in range(3):
+            await service.get_file_shas("demo")
+
+    asyncio.run(run())
+    assert len(opened) == 1
+    assert service.pool.summary()["reused"] == 2
+    service.close()
+
+
+def test_pool_replaces_dead_and_recycles_idle_connections():
+    from app.services.connection_pool import ConnectionPool
+
+    class Connection(SlowConnection):
+        closed = False
+
+        def is_closed(self):
+            return self.closed
+
+        def close(self):
+            self.closed = True
+
+    pool = ConnectionPool(lambda: Connection(delay=0), max_size=2, health_check_interval=0)
+    with pool.connection() as first:
+        pass
+    first.closed = True  # e.g. the session expired server-side
+    with pool.connection() as second:
+        assert second is not first
+    assert pool.summary()["dead"] == 1
+
+    pool.max_idle_time = 0
+    with pool.connection() as third:
+        assert third is not second
+    assert second.closed
+    assert pool.summary()["recycled"] == 1
+    pool.close()
+    assert third.closed
+
+
+class RecordingCursor(SlowCursor):
+    def execute(self, query, params=None):
+        self.connection.executed.append((query, params))
+
+
+class RecordingConnection(SlowConnection):
+    """Keeps the full text and parameters of every statement."""
+
+    def __init__(self):
+        super().__init__(delay=0)
+        self.executed = []
+
+    def cursor(self):
+        return RecordingCursor(self)
+
+
+def assert_pyformat(executed):
+    """The connector's default paramstyle: %s (or %(name)s) everywhere, never qmark."""
+    for query, params in executed:
+        assert "?" not in query, query
+        if isinstance(params, dict):
+            assert all(f"%({name})s" in query for name in params), query
+        else:
+            assert query.count("%s") == len(params or ()), query
+
+
+def test_statements_bind_one_placeholder_style():
+    service = SnowflakeSearchService(connect=RecordingConnection)
+    conn = RecordingConnection()
+    row = {"repo_name": "demo", "file_path": "a.py", "content": "x = 1", "embedding": [0.1, 0.2], "chunk_index": 0}
+    helpers = [
+        lambda: service._delete_repository_data_sync(conn, "demo"),
+        lambda: service._delete_file_data_sync(conn, "demo", ["a.py", "b.py"]),
+        lambda: service._get_file_shas_sync(conn, "demo"),
+        lambda: service._get_repository_statistics_sync(conn, "demo"),
+        lambda: service._has_chunk_sync(conn, "demo", "a.py", 0),
+        lambda: service._store_embeddings_sync(conn, [row]),
+        lambda: service._search_similar_sync(conn, [0.1, 0.2], "demo"),
+        lambda: service._migrate_embeddings_sync(conn, "demo"),
+    ]
+    for helper in helpers:
+        issued = len(conn.executed)
+        helper()
+        # Every helper binds the repository name rather than formatting it in
+        bound = [params.values() if isinstance(params, dict) else params or () for _, params in conn.executed[issued:]]
+        assert any("demo" in values for values in bound)
+    assert_pyformat(conn.executed)
+    service.close()
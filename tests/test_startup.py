@@ -0,0 +1,32 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+HEAVY_MODULES = ("numpy", "psutil", "snowflake.connector")
+
+PROBE = f"""
+import json, logging, sys
+import app.main, app.services.parallel_ingestion, app.services.repository_ingestion
+print(json.dumps([name for name in {HEAVY_MODULES!r} if name in sys.modules] + [len(logging.root.handlers)]), flush=True)
+from app.services.repository_ingestion import RepositoryProcessor
+RepositoryProcessor()
+print(json.dumps([name for name in {HEAVY_MODULES!r} if name in sys.modules]))
+"""
+
+
+def probe(env):
+    return subprocess.run([sys.executable, "-c", PROBE], cwd=ROOT, env=env, capture_output=True, text=True)
+
+
+def test_imports_need_no_settings_and_leave_heavy_modules_unloaded():
+    env = {key: value for key, value in os.environ.items() if key != "GITHUB_TOKEN"}
+    # Without a token the settings cannot load: importing must not try, constructing must
+    result = probe(env)
+    assert result.stdout.splitlines() == ["[0]"]
+    assert result.returncode != 0 and "github_token" in result.stderr
+
+    result = probe({**env, "GITHUB_TOKEN": "test"})
+    assert result.returncode == 0, result.stderr
+    # No logging handlers installed, and no connector, numpy or psutil until first real use
+    assert result.stdout.splitlines() == ["[0]", "[]"]
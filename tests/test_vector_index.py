@@ -0,0 +1,183 @@
+import asyncio
+import json
+import numpy as np
+from app.services.embedding_codec import encode_embedding
+from app.services.snowflake import SnowflakeSearchService
+from app.services.vector_index import IVFVectorIndex, VectorIndex, normalize
+
+
+def random_rows(count: int, dim: int = 16, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(count, dim)).astype(np.float32)
+    records = [{"file_path": f"f{i % 7}.py", "chunk_index": i, "content": f"chunk {i}", "summary": "s"} for i in range(count)]
+    return list(range(1, count + 1)), vectors, records
+
+
+def brute_force(vectors, query, k):
+    scores = vectors @ query / (np.linalg.norm(vectors, axis=1) * np.linalg.norm(query))
+    return [int(i) + 1 for i in np.argsort(-scores)[:k]]
+
+
+def test_search_matches_brute_force():
+    ids, vectors, records = random_rows(500)
+    index = VectorIndex()
+    index.add(ids, vectors, records)
+    query = np.random.default_rng(1).normal(size=16)
+
+    results = index.search(query, k=10)
+    assert [row["id"] for row in results] == brute_force(vectors, query, 10)
+    assert results[0]["content"] == f"chunk {results[0]['id'] - 1}"
+    assert all(a["similarity"] >= b["similarity"] for a, b in zip(results, results[1:]))
+    assert len(index.search(query, k=1000)) == 500
+
+
+def test_persisted_index_reloads_memory_mapped(tmp_path):
+    ids, vectors, records = random_rows(300)
+    index = VectorIndex(str(tmp_path), mmap=True)
+    index.add(ids[:200], vectors[:200], records[:200])
+    index.add(ids[200:], vectors[200:], records[200:])
+    index.add(ids[:10], vectors[:10], records[:10])  # already present: ignored
+    index.remove_files(["f0.py"])
+    index.close()
+
+    reloaded = VectorIndex(str(tmp_path), mmap=True)
+    assert isinstance(reloaded._vectors, np.memmap)
+    assert reloaded.last_id == 300
+    assert len(reloaded) == 300 - sum(1 for r in records if r["file_path"] == "f0.py")
+    query = vectors[3]
+    assert reloaded.search(query, k=1)[0]["id"] == 4
+    assert all(row["file_path"] != "f0.py" for row in reloaded.search(query, k=300))
+
+    # Removing most rows compacts the files
+    reloaded.remove_files([f"f{i}.py" for i in range(1, 6)])
+    assert reloaded._size == len(reloaded)
+    assert {row["file_path"] for row in reloaded.search(query, k=300)} == {"f6.py"}
+
+
+def clustered_rows(count: int, dim: int = 32, clusters: int = 20, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    vectors = (centers[rng.integers(clusters, size=count)] + 0.3 * rng.normal(size=(count, dim))).astype(np.float32)
+    records = [{"file_path": f"f{i % 7}.py", "chunk_index": i, "content": "", "summary": ""} for i in range(count)]
+    return list(range(1, count + 1)), vectors, records
+
+
+def recall(index, vectors, queries, k=10):
+    hits = sum(
+        len({row["id"] for row in index.search(query, k)} & set(brute_force(vectors, query, k)))
+        for query in queries
+    )
+    return hits / (k * len(queries))
+
+
+def test_ivf_index_trains_and_probes_a_subset():
+    ids, vectors, records = clustered_rows(3000)
+    index = IVFVectorIndex(nlist=30, nprobe=4, min_train_rows=1000)
+    index.add(ids[:500], vectors[:500], records[:500])
+    assert not index.is_trained  # exact until enough rows exist
+    assert [row["id"] for row in index.search(vectors[0], 5)] == brute_force(vectors[:500], vectors[0], 5)
+
+    index.add(ids[500:2000], vectors[500:2000], records[500:2000])
+    assert index.is_trained and index.trained_rows == 2000
+    index.add(ids[2000:], vectors[2000:], records[2000:])  # assigned incrementally, no retrain
+    assert index.trained_rows == 2000 and len(index._assign) == 3000
+
+    queries = np.random.default_rng(1).normal(size=(20, 32)) * 0.3 + vectors[:20]
+    assert len(index._candidates(normalize(queries[0]), 10)) < 3000
+    assert recall(index, vectors, queries) >= 0.9
+
+
+def test_ivf_index_persists_assignments_through_compaction(tmp_path):
+    ids, vectors, records = clustered_rows(2000)
+    index = IVFVectorIndex(str(tmp_path), nlist=20, nprobe=5, min_train_rows=1000)
+    index.add(ids[:1200], vectors[:1200], records[:1200])
+    index.add(ids[1200:], vectors[1200:], records[1200:])
+    index.remove_files([f"f{i}.py" for i in range(3)])  # compacts
+    assert len(index._assign) == index._size == len(index)
+    expected = [row["id"] for row in index.search(vectors[5], 10)]
+    index.close()
+
+    reloaded = IVFVectorIndex(str(tmp_path), nlist=20, nprobe=5, min_train_rows=1000)
+    assert reloaded.is_trained and reloaded.trained_rows == 1200
+    assert [row["id"] for row in reloaded.search(vectors[5], 10)] == expected
+    assert all(row["file_path"] not in ("f0.py", "f1.py", "f2.py") for row in reloaded.search(vectors[5], 50))
+
+    reloaded.clear()
+    assert not reloaded.is_trained and reloaded.search(vectors[5], 10) == []
+
+
+class TableConnection:
+    """Serves the vector index sync queries from an in-memory code_embeddings table."""
+
+    def __init__(self, rows):
+        self.rows = rows  # (id, repo_name, file_path, chunk_index, content, summary, embedding_packed, embedding)
+
+    def cursor(self):
+        return TableCursor(self)
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class TableCursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self.result = []
+
+    def execute(self, query, params=None):
+        rows = self.connection.rows
+        query = " ".join(query.split())
+        if "COUNT(*)" in query:
+            ids = [row[0] for row in rows if row[1] == params[0]]
+            xor = 0
+            for row_id in ids:
+                xor ^= row_id
+            self.result = [(len(ids), sum(ids), xor)]
+        elif query.startswith("SELECT id FROM"):
+            self.result = [(row[0],) for row in rows if row[1] == params[0]]
+        elif "id > %s" in query:
+            repo, after, limit = params
+            matching = sorted((row for row in rows if row[1] == repo and row[0] > after), key=lambda row: row[0])
+            self.result = [(row[0],) + row[2:] for row in matching[:limit]]
+        elif "WHERE id IN" in query:
+            self.result = [(row[0],) + row[2:] for row in rows if row[0] in params]
+        else:
+            self.result = []
+
+    def fetchall(self):
+        return self.result
+
+    def fetchone(self):
+        return self.result[0]
+
+    def close(self):
+        pass
+
+
+def table_row(row_id, vector, path="a.py", packed=True):
+    if packed:
+        return (row_id, "demo", path, 0, f"content {row_id}", "summary", encode_embedding(vector), None)
+    # Legacy VARIANT values come back as JSON text of the JSON string that was stored
+    return (row_id, "demo", path, 0, f"content {row_id}", "summary", None, json.dumps(json.dumps({"vector": vector})))
+
+
+def test_service_syncs_and_reconciles_local_index():
+    table = TableConnection([table_row(1, [1, 0, 0]), table_row(5, [0, 1, 0], packed=False), table_row(9, [0, 0, 1])])
+    service = SnowflakeSearchService(connect=lambda: table)
+
+    async def search(vector):
+        return [row["id"] for row in await service.search_similar(vector, "demo", limit=3)]
+
+    assert asyncio.run(search([0, 1, 0]))[0] == 5
+    assert service.vector_index("demo").last_id == 9
+
+    # A late commit with a lower id and an external delete are both picked up on the next sync
+    table.rows.append(table_row(7, [0.9, 0.1, 0]))
+    table.rows.remove(table.rows[0])
+    service._stale_indexes.add("demo")
+    assert asyncio.run(search([1, 0, 0]))[0] == 7
+    assert sorted(int(i) for i in service.vector_index("demo").ids()) == [5, 7, 9]
+    service.close()